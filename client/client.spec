@@ -25,7 +25,25 @@ a = Analysis(["run.py"],
              datas=[
                 ("client/defaults.cfg", "client")
              ],
-             hiddenimports=["six"],
+             # Actions and transfer mechanisms are imported by name when they are used, so PyInstaller
+             # can't find them on its own
+             hiddenimports=[
+                "six",
+                "client.actions.agent_action",
+                "client.actions.config_action",
+                "client.actions.mechanisms_action",
+                "client.actions.sources_action",
+                "client.actions.test_files_action",
+                "client.actions.transfer_action",
+                "client.actions.version_action",
+                "client.transfer.mechanisms.anonymous_gridftp",
+                "client.transfer.mechanisms.aspera",
+                "client.transfer.mechanisms.curl",
+                "client.transfer.mechanisms.gridftp_lite",
+                "client.transfer.mechanisms.http",
+                "client.transfer.mechanisms.scp",
+                "client.transfer.mechanisms.session_authenticated_curl"
+             ],
              hookspath=[],
              runtime_hooks=[],
              excludes=[],
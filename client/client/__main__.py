@@ -21,11 +21,20 @@ import logging
 import sys
 import traceback
 
-from colorlog import ColoredFormatter
-
 from .actions import action_module, available_action_info
 
 
+def _selected_action(argv):
+    """
+    Find the action named in command line arguments without fully parsing them.
+    Global options come before the action and do not take values.
+    """
+    for arg in argv:
+        if not arg.startswith("-"):
+            return arg
+    return None
+
+
 def main():
     parser = argparse.ArgumentParser(prog="bdss", description="BDSS client")
 
@@ -38,9 +47,13 @@ def main():
                                        metavar="action",
                                        title="available actions")
 
+    # Only import and configure the action being run. Other actions' modules may be slow to import.
+    selected_action = _selected_action(sys.argv[1:])
+
     for action, help_text in available_action_info():
         action_parser = subparsers.add_parser(action, help=help_text)
-        action_module(action).configure_parser(action_parser)
+        if action == selected_action:
+            action_module(action).configure_parser(action_parser)
 
     subparsers.add_parser("help", help="Show this help message and exit")
 
@@ -54,6 +67,7 @@ def main():
         handler = logging.StreamHandler()
         handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s - %(message)s"))
     else:
+        from colorlog import ColoredFormatter
         handler = logging.StreamHandler()
         handler.setFormatter(ColoredFormatter("%(log_color)s%(asctime)s %(levelname)s - %(message)s",
                              log_colors={
@@ -16,31 +16,31 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-from . import config_action
-from . import mechanisms_action
-from . import sources_action
-from . import test_files_action
-from . import transfer_action
-from . import version_action
-
-
-_actions = {
-    "config": config_action,
-    "mechanisms": mechanisms_action,
-    "sources": sources_action,
-    "test_files": test_files_action,
-    "transfer": transfer_action,
-    "version": version_action
+import importlib
+
+
+# Help text for each action. Listed here so that action modules (and their dependencies) only need
+# to be imported when their action is run.
+_action_help = {
+    "agent": "Run an agent that transfers files for other bdss commands.",
+    "config": "Client configuration.",
+    "mechanisms": "List transfer mechanisms available on this machine.",
+    "sources": "Search data sources in metadata repository by label.",
+    "test_files": "List test files for a specific data source.",
+    "transfer": "Download data file(s).",
+    "version": "Print version and license information."
 }
 
 
 def all_actions():
-    return sorted(list(_actions.keys()))
+    return sorted(list(_action_help.keys()))
 
 
 def action_module(action_name):
-    return _actions[action_name]
+    if action_name not in _action_help:
+        raise KeyError(action_name)
+    return importlib.import_module("." + action_name + "_action", __package__)
 
 
 def available_action_info():
-    return [(action, getattr(action_module(action), "cli_help", "")) for action in all_actions()]
+    return [(action, _action_help[action]) for action in all_actions()]
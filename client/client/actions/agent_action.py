@@ -0,0 +1,63 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import signal
+import sys
+
+from ..agent import Agent, run_agent
+from ..config import agent_socket_path
+
+
+cli_help = "Run an agent that transfers files for other bdss commands."
+
+
+def configure_parser(parser):
+    parser.add_argument("--socket",
+                        default=agent_socket_path,
+                        dest="socket_path",
+                        help="Path of the Unix socket to listen on (default %(default)s)")
+
+    parser.add_argument("--jobs", "-j",
+                        default=4,
+                        help="Number of files to transfer simultaneously (default %(default)s)",
+                        metavar="N",
+                        type=int)
+
+    parser.add_argument("--max-per-host",
+                        default=2,
+                        dest="max_per_host",
+                        help="Maximum number of simultaneous transfers from a single host (default %(default)s)",
+                        metavar="N",
+                        type=int)
+
+    parser.add_argument("--verify-jobs",
+                        default=2,
+                        dest="verify_jobs",
+                        help="Number of files to verify simultaneously while other files transfer (default %(default)s)",
+                        metavar="N",
+                        type=int)
+
+
+def handle_action(args, parser):
+    # Stop cleanly, removing the socket, when the agent is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        run_agent(args.socket_path, Agent(args.jobs, args.max_per_host, args.verify_jobs))
+    except KeyboardInterrupt:
+        pass
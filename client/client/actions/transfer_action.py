@@ -20,16 +20,22 @@ import argparse
 import logging
 import os
 import traceback
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
-from ..config import client_destination, metadata_repository_url, dtn_host, dtn_user, dtn_path
+from ..agent import is_agent_running, send_request
+from ..config import agent_socket_path, client_destination, local_routing, metadata_repository_url, dtn_hosts, \
+    dtn_user, dtn_path
 from ..transfer.base import Transfer
-from ..transfer.data import run_data_transfer
+from ..transfer.concurrency import HostConnectionLimiter, TransferPipeline
+from ..transfer.data import finish_data_transfer, has_partial_transfer, run_data_transfer
+from ..transfer.dtn import transfer_files_with_dtns
 from ..transfer.mechanisms import available_mechanisms
-from ..transfer.reporting import ReportsFile, send_report
-from ..util import run_subprocess
+from ..transfer.race import DEFAULT_PROBE_SECONDS, race_data_transfers
+from ..transfer.watchdog import minimum_transfer_rate
+from ..transfer.reporting import ReportsFile, TransferReport, send_report
+from ..transfer.routing import local_router
 
 
 cli_help = "Download data file(s)."
@@ -67,11 +73,83 @@ def configure_parser(parser):
                         help="Path to write transfer report to",
                         type=argparse.FileType("w"))
 
+    parser.add_argument("--jobs", "-j",
+                        default=1,
+                        help="Number of files to transfer simultaneously",
+                        metavar="N",
+                        type=int)
+
+    parser.add_argument("--verify-jobs",
+                        default=2,
+                        dest="verify_jobs",
+                        help="Number of files to verify simultaneously while other files transfer (default %(default)s)",
+                        metavar="N",
+                        type=int)
+
+    parser.add_argument("--race",
+                        default=1,
+                        help="Start up to K alternate transfers of each file at once and keep the fastest",
+                        metavar="K",
+                        type=int)
+
+    parser.add_argument("--race-probe",
+                        default=DEFAULT_PROBE_SECONDS,
+                        dest="race_probe_seconds",
+                        help="Seconds to run raced transfers before choosing the fastest (default %(default)s)",
+                        metavar="SECONDS",
+                        type=float)
+
+    parser.add_argument("--max-per-host",
+                        default=2,
+                        dest="max_per_host",
+                        help="Maximum number of simultaneous transfers from a single host when using --jobs",
+                        metavar="N",
+                        type=int)
+
+    parser.add_argument("--no-agent",
+                        action="store_true",
+                        dest="no_agent",
+                        help="Transfer files in this process even if a `bdss agent` is running")
+
+
+# Connections to the metadata repository are reused between requests. This matters most in a
+# long running agent process.
+_repository_session = requests.Session()
+
 
 def output_file_name(url):
     return url.partition("?")[0].rpartition("/")[2]
 
 
+def _transfer_from_result(result):
+    return Transfer(url=result["url"],
+                    mechanism_name=result["mechanism_name"],
+                    mechanism_options=result["mechanism_options"],
+                    data_source_id=result.get("data_source_id"),
+                    expected_transfer_rate=result.get("expected_transfer_rate"),
+                    file_checksum=result.get("file_checksum"))
+
+
+# Mechanisms that download a URL over plain HTTP(S)
+HTTP_MECHANISMS = ("curl", "http")
+
+
+def _append_default_transfer(url, transfers):
+    # As a last resort, fall back to original URL and its default mechanism
+    # Defaults are defined in mechanisms/__init__ module
+    default_transfer = Transfer(url)
+    # curl and http both download the URL over HTTP, so one of them is enough
+    if not any(t.url == url and t.mechanism_name in HTTP_MECHANISMS for t in transfers) and \
+            default_transfer not in transfers:
+        # The original URL is the same file as the other transfers
+        if transfers:
+            default_transfer.file_checksum = transfers[0].file_checksum
+
+        transfers.append(default_transfer)
+
+    return transfers
+
+
 def get_transfers(url, mechanisms):
     transfers = []
 
@@ -84,13 +162,13 @@ def get_transfers(url, mechanisms):
 
     logger.info("Requesting transfers for %s" % url)
     try:
-        response = requests.post("%s/transfers" % metadata_repository_url,
-                                 data=data,
-                                 headers={"Accept": "application/json"})
+        response = _repository_session.post("%s/transfers" % metadata_repository_url,
+                                            data=data,
+                                            headers={"Accept": "application/json"})
 
         response = response.json()
 
-        transfers = [Transfer(**r) for r in response["transfers"]]
+        transfers = [_transfer_from_result(r) for r in response["transfers"]]
 
         if not transfers:
             logger.warn("Received no transfers")
@@ -99,69 +177,299 @@ def get_transfers(url, mechanisms):
         logger.warn("Request for transfers failed")
         logger.debug(traceback.format_exc())
 
-    # As a last resort, fall back to original URL and its default mechanism
-    # Defaults are defined in mechanisms/__init__ module
-    default_transfer = Transfer(url)
-    if default_transfer not in transfers:
-        transfers.append(default_transfer)
+    return _append_default_transfer(url, transfers)
 
-    return transfers
 
-def handle_dtn_action(args, parser, reports_file):
-    # We want to download into a temporary file.
-    tf = tempfile.NamedTemporaryFile()
-    dest_dir = "".join([dtn_path, '/', tf.name])
+# Number of URLs to resolve per request to the metadata repository
+BATCH_SIZE = 500
 
-    conn_str = "%s@%s" %  (dtn_user, dtn_host)
-    logger.info("Initiating transfer with DTN: %s", conn_str)
 
-    # Download the files using the DTN by calling BDSS on that server instead.
-    bdss_cmd = " ".join(['bdss', 'transfer', '--urls', " ".join(args.urls), '--destination', dest_dir])
-    run_subprocess(["ssh", conn_str, bdss_cmd])
+def _request_transfer_batch(urls, mechanisms):
+    """
+    Request transfers for several URLs in one request to the metadata repository.
 
-    # Move the files to where they should be.
-    logger.info("Copying files from DTN...")
-    run_subprocess(["scp", "-r", "%s:%s/*" % (conn_str, dest_dir), args.destination_directory])
+    Returns:
+    dict - Lists of transfer results from the metadata repository keyed by URL.
+    """
+    data = dict(
+        available_mechanisms=mechanisms,
+        urls=urls
+    )
+    if client_destination:
+        data["destination"] = client_destination
 
-    # Finally delete the files on the remote server
-    logger.info("Removing from from DTN...")
-    run_subprocess(["ssh", conn_str, "rm -rf %s" % dest_dir])
+    response = _repository_session.post("%s/transfers/batch" % metadata_repository_url,
+                                        json=data,
+                                        headers={"Accept": "application/json"})
+    response.raise_for_status()
 
-def handle_local_action(args, parser, reports_file):
-    for url in args.urls:
-        output_path = os.path.abspath(os.path.join(args.destination_directory, output_file_name(url)))
-        if os.path.isfile(output_path):
+    return {r["url"]: r["transfers"] for r in response.json()["results"]}
+
+
+def get_local_transfers(url, mechanisms, router):
+    """
+    Get transfers for a URL from a cached copy of the metadata repository's configuration.
+
+    Parameters:
+    url - String - URL to get transfers for.
+    mechanisms - String[] - Names of transfer mechanisms available on this machine.
+    router - LocalRouter
+
+    Returns:
+    Transfer[]
+    """
+    results = router.find_transfers(url, mechanisms, client_destination)
+    if results is None:
+        logger.warn("No data source matches %s", url)
+
+    return _append_default_transfer(url, [_transfer_from_result(r) for r in results or []])
+
+
+def get_transfers_for_urls(urls, mechanisms, batch_size=BATCH_SIZE):
+    """
+    Get transfers for many URLs, requesting them from the metadata repository in batches.
+
+    If local routing is configured, transfers are found from a cached copy of the repository's configuration
+    instead. If a batch request fails, the cached configuration is used if there is one. Otherwise, or if the
+    metadata repository does not support batch requests, transfers are requested one URL at a time.
+
+    Parameters:
+    urls - String[] - URLs to get transfers for.
+    mechanisms - String[] - Names of transfer mechanisms available on this machine.
+    batch_size - Integer - Number of URLs to include in each request.
+
+    Returns:
+    Generator of (String, Transfer[]) - Each URL and its transfers, in the same order as urls.
+    """
+    router = local_router() if local_routing else None
+
+    for i in range(0, len(urls), batch_size):
+        batch = urls[i:i + batch_size]
+
+        if router:
+            for url in batch:
+                yield (url, get_local_transfers(url, mechanisms, router))
+            continue
+
+        logger.info("Requesting transfers for %d URL(s)", len(batch))
+        try:
+            results = _request_transfer_batch(batch, mechanisms)
+        except:
+            logger.warn("Batch request for transfers failed")
+            logger.debug(traceback.format_exc())
+
+            cached_router = local_router(offline=True)
+            if cached_router:
+                logger.info("Using cached metadata repository configuration")
+            for url in batch:
+                if cached_router:
+                    yield (url, get_local_transfers(url, mechanisms, cached_router))
+                else:
+                    yield (url, get_transfers(url, mechanisms))
+            continue
+
+        for url in batch:
+            transfers = [_transfer_from_result(r) for r in results.get(url, [])]
+            if not transfers:
+                logger.warn("Received no transfers for %s", url)
+
+            yield (url, _append_default_transfer(url, transfers))
+
+
+def _output_paths(urls, destination_directory):
+    """
+    Choose where to save each URL, skipping files that already exist.
+
+    Returns:
+    (String, String)[] - Each URL to transfer and the path to save it to.
+    """
+    output_paths = []
+    claimed_output_paths = set()
+    for url in urls:
+        output_path = os.path.abspath(os.path.join(destination_directory, output_file_name(url)))
+        if os.path.isfile(output_path) or output_path in claimed_output_paths:
             logger.warn("File at %s already exists at %s", url, output_path)
             continue
 
-        transfers = get_transfers(url, available_mechanisms())
+        output_paths.append((url, output_path))
+        claimed_output_paths.add(output_path)
 
+    return output_paths
+
+
+def handle_dtn_action(args, parser, reports_file):
+    files = _output_paths(args.urls, args.destination_directory)
+    if args.dry_run:
+        logger.info("%d file(s) would be transferred with DTN(s) %s", len(files), ", ".join(dtn_hosts))
+        return
+    if not files:
+        return
+
+    transfer_files_with_dtns(files, dtn_hosts, dtn_user, dtn_path, reports_file)
+
+
+def transfer_file(url, transfers, output_path, reports_file, limiter, display_output=True,
+                  race=1, race_probe_seconds=DEFAULT_PROBE_SECONDS, pipeline=None):
+    """
+    Transfer a file, trying each transfer in order until one succeeds.
+
+    Parameters:
+    url - String - The URL of the file being transferred.
+    transfers - Transfer[] - Transfers to attempt, in order of preference.
+    output_path - String - The path to save the transferred file to.
+    reports_file - ReportsFile - File to record successful transfers in. May be None.
+    limiter - HostConnectionLimiter - Limits the number of simultaneous transfers from each host.
+    display_output - Boolean - Display mechanism output as transfers run.
+    race - Integer - Number of transfers to start at once, keeping the fastest. See race_data_transfers.
+    race_probe_seconds - Float - How long to run raced transfers before choosing one.
+    pipeline - TransferPipeline - Limits the number of simultaneous transfers and verifications. A transfer slot is
+        released once a file is downloaded, so the next file can start while this one is verified.
+
+    Returns:
+    Boolean - True if the file was transferred
+    """
+    pipeline = pipeline or TransferPipeline()
+
+    def transfer_succeeded(report):
+        logger.info("Transfer of %s successful", url)
+        logger.debug(report)
+        send_report(report)
+        if reports_file:
+            reports_file.write_report(report)
+
+    # Racing would start over instead of resuming a partial file left by an earlier run
+    if race > 1 and len(transfers) > 1 and not has_partial_transfer(output_path):
+        logger.info("Racing %d transfers of %s", min(race, len(transfers)), url)
+        # Raced transfers of a file share one slot, so racing doesn't exceed the number of files transferred at once
+        with pipeline.transfer_slot():
+            result = race_data_transfers(transfers[:race], output_path, limiter, race_probe_seconds)
+
+        for report in result.failed_reports:
+            logger.warn("Transfer of %s failed", report.url)
+            send_report(report)
+
+        if result.report:
+            transfer_succeeded(result.report)
+            return True
+
+        # Cancelled transfers did not fail, so they can still be tried one at a time
+        transfers = result.cancelled_transfers + transfers[race:]
+
+    for i, t in enumerate(transfers):
+        # Slow transfers are only abandoned if there is another source to fall back to
+        min_transfer_rate = minimum_transfer_rate(t) if i < len(transfers) - 1 else None
+
+        with pipeline.transfer_slot(), limiter.connection(t.url):
+            report = run_data_transfer(t, output_path, display_output, min_transfer_rate=min_transfer_rate,
+                                       verify=False)
+
+        if report.success:
+            with pipeline.verification_slot():
+                finish_data_transfer(t, output_path, report)
+
+        if report.success:
+            transfer_succeeded(report)
+            return True
+        else:
+            logger.warn("Transfer of %s failed", url)
+            send_report(report)
+
+    logger.error("Failed to transfer %s", url)
+    return False
+
+
+def start_transfers(urls, destination_directory, executor, limiter, reports_file=None, display_output=True,
+                    dry_run=False, race=1, race_probe_seconds=DEFAULT_PROBE_SECONDS,
+                    resolve_transfers=get_transfers_for_urls, pipeline=None):
+    """
+    Resolve transfers for URLs and submit a transfer of each file to an executor.
+
+    Parameters:
+    urls - String[] - URLs of files to transfer.
+    destination_directory - String - Directory to save transferred files in.
+    executor - Executor - Runs transfers. Only submit is used.
+    limiter - HostConnectionLimiter - Limits the number of simultaneous transfers from each host.
+    reports_file - ReportsFile - File to record successful transfers in. May be None.
+    display_output - Boolean - Display mechanism output as transfers run.
+    dry_run - Boolean - Only display transfers for each URL.
+    race - Integer - Number of transfers to start at once, keeping the fastest. See race_data_transfers.
+    race_probe_seconds - Float - How long to run raced transfers before choosing one.
+    resolve_transfers - Function - Called with a list of URLs and a list of available mechanisms.
+        Returns (URL, Transfer[]) pairs. See get_transfers_for_urls.
+    pipeline - TransferPipeline - Limits the number of simultaneous transfers and verifications. See transfer_file.
+
+    Returns:
+    (String, Future)[] - Each URL being transferred and a future for the result of transfer_file.
+    """
+    # Transfers are resolved in the calling thread so that any prompts for user input options
+    # happen one at a time. Only running the transfers is handed off to the executor.
+    output_paths = dict(_output_paths(urls, destination_directory))
+
+    pending = []
+    for url, transfers in resolve_transfers(list(output_paths.keys()), available_mechanisms()):
         logger.info("%d transfer(s) for %s", len(transfers), url)
         logger.info("------------------")
         for t in transfers:
             logger.info(str(t))
 
-        if args.dry_run:
+        if dry_run:
             continue
 
-        transfer_success = False
-        for t in transfers:
-            report = run_data_transfer(t, output_path)
-
-            if report.success:
-                transfer_success = True
-                logger.info("Transfer successful")
-                logger.debug(report)
-                send_report(report)
-                if reports_file:
-                    reports_file.write_report(report)
-                break
-            else:
-                logger.warn("Transfer failed")
-                send_report(report)
-
-        if not transfer_success:
-            logger.error("Failed to transfer file")
+        pending.append((url, executor.submit(transfer_file, url, transfers, output_paths[url], reports_file, limiter,
+                                             display_output and race <= 1, race, race_probe_seconds, pipeline)))
+
+    return pending
+
+
+def handle_local_action(args, parser, reports_file):
+    num_jobs = max(args.jobs, 1)
+    verify_jobs = max(args.verify_jobs, 1)
+    limiter = HostConnectionLimiter(args.max_per_host if num_jobs > 1 else None)
+    pipeline = TransferPipeline(num_jobs, verify_jobs)
+
+    # Mechanism output from simultaneous transfers would be interleaved, so only display it
+    # when transferring one file at a time.
+    display_output = num_jobs == 1
+
+    # Workers waiting to verify a file don't hold a transfer slot, so there are enough workers
+    # to fill every transfer and verification slot at once.
+    with ThreadPoolExecutor(max_workers=num_jobs + verify_jobs) as executor:
+        pending = start_transfers(args.urls, args.destination_directory, executor, limiter, reports_file,
+                                  display_output, args.dry_run, args.race, args.race_probe_seconds,
+                                  pipeline=pipeline)
+
+    for url, future in pending:
+        if future.exception():
+            logger.error("Error while transferring %s", url)
+            logger.error(future.exception())
+
+
+def handle_agent_action(args, parser, reports_file):
+    logger.info("Sending transfers to agent at %s", agent_socket_path)
+
+    # --jobs, --max-per-host and --verify-jobs are ignored. The agent's own limits apply across all of its clients.
+    request = dict(
+        action="transfer",
+        urls=args.urls,
+        destination=os.path.abspath(args.destination_directory),
+        dry_run=args.dry_run,
+        race=args.race,
+        race_probe_seconds=args.race_probe_seconds
+    )
+
+    for event in send_request(agent_socket_path, request):
+        if event["event"] == "log":
+            logger.log(event["level"], event["message"])
+        elif event["event"] == "report" and reports_file:
+            reports_file.write_report(TransferReport(url=event["url"],
+                                                     size=event["size"],
+                                                     duration=event["duration"],
+                                                     success=True,
+                                                     mechanism_name=event["mechanism_name"],
+                                                     mechanism_options=event["mechanism_options"]))
+        elif event["event"] == "error":
+            raise Exception(event["message"])
+
 
 def handle_action(args, parser):
     if args.manifest_file:
@@ -170,7 +478,9 @@ def handle_action(args, parser):
     os.makedirs(args.destination_directory, exist_ok=True)
     reports_file = ReportsFile(args.report_file) if args.report_file else None
 
-    if dtn_host:
+    if dtn_hosts:
         handle_dtn_action(args, parser, reports_file)
+    elif not args.no_agent and is_agent_running(agent_socket_path):
+        handle_agent_action(args, parser, reports_file)
     else:
         handle_local_action(args, parser, reports_file)
@@ -0,0 +1,363 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Long running agent that transfers files for other bdss processes.
+
+Clients connect to the agent's Unix socket and send one JSON object per line. The agent replies with
+a stream of JSON events, one per line, ending with a "done" event.
+
+Requests:
+{"action": "ping"}
+{"action": "transfer", "urls": [...], "destination": "/path", "dry_run": false, "race": 1, "race_probe_seconds": 10}
+
+Events:
+{"event": "pong"}
+{"event": "log", "level": 20, "message": "..."}
+{"event": "report", "url": "...", "size": 1024, "duration": 1.5, "mechanism_name": "...", "mechanism_options": {}}
+{"event": "result", "url": "...", "success": true}
+{"event": "done", "success": true}
+{"event": "error", "message": "..."}
+"""
+
+import copy
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .transfer.base import Transfer
+
+
+logger = logging.getLogger("bdss")
+
+
+# How long (in seconds) transfers resolved by the metadata repository are reused for
+TRANSFER_CACHE_TTL = 300
+
+
+def _transfer_result(transfer):
+    """
+    The parts of a transfer resolved by the metadata repository, in the same form as the repository's results.
+    """
+    return dict(url=transfer.url,
+                mechanism_name=transfer.mechanism_name,
+                mechanism_options=copy.deepcopy(transfer.mechanism_options),
+                data_source_id=transfer.data_source_id,
+                expected_transfer_rate=transfer.expected_transfer_rate,
+                file_checksum=transfer.file_checksum)
+
+
+_job_context = threading.local()
+
+
+def current_job():
+    """
+    The agent job that the current thread is working on, or None.
+    """
+    return getattr(_job_context, "job", None)
+
+
+class _JobLogHandler(logging.Handler):
+    """
+    Forward log messages to the client of the job that the logging thread is working on.
+    """
+
+    def emit(self, record):
+        job = current_job()
+        if job:
+            try:
+                job.send_event(event="log", level=record.levelno, message=self.format(record))
+            except:
+                pass
+
+
+class AgentJob():
+    """
+    A request from one client connection.
+    """
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._lock = threading.Lock()
+
+    def send_event(self, **event):
+        with self._lock:
+            self._wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+            self._wfile.flush()
+
+    def write_report(self, report):
+        """
+        Forward a successful transfer to the client so it can record it in its reports file.
+        Lets a job stand in for a ReportsFile.
+        """
+        self.send_event(event="report",
+                        url=report.url,
+                        size=report.size,
+                        duration=report.duration,
+                        mechanism_name=report.mechanism_name,
+                        mechanism_options=report.mechanism_options)
+
+
+class _JobExecutor():
+    """
+    Submit work to the agent's shared executor on behalf of a job, so that log messages
+    from that work are sent to the job's client.
+    """
+
+    def __init__(self, executor, job):
+        self._executor = executor
+        self._job = job
+
+    def _run(self, fn, *args, **kwargs):
+        _job_context.job = self._job
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _job_context.job = None
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(self._run, fn, *args, **kwargs)
+
+
+class Agent():
+    """
+    Runs transfer jobs with a shared pool of workers, host connection limits, and cache of resolved transfers.
+    """
+
+    def __init__(self, max_jobs=4, max_per_host=2, max_verify_jobs=2, transfer_cache_ttl=TRANSFER_CACHE_TTL):
+        """
+        Parameters:
+        max_jobs - Integer - Maximum number of files to transfer at once, across all jobs.
+        max_per_host - Integer - Maximum number of simultaneous transfers from a single host, across all jobs.
+        max_verify_jobs - Integer - Maximum number of files to verify at once, across all jobs.
+        transfer_cache_ttl - Float - How long (in seconds) to reuse transfers resolved by the metadata repository.
+        """
+        from .transfer.concurrency import HostConnectionLimiter, TransferPipeline
+
+        max_jobs = max(max_jobs, 1)
+        max_verify_jobs = max(max_verify_jobs, 1)
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs + max_verify_jobs)
+        self.limiter = HostConnectionLimiter(max_per_host)
+        self.pipeline = TransferPipeline(max_jobs, max_verify_jobs)
+        self.transfer_cache_ttl = transfer_cache_ttl
+
+        self._transfers_cache = {}
+        # Transfers are resolved one job at a time so that any prompts for user input options
+        # are not interleaved and are only asked once per data source.
+        self._resolve_lock = threading.Lock()
+
+    def resolve_transfers(self, urls, mechanisms):
+        """
+        Get transfers for URLs, reusing recently resolved transfers.
+        Has the same interface as transfer_action.get_transfers_for_urls.
+
+        Transfers hold the state of a running transfer, so only the repository's results are cached
+        and each job gets its own Transfer objects.
+        """
+        from .actions.transfer_action import _transfer_from_result, get_transfers_for_urls
+
+        with self._resolve_lock:
+            now = time.time()
+            self._transfers_cache = {url: entry for url, entry in self._transfers_cache.items()
+                                     if now - entry[0] < self.transfer_cache_ttl}
+
+            uncached_urls = [url for url in urls if url not in self._transfers_cache]
+            if uncached_urls:
+                for url, transfers in get_transfers_for_urls(uncached_urls, mechanisms):
+                    # Don't remember the fallback to the original URL. It may be because the repository could not be reached.
+                    if transfers != [Transfer(url)]:
+                        self._transfers_cache[url] = (now, [_transfer_result(t) for t in transfers])
+                    yield (url, transfers)
+
+            for url in urls:
+                if url not in uncached_urls:
+                    logger.info("Using cached transfers for %s", url)
+                    yield (url, [_transfer_from_result(copy.deepcopy(r)) for r in self._transfers_cache[url][1]])
+
+    def run_transfer_job(self, job, request):
+        """
+        Transfer files for a client.
+
+        Parameters:
+        job - AgentJob - The client's job.
+        request - Dictionary - The client's transfer request.
+
+        Returns:
+        Boolean - True if all files were transferred.
+        """
+        from .actions.transfer_action import start_transfers
+        from .transfer.race import DEFAULT_PROBE_SECONDS
+
+        destination_directory = request["destination"]
+        os.makedirs(destination_directory, exist_ok=True)
+
+        pending = start_transfers(request["urls"], destination_directory,
+                                  _JobExecutor(self.executor, job), self.limiter,
+                                  reports_file=job,
+                                  display_output=False,
+                                  dry_run=request.get("dry_run", False),
+                                  race=request.get("race", 1),
+                                  race_probe_seconds=request.get("race_probe_seconds", DEFAULT_PROBE_SECONDS),
+                                  resolve_transfers=self.resolve_transfers,
+                                  pipeline=self.pipeline)
+
+        success = True
+        for url, future in pending:
+            try:
+                transferred = future.result()
+            except Exception as e:
+                logger.error("Error while transferring %s", url)
+                logger.error(e)
+                transferred = False
+
+            job.send_event(event="result", url=url, success=transferred)
+            success = success and transferred
+
+        return success
+
+    def handle_request(self, job, request):
+        action = request.get("action")
+        if action == "ping":
+            job.send_event(event="pong")
+        elif action == "transfer":
+            _job_context.job = job
+            try:
+                success = self.run_transfer_job(job, request)
+            finally:
+                _job_context.job = None
+            job.send_event(event="done", success=success)
+        else:
+            job.send_event(event="error", message="Unknown action \"%s\"" % action)
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+
+            job = AgentJob(self.wfile)
+            try:
+                request = json.loads(line.decode("utf-8"))
+                self.server.agent.handle_request(job, request)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                logger.debug(traceback.format_exc())
+                job.send_event(event="error", message=str(e))
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, agent):
+        self.agent = agent
+        super().__init__(socket_path, _AgentRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+
+def run_agent(socket_path, agent):
+    """
+    Serve requests on a Unix socket until interrupted.
+
+    Parameters:
+    socket_path - String - Path of the socket to listen on.
+    agent - Agent
+    """
+    if os.path.exists(socket_path):
+        if is_agent_running(socket_path):
+            raise Exception("An agent is already listening on %s" % socket_path)
+        os.remove(socket_path)
+
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+
+    job_log_handler = _JobLogHandler()
+    job_log_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(job_log_handler)
+
+    server = AgentServer(socket_path, agent)
+    logger.info("Agent listening on %s", socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        logger.removeHandler(job_log_handler)
+        os.remove(socket_path)
+        agent.executor.shutdown(wait=False)
+
+
+def _connect(socket_path, timeout=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except:
+        sock.close()
+        raise
+    return sock
+
+
+def send_request(socket_path, request):
+    """
+    Send a request to an agent.
+
+    Parameters:
+    socket_path - String - Path of the agent's socket.
+    request - Dictionary
+
+    Returns:
+    Generator of Dictionary - Events sent by the agent, up to and including the "done", "pong" or "error" event.
+    """
+    with _connect(socket_path) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as events:
+            for line in events:
+                event = json.loads(line.decode("utf-8"))
+                yield event
+                if event["event"] in ("done", "pong", "error"):
+                    return
+
+
+def is_agent_running(socket_path):
+    """
+    Check if an agent is listening on a socket.
+
+    Parameters:
+    socket_path - String - Path of the agent's socket.
+
+    Returns:
+    Boolean
+    """
+    if not os.path.exists(socket_path):
+        return False
+
+    try:
+        with _connect(socket_path, timeout=1) as sock:
+            sock.sendall(b"{\"action\": \"ping\"}\n")
+            with sock.makefile("rb") as events:
+                return json.loads(events.readline().decode("utf-8"))["event"] == "pong"
+    except:
+        return False
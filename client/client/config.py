@@ -18,20 +18,26 @@
 
 import configparser
 import os
-from pkg_resources import resource_string
 
 
 config = configparser.ConfigParser()
-config.read_string(resource_string(__name__, "defaults.cfg").decode("utf-8"))
+# Read bundled defaults relative to this file instead of through pkg_resources, which is slow to import
+config.read(os.path.join(os.path.dirname(os.path.abspath(__file__)), "defaults.cfg"))
 config.read(["/etc/bdss.cfg", os.path.expanduser("~/.bdss.cfg"), "bdss.cfg"])
 
 
 CONFIGURABLE_OPTIONS = [
     "metadata_repository.url",
+    "metadata_repository.local_routing",
+    "metadata_repository.configuration_max_age",
     "client.location",
     "dtn.host",
     "dtn.user",
-    "dtn.path"
+    "dtn.path",
+    "watchdog.min_rate",
+    "watchdog.min_rate_fraction",
+    "watchdog.window",
+    "agent.socket"
 ]
 
 
@@ -74,8 +80,21 @@ def clear_config(key):
 
 metadata_repository_url = get_config("metadata_repository.url").rstrip("/")
 
+# Find transfers using a cached copy of the metadata repository's configuration instead of asking the repository
+local_routing = config.getboolean("metadata_repository", "local_routing", fallback=False)
+# How long (in seconds) to use the cached configuration before checking if it has changed
+configuration_max_age = config.getfloat("metadata_repository", "configuration_max_age", fallback=300)
+
 client_destination = get_config("client.location")
 
 dtn_host = get_config("dtn.host")
+# dtn.host may be a comma separated list of several DTNs
+dtn_hosts = [host.strip() for host in (dtn_host or "").split(",") if host.strip()]
 dtn_path = get_config("dtn.path")
 dtn_user = get_config("dtn.user")
+
+watchdog_min_rate = config.getfloat("watchdog", "min_rate", fallback=None)
+watchdog_min_rate_fraction = config.getfloat("watchdog", "min_rate_fraction", fallback=None)
+watchdog_window = config.getfloat("watchdog", "window", fallback=60)
+
+agent_socket_path = os.path.expanduser(get_config("agent.socket"))
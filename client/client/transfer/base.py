@@ -35,7 +35,8 @@ _user_options_cache = {}
 
 class Transfer():
 
-    def __init__(self, url=None, mechanism_name=None, mechanism_options=None, data_source_id=None):
+    def __init__(self, url=None, mechanism_name=None, mechanism_options=None, data_source_id=None,
+                 expected_transfer_rate=None, file_checksum=None):
         """
 
         Parameters:
@@ -44,6 +45,8 @@ class Transfer():
         mechanism_options - dict -
         data_source_id - String - If provided, user options will be cached such that multiple transfers
             from the same data source only prompt the first time.
+        expected_transfer_rate - Float - Transfer rate (bytes/second) the metadata repository expects for this transfer.
+        file_checksum - String - MD5 checksum of the file, if known by the metadata repository.
         """
         self.url = url
         self.mechanism_name = mechanism_name
@@ -61,6 +64,10 @@ class Transfer():
 
         self.data_source_id = data_source_id
 
+        self.expected_transfer_rate = expected_transfer_rate
+
+        self.file_checksum = file_checksum
+
         self.mechanism = get_mechanism(self.mechanism_name, self.mechanism_options)
 
         if self.data_source_id:
@@ -78,18 +85,35 @@ class Transfer():
 
         self.mechanism.update_options(self.mechanism_user_opts)
 
-    def run(self, output_path, display_output=True):
+    @property
+    def can_resume(self):
+        return self.mechanism.can_resume()
+
+    @property
+    def bytes_transferred(self):
+        """
+        Number of bytes transferred by the running transfer, if the mechanism tracks it. Otherwise None.
+        """
+        return self.mechanism.bytes_transferred
+
+    def run(self, output_path, display_output=True, resume=False, cancel_event=None):
         """
         Run transfer.
 
         Parameters:
         output_path - String - The path to save the transferred file to.
         display_output - Boolean - Display mechanism output as transfer runs.
+        resume - Boolean - Continue a partial transfer to output_path. Requires the mechanism to support resuming.
+        cancel_event - threading.Event - If given, the transfer is stopped when this event is set.
 
         Returns:
         (Boolean, String) - Tuple of (True/False for success/failure, Mechanism output)
         """
-        return self.mechanism.transfer_file(self.url, output_path, display_output)
+        self.mechanism.cancel_event = cancel_event
+        if resume:
+            return self.mechanism.resume_transfer_file(self.url, output_path, display_output)
+        else:
+            return self.mechanism.transfer_file(self.url, output_path, display_output)
 
     def get_data(self, display_output=True):
         """
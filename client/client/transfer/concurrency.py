@@ -0,0 +1,106 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class HostConnectionLimiter():
+    """
+    Limit the number of simultaneous transfers from each remote host.
+
+    Transfers are grouped by the hostname of their URL so that running many transfers in
+    parallel does not open more connections to a single server than it allows.
+    """
+
+    def __init__(self, max_per_host=None):
+        """
+        Parameters:
+        max_per_host - Integer - Maximum number of simultaneous transfers per host. None for no limit.
+        """
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _semaphore_for_url(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            try:
+                return self._semaphores[host]
+            except KeyError:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = semaphore
+                return semaphore
+
+    @contextmanager
+    def connection(self, url):
+        """
+        Context manager that blocks until a connection to the URL's host is available.
+
+        Parameters:
+        url - String - URL that will be transferred
+        """
+        if not self.max_per_host:
+            yield
+            return
+
+        semaphore = self._semaphore_for_url(url)
+        with semaphore:
+            yield
+
+
+class TransferPipeline():
+    """
+    Limit the number of files being transferred and the number being verified at once.
+
+    Transferring and verifying are separate stages, so a file can be verified while the
+    next file is transferred instead of the network sitting idle.
+    """
+
+    def __init__(self, max_transfers=None, max_verifications=None):
+        """
+        Parameters:
+        max_transfers - Integer - Maximum number of simultaneous transfers. None for no limit.
+        max_verifications - Integer - Maximum number of simultaneous verifications. None for no limit.
+        """
+        self.max_transfers = max_transfers
+        self.max_verifications = max_verifications
+        self._transfer_semaphore = threading.BoundedSemaphore(max_transfers) if max_transfers else None
+        self._verification_semaphore = threading.BoundedSemaphore(max_verifications) if max_verifications else None
+
+    @contextmanager
+    def _slot(self, semaphore):
+        if not semaphore:
+            yield
+            return
+
+        with semaphore:
+            yield
+
+    def transfer_slot(self):
+        """
+        Context manager that blocks until another transfer can start.
+        """
+        return self._slot(self._transfer_semaphore)
+
+    def verification_slot(self):
+        """
+        Context manager that blocks until another verification can start.
+        """
+        return self._slot(self._verification_semaphore)
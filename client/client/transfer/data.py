@@ -16,30 +16,150 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import json
 import logging
 import os
+import threading
 import time
 
 from .reporting import TransferReport
 from .verification import verify_data_transfer
-from ..util import calculate_file_checksum
+from .watchdog import ThroughputWatchdog
+from ..util import calculate_file_checksum, record_file_checksum
 
 
 logger = logging.getLogger("bdss")
 
 
-def run_data_transfer(transfer, output_path):
+def partial_file_path(output_path):
+    """
+    Path that a file is written to until it has been transferred and verified.
+
+    The partial file keeps the extension of the output file, since some verification methods depend on it.
+    """
+    (root, ext) = os.path.splitext(output_path)
+    return root + ".part" + ext
+
+
+def _partial_state_path(output_path):
+    return partial_file_path(output_path) + ".json"
+
+
+def _read_partial_state(output_path):
+    """
+    Read the record of previous attempts to transfer a file.
+
+    Returns:
+    dict - State saved by _write_partial_state, or None if there is no partial transfer to output_path
+    """
+    if not os.path.isfile(partial_file_path(output_path)):
+        return None
+
+    try:
+        with open(_partial_state_path(output_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_partial_state(output_path, transfer):
+    with open(_partial_state_path(output_path), "w") as f:
+        json.dump({
+            "url": transfer.url,
+            "mechanism_name": transfer.mechanism_name,
+            "updated_at": time.time()
+        }, f)
+
+
+def has_partial_transfer(output_path):
+    """
+    Check if an earlier attempt left a partial file that a transfer to output_path could resume.
+    """
+    return _read_partial_state(output_path) is not None
+
+
+def remove_partial_files(output_path):
+    for path in (partial_file_path(output_path), _partial_state_path(output_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _bytes_transferred(transfer, partial_path):
+    if transfer.bytes_transferred is not None:
+        return transfer.bytes_transferred
+    try:
+        return os.stat(partial_path).st_size
+    except OSError:
+        return 0
+
+
+def finish_data_transfer(transfer, output_path, report):
+    """
+    Verify a transferred file and move it from its partial file to output_path.
+    If verification fails, the partial file is removed and the report is marked as failed.
+
+    Parameters:
+    transfer - Transfer - Data file Transfer.
+    output_path - String - The path the file was transferred to.
+    report - TransferReport - Report from run_data_transfer. Updated with verification results.
+
+    Returns:
+    TransferReport - The updated report.
+    """
+    partial_path = partial_file_path(output_path)
+    report.verification = verify_data_transfer(transfer, partial_path)
+
+    if any(v.result is False for v in report.verification):
+        logger.warn("Transferred file failed verification")
+        report.success = False
+        remove_partial_files(output_path)
+    else:
+        os.replace(partial_path, output_path)
+        os.remove(_partial_state_path(output_path))
+        if report.checksum:
+            record_file_checksum("md5", output_path, report.checksum)
+
+    return report
+
+
+def run_data_transfer(transfer, output_path, display_output=True, cancel_event=None, min_transfer_rate=None,
+                      verify=True):
     """
     Transfer a data file and generate report.
 
+    The file is written to a partial file next to output_path. If a partial file was left by an earlier
+    attempt and the transfer's mechanism supports it, the transfer continues from the end of that file.
+    The file is only moved to output_path once it has been transferred and passed verification.
+
     Parameters:
     transfer - Transfer - Data file Transfer.
     output_path - String - The path to save the downloaded file to.
+    display_output - Boolean - Display mechanism output as transfer runs.
+    cancel_event - threading.Event - If given, the transfer is stopped when this event is set.
+    min_transfer_rate - Float - If given, the transfer is stopped if its rate (bytes/second) stays below this.
+    verify - Boolean - Verify the file after it is transferred. If False, the file is left in its partial file
+        and finish_data_transfer must be called with the report to verify it.
 
     Returns:
     TransferReport - Report describing result of transfer.
     """
-    logger.info("Transferring %s with %s", transfer.url, transfer.mechanism_name)
+    partial_path = partial_file_path(output_path)
+
+    resume = False
+    resumed_size = 0
+    if has_partial_transfer(output_path):
+        if transfer.can_resume:
+            resume = True
+            resumed_size = os.stat(partial_path).st_size
+        else:
+            remove_partial_files(output_path)
+
+    if resume:
+        logger.info("Resuming transfer of %s with %s from %d bytes", transfer.url, transfer.mechanism_name, resumed_size)
+    else:
+        logger.info("Transferring %s with %s", transfer.url, transfer.mechanism_name)
 
     report = TransferReport()
     report.url = transfer.url
@@ -47,26 +167,48 @@ def run_data_transfer(transfer, output_path):
     report.mechanism_options = transfer.mechanism_options
     report.success = False
 
+    _write_partial_state(output_path, transfer)
+
+    watchdog = None
+    if min_transfer_rate:
+        cancel_event = cancel_event or threading.Event()
+        watchdog = ThroughputWatchdog(lambda: _bytes_transferred(transfer, partial_path), min_transfer_rate, cancel_event)
+        watchdog.start()
+
     start_time = time.time()
 
     try:
-        (report.success, report.mechanism_output) = transfer.run(output_path)
+        (report.success, report.mechanism_output) = transfer.run(partial_path, display_output, resume, cancel_event)
     except Exception:
         logger.exception("Exception in transfer mechanism")
     finally:
         report.duration = time.time() - start_time
 
+        if watchdog:
+            watchdog.stop()
+            if watchdog.abort_reason:
+                report.success = False
+                report.abort_reason = watchdog.abort_reason
+
         report.file_size = 0
         report.checksum = None
 
-        if os.path.isfile(output_path):
-            report.size = os.stat(output_path).st_size
-            report.checksum = calculate_file_checksum("md5", output_path)
+        if os.path.isfile(partial_path):
+            # Only count bytes transferred in this attempt, so that the reported rate is not inflated by
+            # the part of the file transferred by earlier attempts.
+            report.size = max(os.stat(partial_path).st_size - resumed_size, 0)
+            # Checksums are cached, so verification methods using the same algorithm will not read the file again
+            report.checksum = calculate_file_checksum("md5", partial_path)
 
         if report.success:
             logger.info("Success. Transferred %d bytes in %d seconds", report.size, report.duration)
-            report.verification = verify_data_transfer(transfer, output_path)
+            if verify:
+                finish_data_transfer(transfer, output_path, report)
         else:
             logger.warn("Unable to transfer file")
 
+            # If resuming made no progress, the partial file may be unusable. Start over on the next attempt.
+            if resume and (not os.path.isfile(partial_path) or os.stat(partial_path).st_size <= resumed_size):
+                remove_partial_files(output_path)
+
     return report
@@ -0,0 +1,353 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .reporting import TransferReport
+
+
+logger = logging.getLogger("bdss")
+
+
+# Number of files to copy back from the DTN at once
+COPY_JOBS = 2
+
+# Default directory on the DTN to download files into
+DEFAULT_DTN_PATH = "/tmp"
+
+
+class SSHConnection():
+    """
+    A multiplexed SSH connection to a remote host.
+
+    One master connection is opened and every command and copy runs over it, so authentication
+    and connection setup only happen once.
+    """
+
+    def __init__(self, host, user=None):
+        """
+        Parameters:
+        host - String - Remote hostname.
+        user - String - User to log in as. If not given, SSH's default is used.
+        """
+        self.destination = "%s@%s" % (user, host) if user else host
+        self._control_directory = None
+        self.control_path = None
+
+    def _ssh_args(self):
+        return ["ssh", "-o", "ControlPath=%s" % self.control_path]
+
+    def open(self):
+        self._control_directory = tempfile.mkdtemp(prefix="bdss-ssh-")
+        self.control_path = os.path.join(self._control_directory, "control")
+
+        # Start a master connection in the background
+        returncode = subprocess.call(self._ssh_args() + ["-o", "ControlMaster=yes", "-o", "ControlPersist=yes",
+                                                         "-f", "-N", self.destination])
+        if returncode != 0:
+            self.close()
+            raise Exception("Unable to connect to %s" % self.destination)
+
+    def close(self):
+        if self.control_path and os.path.exists(self.control_path):
+            subprocess.call(self._ssh_args() + ["-O", "exit", self.destination],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        if self._control_directory:
+            shutil.rmtree(self._control_directory, ignore_errors=True)
+            self._control_directory = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def popen(self, command, **kwargs):
+        """
+        Start a command on the remote host.
+
+        Parameters:
+        command - String - Shell command to run.
+        **kwargs - Passed to subprocess.Popen.
+
+        Returns:
+        subprocess.Popen
+        """
+        return subprocess.Popen(self._ssh_args() + [self.destination, command], **kwargs)
+
+    def run(self, command, input_data=None):
+        """
+        Run a command on the remote host and wait for it to finish.
+
+        Parameters:
+        command - String - Shell command to run.
+        input_data - Bytes - Data to write to the command's standard input.
+
+        Returns:
+        Boolean - True if the command succeeded.
+        """
+        process = self.popen(command, stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL)
+        process.communicate(input_data)
+        return process.returncode == 0
+
+    def copy_from(self, remote_path, local_path):
+        """
+        Copy a file from the remote host. The local file only appears once the copy is complete.
+
+        Parameters:
+        remote_path - String - Path of the file on the remote host.
+        local_path - String - Path to save the file to.
+
+        Returns:
+        Boolean - True if the file was copied.
+        """
+        partial_path = local_path + ".dtn"
+        with open(partial_path, "wb") as f:
+            process = self.popen("cat -- %s" % shlex.quote(remote_path), stdin=subprocess.DEVNULL, stdout=f)
+            process.wait()
+
+        if process.returncode == 0:
+            os.replace(partial_path, local_path)
+            return True
+        else:
+            os.remove(partial_path)
+            return False
+
+
+def _parse_report_line(line):
+    """
+    Parse a row written by the DTN's ReportsFile.
+
+    Returns:
+    (String, Float, Integer) - URL, duration and size of the transfer. None if the line is not a report.
+    """
+    try:
+        (url, duration, size, rate) = line.rstrip("\n").rsplit(",", 3)
+        return (url, float(duration), int(size))
+    except ValueError:
+        return None
+
+
+def transfer_files_with_dtn(files, connection, dtn_path=None, reports_file=None, copy_jobs=COPY_JOBS):
+    """
+    Transfer files by downloading them to a data transfer node (DTN) with BDSS and copying them back.
+
+    The list of URLs is written to a manifest file on the DTN. As each file finishes downloading there,
+    it is copied back and removed from the DTN while the other files continue to download.
+
+    Parameters:
+    files - (String, String)[] - URL of each file to transfer and local path to save it to.
+    connection - SSHConnection - Open connection to the DTN.
+    dtn_path - String - Directory on the DTN to download files into.
+    reports_file - ReportsFile - File to record successful transfers in. May be None.
+    copy_jobs - Integer - Number of files to copy back from the DTN at once.
+
+    Returns:
+    (String[], Boolean) - URLs of files that were transferred and whether BDSS ran successfully on the DTN.
+    """
+    output_paths = dict(files)
+
+    remote_directory = "%s/bdss-%s" % ((dtn_path or DEFAULT_DTN_PATH).rstrip("/"), uuid.uuid4().hex)
+    remote_files_directory = remote_directory + "/files"
+    manifest_path = remote_directory + "/manifest.txt"
+
+    if not connection.run("mkdir -p %s" % shlex.quote(remote_files_directory)):
+        raise Exception("Unable to create directory %s on DTN" % remote_directory)
+
+    transferred_urls = []
+
+    def copy_file(url, duration, size):
+        output_path = output_paths[url]
+        remote_path = "%s/%s" % (remote_files_directory, os.path.basename(output_path))
+
+        logger.info("Copying %s from DTN", url)
+        copied = connection.copy_from(remote_path, output_path)
+        connection.run("rm -f -- %s" % shlex.quote(remote_path))
+
+        if not copied:
+            logger.error("Failed to copy %s from DTN", url)
+            return
+
+        logger.info("Copied %s from DTN", url)
+        transferred_urls.append(url)
+        if reports_file:
+            reports_file.write_report(TransferReport(url=url, size=size, duration=duration, success=True))
+
+    try:
+        connection.run("cat > %s" % shlex.quote(manifest_path), input_data="\n".join(output_paths.keys()).encode("utf-8"))
+
+        # Reports of finished files are written to file descriptor 3, which is redirected to the remote command's
+        # standard output. Log messages go to standard error and are passed through.
+        bdss_command = "bdss --no-color transfer --destination %s --transfer-report /dev/fd/3 %s 3>&1 1>&2" % (
+            shlex.quote(remote_files_directory), shlex.quote(manifest_path))
+
+        logger.info("Initiating transfer with DTN: %s", connection.destination)
+        with ThreadPoolExecutor(max_workers=copy_jobs) as executor:
+            process = connection.popen(bdss_command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       universal_newlines=True)
+            for line in process.stdout:
+                report = _parse_report_line(line)
+                if report and report[0] in output_paths:
+                    executor.submit(copy_file, *report)
+            process.wait()
+
+        if process.returncode != 0:
+            logger.error("BDSS failed on DTN %s", connection.destination)
+
+    finally:
+        logger.info("Removing files from DTN...")
+        connection.run("rm -rf -- %s" % shlex.quote(remote_directory))
+
+    return (transferred_urls, process.returncode == 0)
+
+
+def estimate_file_sizes(urls, jobs=8):
+    """
+    Get the size of files from the Content-Length of HEAD requests.
+
+    Parameters:
+    urls - String[] - URLs of files. Only HTTP(S) URLs are checked.
+    jobs - Integer - Number of requests to make at once.
+
+    Returns:
+    Dictionary - Size of each file in bytes, keyed by URL. None if the size could not be found.
+    """
+    import requests
+
+    def file_size(url):
+        if urlparse(url).scheme not in ("http", "https"):
+            return None
+        try:
+            response = requests.head(url, allow_redirects=True, timeout=10)
+            response.raise_for_status()
+            return int(response.headers["Content-Length"])
+        except:
+            return None
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return dict(zip(urls, executor.map(file_size, urls)))
+
+
+def assign_files_to_hosts(urls, sizes, hosts, excluded_hosts=None):
+    """
+    Split files between hosts so that each host transfers about the same number of bytes.
+    The largest files are assigned first, each to the host with the least assigned so far.
+
+    Parameters:
+    urls - String[] - URLs of files to assign.
+    sizes - Dictionary - Size of each file, keyed by URL. Files with unknown size are assumed to be the
+        average size of the known files.
+    hosts - String[] - Hosts to assign files to.
+    excluded_hosts - Dictionary - Set of hosts not to assign each URL to, keyed by URL.
+
+    Returns:
+    Dictionary - URLs assigned to each host, keyed by host. URLs that could not be assigned to any host are
+        not included.
+    """
+    known_sizes = [size for size in sizes.values() if size is not None]
+    default_size = sum(known_sizes) / len(known_sizes) if known_sizes else 1
+    excluded_hosts = excluded_hosts or {}
+
+    assignments = {host: [] for host in hosts}
+    loads = {host: 0 for host in hosts}
+    for url in sorted(urls, key=lambda url: sizes.get(url) if sizes.get(url) is not None else default_size,
+                      reverse=True):
+        candidate_hosts = [host for host in hosts if host not in excluded_hosts.get(url, ())]
+        if not candidate_hosts:
+            continue
+
+        host = min(candidate_hosts, key=lambda host: loads[host])
+        assignments[host].append(url)
+        loads[host] += sizes.get(url) if sizes.get(url) is not None else default_size
+
+    return {host: assigned_urls for host, assigned_urls in assignments.items() if assigned_urls}
+
+
+def transfer_files_with_dtns(files, hosts, user=None, dtn_path=None, reports_file=None, copy_jobs=COPY_JOBS):
+    """
+    Transfer files using a pool of data transfer nodes (DTNs). See transfer_files_with_dtn.
+
+    Files are split between the DTNs by expected size. Files that fail on one DTN are retried on
+    another. A DTN that can't be reached or fails to run BDSS is not used again.
+
+    Parameters:
+    files - (String, String)[] - URL of each file to transfer and local path to save it to.
+    hosts - String[] - Hostnames of DTNs.
+    user - String - User to log in to the DTNs as.
+    dtn_path - String - Directory on the DTNs to download files into.
+    reports_file - ReportsFile - File to record successful transfers in. May be None.
+    copy_jobs - Integer - Number of files to copy back from each DTN at once.
+
+    Returns:
+    String[] - URLs of files that were transferred.
+    """
+    output_paths = dict(files)
+    sizes = estimate_file_sizes(list(output_paths.keys())) if len(hosts) > 1 else {}
+
+    available_hosts = list(hosts)
+    tried_hosts = {url: set() for url in output_paths.keys()}
+    remaining_urls = list(output_paths.keys())
+    transferred_urls = []
+
+    def transfer_with_host(host, urls):
+        try:
+            with SSHConnection(host, user) as connection:
+                return transfer_files_with_dtn([(url, output_paths[url]) for url in urls],
+                                               connection, dtn_path, reports_file, copy_jobs)
+        except Exception as e:
+            logger.error("Transfer with DTN %s failed", host)
+            logger.error(e)
+            return ([], False)
+
+    while remaining_urls and available_hosts:
+        assignments = assign_files_to_hosts(remaining_urls, sizes, available_hosts, tried_hosts)
+        if not assignments:
+            break
+
+        for host, urls in assignments.items():
+            logger.info("Transferring %d file(s) with DTN %s", len(urls), host)
+
+        with ThreadPoolExecutor(max_workers=len(assignments)) as executor:
+            results = dict(zip(assignments.keys(), executor.map(transfer_with_host, assignments.keys(),
+                                                                assignments.values())))
+
+        for host, (host_transferred_urls, host_succeeded) in results.items():
+            transferred_urls.extend(host_transferred_urls)
+            for url in assignments[host]:
+                tried_hosts[url].add(host)
+            if not host_succeeded:
+                available_hosts.remove(host)
+
+        remaining_urls = [url for url in remaining_urls if url not in transferred_urls]
+        if remaining_urls and available_hosts:
+            logger.info("Retrying %d file(s) with other DTNs", len(remaining_urls))
+
+    for url in remaining_urls:
+        logger.error("Failed to transfer %s", url)
+
+    return transferred_urls
@@ -16,31 +16,108 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import importlib
+import json
+import os
 from urllib.parse import urlparse
 
-from .anonymous_gridftp import AnonymousGridFTPMechanism
-from .aspera import AsperaMechanism
-from .curl import CurlMechanism
-from .gridftp_lite import GridFTPLiteMechanism
-from .scp import SCPMechanism
-from .session_authenticated_curl import SessionAuthenticatedCurlMechanism
-
-
-all_mechanisms = {
-    "anonymous_gridftp": AnonymousGridFTPMechanism,
-    "aspera": AsperaMechanism,
-    "curl": CurlMechanism,
-    "gridftp_lite": GridFTPLiteMechanism,
-    "scp": SCPMechanism,
-    "session_authenticated_curl": SessionAuthenticatedCurlMechanism
+
+# Module and class name of each mechanism. Mechanism modules are imported when they are first used,
+# since some of their dependencies are slow to import.
+_mechanism_classes = {
+    "anonymous_gridftp": ("anonymous_gridftp", "AnonymousGridFTPMechanism"),
+    "aspera": ("aspera", "AsperaMechanism"),
+    "curl": ("curl", "CurlMechanism"),
+    "gridftp_lite": ("gridftp_lite", "GridFTPLiteMechanism"),
+    "http": ("http", "HTTPMechanism"),
+    "scp": ("scp", "SCPMechanism"),
+    "session_authenticated_curl": ("session_authenticated_curl", "SessionAuthenticatedCurlMechanism")
 }
 
 
+def all_mechanisms():
+    """
+    Names of all transfer mechanisms.
+    """
+    return sorted(_mechanism_classes.keys())
+
+
+def mechanism_class(mechanism_name):
+    """
+    Get the class for a transfer mechanism.
+
+    Parameters:
+    mechanism_name - String - The name of the mechanism
+    """
+    (module_name, class_name) = _mechanism_classes[mechanism_name]
+    return getattr(importlib.import_module("." + module_name, __package__), class_name)
+
+
+# File to cache available mechanisms in between runs
+AVAILABLE_MECHANISMS_CACHE_PATH = os.path.expanduser("~/.bdss/available_mechanisms.json")
+
+
+_available_mechanisms = None
+
+
+def _search_path_state():
+    """
+    Directories on the executable search path and their modification times. Installing or removing
+    a program in a directory changes its modification time.
+    """
+    state = []
+    for path in os.get_exec_path():
+        try:
+            state.append([path, os.stat(path).st_mtime_ns])
+        except OSError:
+            state.append([path, None])
+    return state
+
+
+def _read_available_mechanisms_cache(search_path_state):
+    try:
+        with open(AVAILABLE_MECHANISMS_CACHE_PATH) as f:
+            cache = json.load(f)
+        if cache["search_path"] == search_path_state and cache["all_mechanisms"] == all_mechanisms():
+            return cache["available_mechanisms"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    return None
+
+
+def _write_available_mechanisms_cache(search_path_state, mechanisms):
+    try:
+        os.makedirs(os.path.dirname(AVAILABLE_MECHANISMS_CACHE_PATH), exist_ok=True)
+        temp_path = "%s.%d" % (AVAILABLE_MECHANISMS_CACHE_PATH, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump({
+                "search_path": search_path_state,
+                "all_mechanisms": all_mechanisms(),
+                "available_mechanisms": mechanisms
+            }, f)
+        os.replace(temp_path, AVAILABLE_MECHANISMS_CACHE_PATH)
+    except OSError:
+        pass
+
+
 def available_mechanisms():
     """
     Names of all available transfer mechanisms.
+
+    Availability is checked once per run and cached on disk until a directory on the executable
+    search path changes.
     """
-    return [name for name, module in all_mechanisms.items() if module.is_available()]
+    global _available_mechanisms
+    if _available_mechanisms is None:
+        search_path_state = _search_path_state()
+        mechanisms = _read_available_mechanisms_cache(search_path_state)
+        if mechanisms is None:
+            mechanisms = [name for name in all_mechanisms() if mechanism_class(name).is_available()]
+            _write_available_mechanisms_cache(search_path_state, mechanisms)
+        _available_mechanisms = mechanisms
+
+    return list(_available_mechanisms)
 
 
 def default_mechanism(url):
@@ -53,6 +130,8 @@ def default_mechanism(url):
     """
     method_for_scheme = {
         "aspera": "aspera",
+        "http": "http",
+        "https": "http",
         "sshftp": "gridftp_lite",
         "scp": "scp"
     }
@@ -69,4 +148,4 @@ def get_mechanism(mechanism_name, mechanism_options):
     """
     if not mechanism_options:
         mechanism_options = {}
-    return all_mechanisms[mechanism_name](**mechanism_options)
+    return mechanism_class(mechanism_name)(**mechanism_options)
@@ -32,7 +32,7 @@ class AsperaMechanism(SimpleSubprocessMechanism):
     def transfer_program(cls):
         return "ascp"
 
-    def transfer_command(self, url, output_path):
+    def transfer_command(self, url, output_path, resume=False):
 
         default_path_to_key = os.path.expandvars(os.path.join("$HOME", ".aspera", "connect", "etc", "asperaweb_id_dsa.openssh"))
         args = ["-i", default_path_to_key]
@@ -44,8 +44,15 @@ class AsperaMechanism(SimpleSubprocessMechanism):
         except KeyError:
             pass
 
+        # Resume if the partial file's attributes match the source file
+        if resume:
+            args.extend(["-k", "1"])
+
         # Remove scheme from URL
         parts = urlparse(url)
         url = parts[1] + ":" + urlunsplit(("", "", parts[2], parts[3], parts[4]))
 
         return ["ascp"] + args + [self.username + "@" + url, output_path]
+
+    def resume_command(self, url, output_path):
+        return self.transfer_command(url, output_path, resume=True)
@@ -18,8 +18,6 @@
 
 from getpass import getpass
 
-from voluptuous import Invalid, Required, Schema
-
 from ...util import is_program_on_path, run_subprocess
 
 
@@ -34,6 +32,8 @@ class UserInputOption():
         self.hide_input = hide_input
 
     def prompt_for_value(self):
+        from voluptuous import Invalid, Required, Schema
+
         validate = Schema({Required("value"): self.validation})
         value_valid = False
         value = None
@@ -53,6 +53,13 @@ class UserInputOption():
 
 class BaseMechanism():
 
+    # Set by Transfer.run. Long running transfers should stop and return failure when this event is set.
+    cancel_event = None
+
+    # Mechanisms that write data themselves can track the number of bytes transferred by the current transfer here.
+    # Otherwise, progress is measured by the size of the output file.
+    bytes_transferred = None
+
     @classmethod
     def allowed_options(self):
         """
@@ -97,6 +104,30 @@ class BaseMechanism():
         """
         raise NotImplementedError
 
+    @classmethod
+    def can_resume(cls):
+        """
+        Determine if the transfer mechanism can continue a partially completed transfer.
+
+        Returns:
+        Boolean - True if resume_transfer_file is supported
+        """
+        return False
+
+    def resume_transfer_file(self, url, output_path, display_output=True):
+        """
+        Continue a transfer, appending the rest of the file to the partial file at output_path.
+
+        Parameters:
+        url - String - URL of the file to transfer
+        output_path - String - Path to partially transferred file
+        display_output - Boolean - Output progress information
+
+        Returns:
+        (Boolean, String) - Tuple of (True/False for success/failure, Mechanism output)
+        """
+        raise NotImplementedError
+
     def user_input_options(self):
         """
         Define options whose values must be supplied by the end user.
@@ -144,7 +175,17 @@ class SimpleSubprocessMechanism(BaseMechanism):
         raise NotImplementedError
 
     def transfer_file(self, url, output_path, display_output=True):
-        return run_subprocess(self.transfer_command(url, output_path), display_output)
+        return run_subprocess(self.transfer_command(url, output_path), display_output, self.cancel_event)
 
     def transfer_command(self, url, output_path):
         raise NotImplementedError
+
+    @classmethod
+    def can_resume(cls):
+        return cls.resume_command is not SimpleSubprocessMechanism.resume_command
+
+    def resume_transfer_file(self, url, output_path, display_output=True):
+        return run_subprocess(self.resume_command(url, output_path), display_output, self.cancel_event)
+
+    def resume_command(self, url, output_path):
+        raise NotImplementedError
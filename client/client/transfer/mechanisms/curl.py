@@ -27,3 +27,6 @@ class CurlMechanism(SimpleSubprocessMechanism):
 
     def transfer_command(self, url, output_path):
         return ["curl", "--output", output_path, url]
+
+    def resume_command(self, url, output_path):
+        return ["curl", "--continue-at", "-", "--output", output_path, url]
@@ -0,0 +1,272 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .base import BaseMechanism
+from ...util import ChecksumWriter
+
+
+# Size (in bytes) of chunks read from the response and written to disk
+CHUNK_SIZE = 1048576
+
+# Timeout (in seconds) for connecting to the server and for each read from the connection
+TIMEOUT = 60
+
+# Maximum number of idle connections kept open to each host. Segmented transfers use at most this many connections,
+# since connections beyond it would be closed instead of returned to the pool.
+MAX_CONNECTIONS_PER_HOST = 10
+
+_content_range_pattern = re.compile(r"^bytes (\d+)-\d+/(\d+|\*)$")
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session():
+    """
+    Session shared by all HTTP transfers, so that connections to a host are reused between files.
+    """
+    global _session
+    with _session_lock:
+        if not _session:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=MAX_CONNECTIONS_PER_HOST)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _segment_ranges(file_size, num_segments, segment_size=None):
+    """
+    Split a file into byte ranges.
+
+    Parameters:
+    file_size - Integer - Size of the file in bytes.
+    num_segments - Integer - Number of segments to split the file into if segment_size is not given.
+    segment_size - Integer - Size of each segment in bytes.
+
+    Returns:
+    (Integer, Integer)[] - First and last byte positions (inclusive) of each segment
+    """
+    if not segment_size:
+        segment_size = -(-file_size // num_segments)
+    return [(start, min(start + segment_size, file_size) - 1) for start in range(0, file_size, segment_size)]
+
+
+def _check_content_range(response, first_byte):
+    """
+    Check that a partial content response starts at the requested position.
+
+    Raises:
+    IOError - If the response's Content-Range is missing or starts anywhere else.
+    """
+    content_range = response.headers.get("Content-Range", "")
+    match = _content_range_pattern.match(content_range.strip())
+    if not match or int(match.group(1)) != first_byte:
+        raise IOError("Requested range starting at byte %d, received Content-Range '%s'" % (first_byte, content_range))
+
+
+class HTTPMechanism(BaseMechanism):
+    """
+    Transfers files over HTTP(S) in process, streaming the response to disk.
+
+    If the segments option is greater than 1 and the server supports range requests, the file is split
+    into byte ranges that are downloaded over that many parallel connections.
+    """
+
+    @classmethod
+    def allowed_options(cls):
+        return (
+            "segments",
+            "segment_size"
+        )
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def _is_cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def transfer_file(self, url, output_path, display_output=True):
+        if self.segments and int(self.segments) > 1:
+            file_size = self._ranged_file_size(url)
+            if file_size:
+                return self._transfer_segments(url, output_path, file_size, display_output)
+
+        return self._transfer_stream(url, output_path, display_output)
+
+    def _ranged_file_size(self, url):
+        """
+        Size of the file at url if the server supports range requests for it, otherwise None.
+        """
+        try:
+            response = _get_session().head(url, allow_redirects=True, timeout=TIMEOUT)
+        except requests.exceptions.RequestException:
+            return None
+
+        if response.status_code != 200 or response.headers.get("Accept-Ranges") != "bytes":
+            return None
+
+        try:
+            return int(response.headers["Content-Length"])
+        except (KeyError, ValueError):
+            return None
+
+    @classmethod
+    def can_resume(cls):
+        return True
+
+    def resume_transfer_file(self, url, output_path, display_output=True):
+        return self._transfer_stream(url, output_path, display_output, offset=os.path.getsize(output_path))
+
+    def _transfer_stream(self, url, output_path, display_output, offset=0):
+        self.bytes_transferred = 0
+        response = None
+        try:
+            headers = {"Range": "bytes=%d-" % offset} if offset else {}
+            response = _get_session().get(url, stream=True, timeout=TIMEOUT, headers=headers)
+            output = "GET %s\n%d %s\n" % (url, response.status_code, response.reason)
+            if display_output:
+                sys.stdout.write(output)
+
+            if offset and response.status_code == 206:
+                _check_content_range(response, offset)
+                mode = "ab"
+            elif response.status_code == 200:
+                # Servers that don't support range requests send the whole file
+                mode = "wb"
+                offset = 0
+            else:
+                return (False, output)
+
+            bytes_written = 0
+            with open(output_path, mode) as f:
+                writer = ChecksumWriter(f)
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if self._is_cancelled():
+                        return (False, output + "Cancelled\n")
+                    writer.write(chunk)
+                    bytes_written += len(chunk)
+                    self.bytes_transferred = bytes_written
+
+            # The checksum only covers the whole file if it was written from the beginning
+            if not offset:
+                writer.record(output_path)
+
+        except (requests.exceptions.RequestException, OSError) as e:
+            return (False, "GET %s\n%s\n" % (url, e))
+
+        finally:
+            # Return the connection to the pool
+            if response is not None:
+                response.close()
+
+        if offset:
+            message = "Appended %d bytes to %s\n" % (bytes_written, output_path)
+        else:
+            message = "Wrote %d bytes to %s\n" % (bytes_written, output_path)
+        if display_output:
+            sys.stdout.write(message)
+
+        return (True, output + message)
+
+    def _transfer_segments(self, url, output_path, file_size, display_output):
+        num_connections = min(int(self.segments), MAX_CONNECTIONS_PER_HOST)
+        segments = _segment_ranges(file_size, num_connections, int(self.segment_size) if self.segment_size else None)
+
+        output = "GET %s\n%d bytes in %d segments over %d connections\n" % (
+            url, file_size, len(segments), num_connections)
+        if display_output:
+            sys.stdout.write(output)
+
+        # Preallocate the output file so that each segment can be written in place
+        with open(output_path, "wb") as f:
+            f.truncate(file_size)
+
+        failed = threading.Event()
+        progress_lock = threading.Lock()
+        self.bytes_transferred = 0
+
+        def download_segment(segment):
+            if failed.is_set():
+                return None
+
+            (first_byte, last_byte) = segment
+            response = None
+            try:
+                response = _get_session().get(url, stream=True, timeout=TIMEOUT,
+                                              headers={"Range": "bytes=%d-%d" % (first_byte, last_byte)})
+                if response.status_code != 206:
+                    raise IOError("Unexpected response to range request: %d %s" % (response.status_code, response.reason))
+                _check_content_range(response, first_byte)
+
+                with open(output_path, "r+b") as f:
+                    f.seek(first_byte)
+                    bytes_written = 0
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if failed.is_set():
+                            return None
+                        if self._is_cancelled():
+                            failed.set()
+                            return "Cancelled\n"
+                        f.write(chunk)
+                        bytes_written += len(chunk)
+                        with progress_lock:
+                            self.bytes_transferred += len(chunk)
+
+                if bytes_written != last_byte - first_byte + 1:
+                    raise IOError("Received %d bytes for range %d-%d" % (bytes_written, first_byte, last_byte))
+
+                return None
+            except (requests.exceptions.RequestException, OSError) as e:
+                failed.set()
+                return "Segment %d-%d: %s\n" % (first_byte, last_byte, e)
+            finally:
+                if response is not None:
+                    response.close()
+
+        errors = ["Transfer did not complete\n"]
+        try:
+            with ThreadPoolExecutor(max_workers=num_connections) as executor:
+                errors = [e for e in executor.map(download_segment, segments) if e]
+        finally:
+            if errors:
+                # The preallocated file has holes where segments were not written. Since its size is the size
+                # of the whole file, resuming from its end would skip them, so don't leave it to be resumed.
+                try:
+                    os.remove(output_path)
+                except OSError:
+                    pass
+
+        if errors:
+            return (False, output + "".join(errors))
+
+        message = "Wrote %d bytes to %s\n" % (file_size, output_path)
+        if display_output:
+            sys.stdout.write(message)
+
+        return (True, output + message)
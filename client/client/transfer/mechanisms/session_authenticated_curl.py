@@ -56,7 +56,7 @@ class SessionAuthenticatedCurlMechanism(BaseMechanism):
                 "--data-urlencode", "%s=%s" % (self.username_field, self.username),
                 "--data-urlencode", "%s=%s" % (self.password_field, self.password),
                 self.auth_url
-            ], display_output)
+            ], display_output, self.cancel_event)
 
             if not success:
                 return (success, output1)
@@ -66,6 +66,6 @@ class SessionAuthenticatedCurlMechanism(BaseMechanism):
                     "--cookie", cookie_jar.name,
                     "--output", output_path,
                     url
-                ], display_output)
+                ], display_output, self.cancel_event)
 
                 return (success, output1 + "\n" + output2)
@@ -0,0 +1,149 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .data import _bytes_transferred, partial_file_path, remove_partial_files, run_data_transfer
+from ..util import record_file_checksum
+
+
+logger = logging.getLogger("bdss")
+
+
+# Default time (in seconds) to run transfers side by side before choosing one to keep
+DEFAULT_PROBE_SECONDS = 10
+
+
+def _racer_output_path(output_path, index):
+    (root, ext) = os.path.splitext(output_path)
+    return "%s.race%d%s" % (root, index, ext)
+
+
+class RaceResult():
+    """
+    Result of racing transfers
+
+    report - TransferReport - Report of the transfer that was kept, or None if all transfers failed or were cancelled
+    failed_reports - TransferReport[] - Reports of transfers that failed on their own
+    cancelled_transfers - Transfer[] - Transfers that were cancelled, in their original order
+    """
+
+    def __init__(self):
+        self.report = None
+        self.failed_reports = []
+        self.cancelled_transfers = []
+
+
+def race_data_transfers(transfers, output_path, limiter, probe_seconds=DEFAULT_PROBE_SECONDS):
+    """
+    Start several transfers of the same file at once and keep the fastest.
+
+    All transfers run until the end of the probe window. The one that transferred the most data in the
+    second half of the window (so that connection setup time is not counted) continues and the others are
+    cancelled and their partial files deleted. If a transfer finishes during the probe window, it is kept.
+
+    Parameters:
+    transfers - Transfer[] - Transfers to race, in order of preference.
+    output_path - String - The path to save the transferred file to.
+    limiter - HostConnectionLimiter - Limits the number of simultaneous transfers from each host.
+    probe_seconds - Float - How long to run all transfers before choosing one.
+
+    Returns:
+    RaceResult
+    """
+    racer_paths = [_racer_output_path(output_path, i) for i in range(len(transfers))]
+    cancel_events = [threading.Event() for _ in transfers]
+
+    def run_racer(i):
+        with limiter.connection(transfers[i].url):
+            if cancel_events[i].is_set():
+                return None
+            return run_data_transfer(transfers[i], racer_paths[i], False, cancel_events[i])
+
+    result = RaceResult()
+    with ThreadPoolExecutor(max_workers=len(transfers)) as executor:
+        futures = {executor.submit(run_racer, i): i for i in range(len(transfers))}
+        running = set(futures.keys())
+
+        start_time = time.monotonic()
+        checkpoints = [start_time + probe_seconds / 2, start_time + probe_seconds]
+        sizes_at_checkpoint = []
+        winner = None
+
+        while winner is None and running and checkpoints:
+            (done, running) = wait(running, timeout=max(checkpoints[0] - time.monotonic(), 0),
+                                   return_when=FIRST_COMPLETED)
+
+            for future in sorted(done, key=futures.get):
+                report = future.result()
+                if report and report.success and winner is None:
+                    winner = futures[future]
+                    result.report = report
+                elif report:
+                    result.failed_reports.append(report)
+
+            if time.monotonic() >= checkpoints[0]:
+                checkpoints.pop(0)
+                sizes_at_checkpoint.append({
+                    futures[f]: _bytes_transferred(transfers[futures[f]], partial_file_path(racer_paths[futures[f]]))
+                    for f in running
+                })
+
+        if winner is None and running:
+            # Compare progress over the second half of the probe window. Prefer earlier transfers in case of a tie.
+            def progress(i):
+                return (sizes_at_checkpoint[-1][i] - sizes_at_checkpoint[0].get(i, 0), -i)
+
+            winner = max((futures[f] for f in running), key=progress)
+            logger.info("Keeping transfer from %s", transfers[winner].url)
+
+        for i, event in enumerate(cancel_events):
+            if i != winner:
+                event.set()
+
+        for future in running:
+            i = futures[future]
+            report = future.result()
+            if i == winner:
+                if report and report.success:
+                    result.report = report
+                elif report:
+                    result.failed_reports.append(report)
+            else:
+                result.cancelled_transfers.append(transfers[i])
+
+    if result.report:
+        os.replace(racer_paths[winner], output_path)
+        if result.report.checksum:
+            record_file_checksum("md5", output_path, result.report.checksum)
+
+    # Partial files could only be resumed by a later race, so remove them. Also remove any file completed
+    # by a transfer that finished before it noticed it was cancelled.
+    for path in racer_paths:
+        remove_partial_files(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    result.cancelled_transfers.sort(key=transfers.index)
+
+    return result
@@ -16,19 +16,53 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-import requests
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
 import textwrap
+import threading
+import time
+import uuid
+
+import requests
 
 from .mechanisms import default_mechanism
 from ..config import client_destination, metadata_repository_url, dtn_host, dtn_path, dtn_user
 
 
+logger = logging.getLogger("bdss")
+
+
+# Maximum number of reports sent in one request
+REPORT_BATCH_SIZE = 100
+
+# Maximum time (in seconds) to wait for more reports before sending a batch
+REPORT_BATCH_INTERVAL = 2
+
+# Timeout (in seconds) for requests to the metadata repository
+REPORT_REQUEST_TIMEOUT = 10
+
+# Directory where reports that could not be sent are saved until the next run
+REPORT_SPOOL_DIRECTORY = os.path.expanduser("~/.bdss/report_spool")
+
+# Time (in seconds) to wait after a request fails before trying to reach the metadata repository again
+REPORT_RETRY_INTERVAL = 60
+
+# Time (in seconds) after which saved reports claimed by a client are assumed to have been left by a client
+# that stopped before sending them
+REPORT_CLAIM_TIMEOUT = 3600
+
+
 class TransferReport():
     """
     Describes the result of a transfer
 
     url - String - The actual URL of the transferred file
-    size - Integer - The size of the transferred file in bytes
+    size - Integer - Number of bytes transferred. If the transfer resumed a partial file, this does not
+        include the bytes transferred by earlier attempts.
     duration - Float - The duration of the transfer in seconds
     success - Boolean - Whether the transfer succeeded or failed
     mechanism_name - String
@@ -36,12 +70,13 @@ class TransferReport():
     mechanism_output - String - Output of the transfer mechanism
     checksum - String - MD5 checksum of the transferred file
     verification - VerificationReport[] - If transfer succeeded, results of verification
+    abort_reason - String - If the transfer was stopped by the client, the reason why
     """
 
     def __init__(self, url=None,
                  size=0, duration=0, success=False,
                  mechanism_name=None, mechanism_options=None, mechanism_output=None,
-                 checksum=None, verification=None):
+                 checksum=None, verification=None, abort_reason=None):
         self.url = url
         self.size = size
         self.duration = duration
@@ -55,6 +90,7 @@ class TransferReport():
         self.mechanism_output = mechanism_output
         self.checksum = checksum
         self.verification = verification
+        self.abort_reason = abort_reason
 
     def __str__(self):
         return textwrap.dedent("""\
@@ -72,34 +108,292 @@ class TransferReport():
             self.url,
             self.mechanism_name,
             "\n".join(["   %s: %s" % (k, v) for k, v in self.mechanism_options.items()]) if self.mechanism_options else "   No options",
-            "succeeded" if self.success else "failed",
+            "succeeded" if self.success else ("aborted: %s" % self.abort_reason if self.abort_reason else "failed"),
             self.size,
             self.duration,
             self.checksum,
-            "\n".join(["   %s" % v for v in self.verification])))
+            "\n".join(["   %s" % v for v in self.verification or []])))
 
 
-def send_report(report):
+def report_data(report):
     """
-    Send a report to the metadata repository.
+    Get the data to send to the metadata repository for a report.
 
     Parameters:
     report - TransferReport
-    """
 
-    report_data = dict(
+    Returns:
+    Dictionary - Fields for the metadata repository's transfer report form
+    """
+    data = dict(
         url=report.url,
         file_size_bytes=report.size,
         transfer_duration_seconds=report.duration,
         is_success=report.success,
+        mechanism_name=report.mechanism_name,
         mechanism_output=report.mechanism_output,
+        abort_reason=report.abort_reason,
         file_checksum=report.checksum
     )
 
     if client_destination:
-        report_data["destination"] = client_destination
+        data["destination"] = client_destination
+
+    return data
+
+
+class ReportSender():
+    """
+    Sends reports to the metadata repository from a background thread.
+
+    Reports are collected into batches and sent gzip compressed over a single connection. Batches that
+    cannot be sent are saved in a spool directory and sent the next time a sender is started, or once the
+    repository can be reached again.
+    """
+
+    _STOP = object()
+
+    def __init__(self, repository_url, spool_directory,
+                 batch_size=REPORT_BATCH_SIZE, batch_interval=REPORT_BATCH_INTERVAL, retry_interval=REPORT_RETRY_INTERVAL):
+        """
+        Parameters:
+        repository_url - String - Base URL of the metadata repository.
+        spool_directory - String - Directory to save unsent reports in.
+        batch_size - Integer - Maximum number of reports to send in one request.
+        batch_interval - Float - Maximum time (in seconds) to wait for more reports before sending a batch.
+        retry_interval - Float - Time (in seconds) to spool reports without sending them after a request fails.
+        """
+        self.repository_url = repository_url
+        self.spool_directory = spool_directory
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.retry_interval = retry_interval
+
+        self._queue = queue.Queue()
+        self._session = requests.Session()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Set after a request fails, so that batches are spooled instead of waiting on an unreachable
+        # repository until this time (from time.monotonic). None if the last request succeeded.
+        self._retry_at = None
+
+    def send(self, data):
+        """
+        Queue a report to be sent.
+
+        Parameters:
+        data - Dictionary - Report data. See report_data.
+        """
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name="bdss-report-sender", daemon=True)
+                self._thread.start()
+
+        self._queue.put(data)
+
+    def flush(self):
+        """
+        Send or spool all queued reports and stop the background thread.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+
+        if thread:
+            self._queue.put(self._STOP)
+            thread.join()
+
+    def _run(self):
+        self._replay_spool()
+
+        stopped = False
+        while not stopped:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                try:
+                    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    data = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                if data is self._STOP:
+                    stopped = True
+                    break
+
+                batch.append(data)
+                if deadline is None:
+                    deadline = time.monotonic() + self.batch_interval
+
+            if batch:
+                self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        if self._retry_at is not None and time.monotonic() < self._retry_at:
+            self._spool(batch)
+            return
+
+        was_unreachable = self._retry_at is not None
+        unsent = self._post_batch(batch)
+        if unsent:
+            self._spool(unsent)
+        elif was_unreachable:
+            # Send reports saved while the repository could not be reached
+            self._replay_spool()
 
-    requests.post(metadata_repository_url + "/transfer_reports", data=report_data)
+    def _post_batch(self, batch):
+        """
+        Send a batch of reports to the metadata repository.
+
+        Returns:
+        Dictionary[] - Reports the repository did not receive. Empty if all reports were received.
+        """
+        try:
+            response = self._session.post(self.repository_url + "/transfer_reports/batch",
+                                          data=gzip.compress(json.dumps(batch).encode("utf-8")),
+                                          headers={
+                                              "Content-Encoding": "gzip",
+                                              "Content-Type": "application/json",
+                                          },
+                                          timeout=REPORT_REQUEST_TIMEOUT)
+
+            # Fall back to sending reports one at a time to repositories without the batch endpoint
+            if response.status_code == 404:
+                return self._post_reports(batch)
+
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            self._request_failed()
+            return batch
+
+        self._retry_at = None
+
+        # Reports rejected by the repository would be rejected again, so they are not retried
+        for data, result in zip(batch, response.json().get("results", [])):
+            if not result["success"]:
+                logger.debug("Metadata repository rejected report for %s: %s", data["url"], result["error"]["message"])
+
+        return []
+
+    def _post_reports(self, batch):
+        """
+        Send reports to the metadata repository one at a time.
+
+        Returns:
+        Dictionary[] - Reports the repository did not receive.
+        """
+        for i, data in enumerate(batch):
+            try:
+                self._session.post(self.repository_url + "/transfer_reports",
+                                   data=data,
+                                   timeout=REPORT_REQUEST_TIMEOUT).raise_for_status()
+            except requests.exceptions.RequestException:
+                self._request_failed()
+                return batch[i:]
+
+        self._retry_at = None
+        return []
+
+    def _request_failed(self):
+        logger.warn("Unable to send transfer reports to metadata repository")
+        logger.debug("Failed to send transfer reports", exc_info=True)
+        self._retry_at = time.monotonic() + self.retry_interval
+
+    def _spool(self, batch):
+        try:
+            os.makedirs(self.spool_directory, exist_ok=True)
+            path = os.path.join(self.spool_directory, "%d-%s.json" % (time.time(), uuid.uuid4().hex))
+            with open(path + ".tmp", "w") as f:
+                json.dump(batch, f)
+            os.replace(path + ".tmp", path)
+            logger.info("Saved %d transfer reports to %s", len(batch), path)
+        except OSError:
+            logger.warn("Unable to save transfer reports")
+            logger.debug("Failed to save transfer reports", exc_info=True)
+
+    def _reclaim_stale_spool_files(self, filenames):
+        """
+        Return saved reports claimed by a client that stopped before sending them to the spool.
+        """
+        for filename in filenames:
+            if not filename.endswith(".json.sending"):
+                continue
+
+            sending_path = os.path.join(self.spool_directory, filename)
+            try:
+                if time.time() - os.path.getmtime(sending_path) > REPORT_CLAIM_TIMEOUT:
+                    os.rename(sending_path, sending_path[:-len(".sending")])
+            except OSError:
+                pass
+
+    def _replay_spool(self):
+        try:
+            self._reclaim_stale_spool_files(os.listdir(self.spool_directory))
+            spooled_files = sorted(f for f in os.listdir(self.spool_directory) if f.endswith(".json"))
+        except OSError:
+            return
+
+        for filename in spooled_files:
+            path = os.path.join(self.spool_directory, filename)
+
+            # Claim the file so that another client running at the same time does not also send it
+            sending_path = path + ".sending"
+            try:
+                os.rename(path, sending_path)
+                os.utime(sending_path)
+            except OSError:
+                continue
+
+            try:
+                with open(sending_path) as f:
+                    batch = json.load(f)
+            except (OSError, ValueError):
+                logger.warn("Unable to read saved transfer reports from %s", path)
+                continue
+
+            unsent = self._post_batch(batch)
+            if len(unsent) == len(batch):
+                os.rename(sending_path, path)
+                break
+
+            os.remove(sending_path)
+            if unsent:
+                self._spool(unsent)
+                break
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def _default_sender():
+    global _sender
+    with _sender_lock:
+        if not _sender:
+            _sender = ReportSender(metadata_repository_url, REPORT_SPOOL_DIRECTORY)
+            atexit.register(_sender.flush)
+        return _sender
+
+
+def send_report(report):
+    """
+    Send a report to the metadata repository.
+
+    The report is sent in the background. Queued reports are sent before the program exits.
+
+    Parameters:
+    report - TransferReport
+    """
+    _default_sender().send(report_data(report))
+
+
+def flush_reports():
+    """
+    Wait for all queued reports to be sent to the metadata repository.
+    """
+    if _sender:
+        _sender.flush()
 
 
 class ReportsFile():
@@ -107,13 +401,16 @@ class ReportsFile():
     def __init__(self, file_handle):
         self._file = file_handle
         self._headers_written = False
+        self._lock = threading.Lock()
 
     def _write_headers(self):
         self._file.write("URL,Transfer Time (s),Transfer Size (bytes),Transfer Rate(bytes/s)\n")
         self._headers_written = True
 
     def write_report(self, report):
-        if not self._headers_written:
-            self._write_headers()
+        with self._lock:
+            if not self._headers_written:
+                self._write_headers()
 
-        self._file.write("%s,%f,%d,%f\n" % (report.url, report.duration, report.size, report.size / report.duration))
+            self._file.write("%s,%f,%d,%f\n" % (report.url, report.duration, report.size, report.size / report.duration))
+            self._file.flush()
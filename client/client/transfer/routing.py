@@ -0,0 +1,296 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Find transfers without contacting the metadata repository, using a cached copy of its configuration.
+
+URLs are matched to data sources and transformed the same way as find_transfers in the metadata repository.
+Transfers are returned in transform preference order. Unlike the repository, no transfer rate estimates or
+file checksums are available.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from urllib.parse import urlparse, urlunsplit
+
+import requests
+
+from ..config import configuration_max_age, metadata_repository_url
+
+
+logger = logging.getLogger("bdss")
+
+
+# File to cache the metadata repository's configuration in
+CONFIGURATION_CACHE_PATH = os.path.expanduser("~/.bdss/repository_configuration.json")
+
+# Timeout (in seconds) for requests for the configuration
+CONFIGURATION_REQUEST_TIMEOUT = 30
+
+
+# Matchers and transforms, with the same behavior as those in the metadata repository
+
+def _match_scheme_and_host(options, url):
+    parsed = urlparse(url)
+    return bool(parsed.hostname) and parsed.scheme.lower() == options["scheme"].lower() and \
+        parsed.hostname.lower() == options["host"].lower()
+
+
+def _match_regular_expression(options, url):
+    return re.match(options["pattern"], url) is not None
+
+
+_matchers = {
+    "scheme_and_host": _match_scheme_and_host,
+    "regular_expression": _match_regular_expression
+}
+
+
+def _change_host(options, url):
+    parts = urlparse(url)
+    return urlunsplit((parts.scheme, options["new_host"], parts.path, parts.query, parts.fragment))
+
+
+def _change_scheme(options, url):
+    parts = urlparse(url)
+    return urlunsplit((options["new_scheme"], parts.netloc, parts.path, parts.query, parts.fragment))
+
+
+def _change_scheme_and_host(options, url):
+    parts = urlparse(url)
+    return urlunsplit((options["new_scheme"], options["new_host"], parts.path, parts.query, parts.fragment))
+
+
+def _regex_replace(options, url):
+    return re.sub(options["pattern"], options["repl"], url)
+
+
+_transforms = {
+    "change_host": _change_host,
+    "change_scheme": _change_scheme,
+    "change_scheme_and_host": _change_scheme_and_host,
+    "regex_replace": _regex_replace
+}
+
+
+class UnsupportedConfigurationError(Exception):
+    pass
+
+
+class LocalRouter():
+    """
+    Find transfers for URLs from a metadata repository configuration export.
+    """
+
+    def __init__(self, configuration):
+        """
+        Parameters:
+        configuration - Dictionary - Configuration from the metadata repository's /configuration/export.
+
+        Raises:
+        UnsupportedConfigurationError - If the configuration uses matchers or transforms this client doesn't know.
+        """
+        self._data_sources = {s["label"]: s for s in configuration["data_sources"]}
+
+        # Matchers in the order the repository checks them
+        self._matchers = []
+        for source in configuration["data_sources"]:
+            for matcher in source["url_matchers"]:
+                if matcher["type"] not in _matchers:
+                    raise UnsupportedConfigurationError("Unknown matcher type \"%s\"" % matcher["type"])
+                self._matchers.append((_matchers[matcher["type"]], matcher["options"], source))
+
+            for transform in source["transforms"]:
+                if transform["type"] not in _transforms:
+                    raise UnsupportedConfigurationError("Unknown transform type \"%s\"" % transform["type"])
+
+    def matching_data_source(self, url):
+        """
+        Find the data source that matches a URL. If more than one data source matches, the first is used.
+
+        Returns:
+        Dictionary - The data source's configuration or None if no data source matches.
+        """
+        for matches_url, options, source in self._matchers:
+            try:
+                if matches_url(options, url):
+                    return source
+            except Exception:
+                continue
+        return None
+
+    def _source_matches_url(self, source, url):
+        for matcher in source["url_matchers"]:
+            try:
+                if _matchers[matcher["type"]](matcher["options"], url):
+                    return True
+            except Exception:
+                continue
+        return False
+
+    def find_transfers(self, url, available_mechanisms, destination=None):
+        """
+        Find transfers for a URL.
+
+        Parameters:
+        url - String - URL of the file.
+        available_mechanisms - String[] - Names of transfer mechanisms available on this machine.
+        destination - String - Label of the destination the client is running at. May be None.
+
+        Returns:
+        Dictionary[] - Transfers in the same format as the metadata repository's /transfers results.
+        None if no data source matches the URL.
+        """
+        source = self.matching_data_source(url)
+        if not source:
+            return None
+
+        def transfer(transfer_url, transfer_source):
+            return dict(url=transfer_url,
+                        mechanism_name=transfer_source["transfer_mechanism"]["type"],
+                        mechanism_options=transfer_source["transfer_mechanism"]["options"],
+                        data_source_id=transfer_source["label"],
+                        expected_transfer_rate=None,
+                        file_checksum=None)
+
+        transfers = []
+        for t in source["transforms"]:
+            if t["for_destinations"] and destination not in t["for_destinations"]:
+                continue
+
+            target = self._data_sources.get(t["target"])
+            if not target:
+                continue
+
+            transformed_url = _transforms[t["type"]](t["options"], url)
+            if self._source_matches_url(target, transformed_url) and \
+               target["transfer_mechanism"]["type"] in available_mechanisms:
+                transfers.append(transfer(transformed_url, target))
+
+        if source["transfer_mechanism"]["type"] in available_mechanisms:
+            transfers.append(transfer(url, source))
+
+        return transfers
+
+
+def _read_cached_configuration():
+    try:
+        with open(CONFIGURATION_CACHE_PATH) as f:
+            cached = json.load(f)
+        if cached.get("repository_url") == metadata_repository_url:
+            return cached
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _write_cached_configuration(cached):
+    try:
+        os.makedirs(os.path.dirname(CONFIGURATION_CACHE_PATH), exist_ok=True)
+        temp_path = CONFIGURATION_CACHE_PATH + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(cached, f)
+        os.replace(temp_path, CONFIGURATION_CACHE_PATH)
+    except OSError:
+        logger.debug(traceback.format_exc())
+
+
+def repository_configuration(max_age=None, offline=False):
+    """
+    Get the metadata repository's configuration, using a cached copy if it is recent.
+
+    The cached copy is revalidated with its ETag once it is older than max_age. If the repository can't
+    be reached, the cached copy is used regardless of its age.
+
+    Parameters:
+    max_age - Float - Maximum age (in seconds) of the cached configuration to use without checking the repository.
+        Defaults to the metadata_repository.configuration_max_age option.
+    offline - Boolean - Only use the cached configuration.
+
+    Returns:
+    Dictionary - The configuration, or None if it is not available.
+    """
+    max_age = configuration_max_age if max_age is None else max_age
+
+    cached = _read_cached_configuration()
+    if offline or (cached and time.time() - cached["fetched_at"] < max_age):
+        return cached["configuration"] if cached else None
+
+    headers = {"Accept": "application/json"}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+
+    try:
+        response = requests.get("%s/configuration/export" % metadata_repository_url, headers=headers,
+                                timeout=CONFIGURATION_REQUEST_TIMEOUT)
+        if response.status_code == 304 and cached:
+            logger.debug("Cached repository configuration is up to date")
+        else:
+            response.raise_for_status()
+            logger.debug("Fetched repository configuration")
+            cached = dict(repository_url=metadata_repository_url,
+                          etag=response.headers.get("ETag"),
+                          configuration=response.json())
+
+        cached["fetched_at"] = time.time()
+        _write_cached_configuration(cached)
+    except (requests.exceptions.RequestException, ValueError):
+        logger.warn("Unable to fetch configuration from metadata repository")
+        logger.debug(traceback.format_exc())
+
+    return cached["configuration"] if cached else None
+
+
+# Routers by whether they were created offline, with the time they were created
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def local_router(offline=False):
+    """
+    Get a LocalRouter for the metadata repository's configuration. See repository_configuration.
+    Routers are reused until the configuration is due to be checked again.
+
+    Parameters:
+    offline - Boolean - Only use the cached configuration.
+
+    Returns:
+    LocalRouter - None if the configuration is not available or not supported.
+    """
+    with _routers_lock:
+        if offline in _routers and time.time() - _routers[offline][1] < configuration_max_age:
+            return _routers[offline][0]
+
+        router = None
+        configuration = repository_configuration(offline=offline)
+        if configuration:
+            try:
+                router = LocalRouter(configuration)
+            except UnsupportedConfigurationError as e:
+                logger.warn("Unable to find transfers locally: %s", e)
+            except (KeyError, TypeError):
+                logger.warn("Unable to find transfers locally: Invalid configuration")
+                logger.debug(traceback.format_exc())
+
+        _routers[offline] = (router, time.time())
+        return router
@@ -79,6 +79,8 @@ def verify_data_transfer(transfer, output_path):
             report.result = method.verify_transfer(transfer, output_path)
             if report.result:
                 logger.info("Verified with %s" % method.label)
+            elif report.result is None:
+                logger.warn("Unable to verify with %s" % method.label)
             else:
                 logger.error("Failed verification by %s" % method.label)
 
@@ -16,9 +16,14 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import collections
 import logging
+import posixpath
+import re
 import string
-from urllib.parse import urlparse, urlunparse
+import threading
+import time
+from urllib.parse import unquote, urlparse, urlunparse
 
 from ..base import Transfer
 from ...util import calculate_file_checksum
@@ -30,6 +35,20 @@ label = "MD5 Checksum"
 logger = logging.getLogger("bdss")
 
 
+# Names of files that list checksums for every file in a directory, in the order they are tried
+CHECKSUM_MANIFEST_NAMES = ["MD5SUMS", "md5checksums.txt", "md5sum.txt"]
+
+# Checksums from recently fetched manifests, keyed by directory URL and mechanism. Values are (time fetched, checksums).
+# Checksums are None if the directory has no manifest.
+_checksum_manifests = collections.OrderedDict()
+_checksum_manifests_lock = threading.Lock()
+_checksum_manifest_locks = {}
+_CHECKSUM_MANIFEST_CACHE_SIZE = 64
+
+# Time (in seconds) a fetched manifest is reused for. Files in the directory may be replaced after that.
+CHECKSUM_MANIFEST_MAX_AGE = 600
+
+
 def can_attempt_verification(transfer, output_path):
     return True
 
@@ -39,14 +58,127 @@ def _md5_checksum_url(data_file_url):
     return urlunparse((p.scheme, p.netloc, p.path + ".md5", p.params, p.query, p.fragment))
 
 
-def _get_checksum(checksum_url, mechanism_name, mechanism_options, data_source_id=None):
-    checksum_transfer = Transfer(checksum_url,
+def _get_data(url, mechanism_name, mechanism_options, data_source_id=None):
+    # Checksum files are small, so the cost of starting curl would dominate fetching them.
+    # Fetch them over the HTTP mechanism's pooled connections instead.
+    if mechanism_name == "curl" and urlparse(url).scheme in ("http", "https"):
+        (mechanism_name, mechanism_options) = ("http", {})
+
+    checksum_transfer = Transfer(url,
                                  mechanism_name,
                                  mechanism_options,
                                  data_source_id)
 
-    checksum_data = checksum_transfer.get_data(display_output=False)
-    return checksum_data.decode().strip().lower()
+    return checksum_transfer.get_data(display_output=False)
+
+
+def _get_checksum(checksum_url, mechanism_name, mechanism_options, data_source_id=None):
+    checksum_data = _get_data(checksum_url, mechanism_name, mechanism_options, data_source_id)
+    # Checksum files may also contain the file name after the checksum
+    return (checksum_data.decode().split() or [""])[0].lower()
+
+
+_md5sum_line = re.compile(r"^(?P<checksum>[0-9a-fA-F]{32}) [ *](?P<file_name>.+)$")
+_bsd_md5_line = re.compile(r"^MD5 ?\((?P<file_name>.+)\) ?= ?(?P<checksum>[0-9a-fA-F]{32})$")
+
+
+def _parse_checksum_manifest(manifest_data):
+    """
+    Parse a list of checksums in the format written by md5sum ("<checksum>  <file name>") or BSD md5
+    ("MD5 (<file name>) = <checksum>").
+
+    Returns:
+    Dictionary - Checksums keyed by file name.
+    """
+    checksums = {}
+    for line in manifest_data.decode(errors="replace").splitlines():
+        match = _md5sum_line.match(line.strip()) or _bsd_md5_line.match(line.strip())
+        if match:
+            checksums[posixpath.normpath(match.group("file_name"))] = match.group("checksum").lower()
+
+    return checksums
+
+
+def _cached_checksum_manifest(key):
+    """
+    Check if a directory's manifest was fetched recently enough to reuse. Must be called with _checksum_manifests_lock held.
+    """
+    try:
+        (fetched_at, _) = _checksum_manifests[key]
+    except KeyError:
+        return False
+
+    if time.monotonic() - fetched_at >= CHECKSUM_MANIFEST_MAX_AGE:
+        del _checksum_manifests[key]
+        return False
+
+    _checksum_manifests.move_to_end(key)
+    return True
+
+
+def _get_checksum_manifest(directory_url, mechanism_name, mechanism_options, data_source_id=None):
+    """
+    Get the checksums listed in a directory's checksum manifest. Recently fetched manifests are reused.
+
+    Parameters:
+    directory_url - String - URL of the directory, ending with a /.
+
+    Returns:
+    Dictionary - Checksums keyed by file name. None if the directory does not have a checksum manifest.
+    """
+    key = (directory_url, mechanism_name)
+    with _checksum_manifests_lock:
+        if _cached_checksum_manifest(key):
+            return _checksum_manifests[key][1]
+        lock = _checksum_manifest_locks.setdefault(key, threading.Lock())
+
+    # Only one thread fetches each directory's manifest. Others wait for its result.
+    with lock:
+        with _checksum_manifests_lock:
+            if _cached_checksum_manifest(key):
+                return _checksum_manifests[key][1]
+
+        checksums = None
+        for manifest_name in CHECKSUM_MANIFEST_NAMES:
+            try:
+                manifest_data = _get_data(directory_url + manifest_name, mechanism_name, mechanism_options, data_source_id)
+            except Exception:
+                continue
+
+            checksums = _parse_checksum_manifest(manifest_data)
+            if checksums:
+                logger.debug("Fetched %d MD5 checksums from %s%s" % (len(checksums), directory_url, manifest_name))
+                break
+
+        with _checksum_manifests_lock:
+            _checksum_manifests[key] = (time.monotonic(), checksums or None)
+            _checksum_manifests.move_to_end(key)
+            while len(_checksum_manifests) > _CHECKSUM_MANIFEST_CACHE_SIZE:
+                _checksum_manifests.popitem(last=False)
+            del _checksum_manifest_locks[key]
+
+        return checksums or None
+
+
+def _get_checksum_from_manifest(data_file_url, mechanism_name, mechanism_options, data_source_id=None):
+    """
+    Look up a file's checksum in its directory's checksum manifest.
+
+    Returns:
+    String - The file's checksum, or None if it is not listed.
+    """
+    p = urlparse(data_file_url)
+    if p.query or not p.path or p.path.endswith("/"):
+        return None
+
+    (directory_path, _, file_name) = p.path.rpartition("/")
+    directory_url = urlunparse((p.scheme, p.netloc, directory_path + "/", "", "", ""))
+
+    checksums = _get_checksum_manifest(directory_url, mechanism_name, mechanism_options, data_source_id)
+    if not checksums:
+        return None
+
+    return checksums.get(unquote(file_name))
 
 
 def _validate_md5_checksum(possible_checksum):
@@ -56,19 +188,50 @@ def _validate_md5_checksum(possible_checksum):
     return len(possible_checksum) == 32 and all(c in string.hexdigits for c in possible_checksum)
 
 
-def verify_transfer(transfer, output_path):
-    checksum_url = _md5_checksum_url(transfer.url)
+def _fetch_correct_checksum(transfer):
+    correct_checksum = _get_checksum_from_manifest(transfer.url,
+                                                   transfer.mechanism_name,
+                                                   transfer.mechanism_options,
+                                                   transfer.data_source_id)
+
+    if not correct_checksum:
+        checksum_url = _md5_checksum_url(transfer.url)
 
-    logger.debug("Fetching MD5 checksum from %s" % checksum_url)
+        logger.debug("Fetching MD5 checksum from %s" % checksum_url)
 
-    correct_checksum = _get_checksum(checksum_url,
-                                     transfer.mechanism_name,
-                                     transfer.mechanism_options,
-                                     transfer.data_source_id)
+        correct_checksum = _get_checksum(checksum_url,
+                                         transfer.mechanism_name,
+                                         transfer.mechanism_options,
+                                         transfer.data_source_id)
 
     if not _validate_md5_checksum(correct_checksum):
         raise ValueError("Fetched value is not a valid MD5 checksum")
 
+    return correct_checksum
+
+
+def verify_transfer(transfer, output_path):
+    # Use the checksum reported by other transfers of the file if the metadata repository has one
+    if transfer.file_checksum:
+        logger.debug("Using MD5 checksum from metadata repository")
+        if _compare_checksum(transfer.file_checksum.lower(), output_path):
+            return True
+
+        # The file may have changed since other transfers reported it. Check against a published checksum.
+        # The repository's checksum is only advisory, so if no checksum is published the result is unknown.
+        logger.warn("MD5 checksum does not match checksum from metadata repository")
+        try:
+            correct_checksum = _fetch_correct_checksum(transfer)
+        except Exception:
+            logger.warn("Unable to fetch published MD5 checksum")
+            return None
+
+        return _compare_checksum(correct_checksum, output_path)
+
+    return _compare_checksum(_fetch_correct_checksum(transfer), output_path)
+
+
+def _compare_checksum(correct_checksum, output_path):
     logger.info("Correct MD5 checksum = %s" % correct_checksum)
     logger.debug("Calculating MD5 checksum...")
     actual_checksum = calculate_file_checksum("md5", output_path)
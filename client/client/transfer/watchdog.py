@@ -0,0 +1,109 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import collections
+import logging
+import threading
+import time
+
+from ..config import watchdog_min_rate, watchdog_min_rate_fraction, watchdog_window
+
+
+logger = logging.getLogger("bdss")
+
+
+def minimum_transfer_rate(transfer):
+    """
+    Lowest acceptable transfer rate for a transfer.
+
+    This is the higher of the configured floor (watchdog.min_rate) and a fraction
+    (watchdog.min_rate_fraction) of the rate the metadata repository expects for the transfer's source.
+
+    Parameters:
+    transfer - Transfer
+
+    Returns:
+    Float - Rate in bytes/second, or None if there is no minimum
+    """
+    rates = []
+    if watchdog_min_rate:
+        rates.append(watchdog_min_rate)
+    if watchdog_min_rate_fraction and transfer.expected_transfer_rate:
+        rates.append(watchdog_min_rate_fraction * transfer.expected_transfer_rate)
+    return max(rates) if rates else None
+
+
+class ThroughputWatchdog():
+    """
+    Cancels a transfer if its throughput stays below a minimum rate.
+
+    Progress is sampled periodically. Once the transfer has run for a full window, the rate over the
+    most recent window is compared to the minimum.
+    """
+
+    def __init__(self, get_bytes_transferred, min_rate, cancel_event, window=watchdog_window, interval=None):
+        """
+        Parameters:
+        get_bytes_transferred - Function - Returns the number of bytes transferred so far.
+        min_rate - Float - Minimum acceptable transfer rate in bytes/second.
+        cancel_event - threading.Event - Set to cancel the transfer.
+        window - Float - Period (in seconds) over which throughput is measured.
+        interval - Float - Time (in seconds) between samples. Defaults to a sixth of the window.
+        """
+        self.get_bytes_transferred = get_bytes_transferred
+        self.min_rate = min_rate
+        self.cancel_event = cancel_event
+        self.window = window
+        self.interval = interval or window / 6
+
+        # Reason the transfer was cancelled, if the watchdog cancelled it
+        self.abort_reason = None
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="bdss-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        samples = collections.deque([(time.monotonic(), self.get_bytes_transferred())])
+        while not self._stopped.wait(self.interval):
+            now = time.monotonic()
+            samples.append((now, self.get_bytes_transferred()))
+
+            # Keep the newest sample that is at least a window old as the start of the window
+            while len(samples) > 1 and now - samples[1][0] >= self.window:
+                samples.popleft()
+
+            (start_time, start_bytes) = samples[0]
+            elapsed = now - start_time
+            if elapsed < self.window:
+                continue
+
+            rate = (samples[-1][1] - start_bytes) / elapsed
+            if rate < self.min_rate:
+                self.abort_reason = "Transfer rate %.0f bytes/s was below minimum of %.0f bytes/s for %d seconds" % (
+                    rate, self.min_rate, elapsed)
+                logger.warn(self.abort_reason)
+                self.cancel_event.set()
+                return
@@ -16,56 +16,180 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import collections
 import hashlib
 import io
 import os
 import selectors
 import subprocess
 import sys
+import threading
 
 
-def calculate_file_checksum(algorithm, path, blocksize=65536):
+# Checksums of recently transferred files. Keys are (algorithm, path). Values are (file identity, checksum).
+# See _file_identity.
+_checksum_cache = collections.OrderedDict()
+_checksum_cache_lock = threading.Lock()
+_CHECKSUM_CACHE_SIZE = 256
+
+
+def _file_identity(path):
+    """
+    Values that change if the file at path is modified or replaced.
+    """
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _cached_file_checksum(algorithm, path):
+    key = (algorithm.lower(), os.path.realpath(path))
+    with _checksum_cache_lock:
+        try:
+            (identity, checksum) = _checksum_cache[key]
+        except KeyError:
+            return None
+
+        if identity == _file_identity(path):
+            _checksum_cache.move_to_end(key)
+            return checksum
+        else:
+            del _checksum_cache[key]
+            return None
+
+
+def record_file_checksum(algorithm, path, checksum, identity=None):
+    """
+    Remember the checksum of a file so that calculate_file_checksum does not have to read it again.
+    The recorded checksum is discarded if the file is later modified.
+
+    Parameters:
+    algorithm - String - Name of hash algorithm. See hashlib.algorithms_available.
+    path - String - Path to the file.
+    checksum - String - Hex digest of the file's contents.
+    identity - tuple - Identity of the file when the checksum was calculated. See _file_identity.
+        Defaults to the file's current identity.
+    """
+    key = (algorithm.lower(), os.path.realpath(path))
+    if identity is None:
+        identity = _file_identity(path)
+
+    with _checksum_cache_lock:
+        _checksum_cache[key] = (identity, checksum.lower())
+        _checksum_cache.move_to_end(key)
+        while len(_checksum_cache) > _CHECKSUM_CACHE_SIZE:
+            _checksum_cache.popitem(last=False)
+
+
+def calculate_file_checksum(algorithm, path, blocksize=1048576):
     """
     Calculate the checksum of the file at path using the given algorithm.
     See hashlib.available_algorithms
     https://docs.python.org/3/library/hashlib.html
+
+    Checksums are cached, so checksumming the same unmodified file again does not read it again.
     """
+    checksum = _cached_file_checksum(algorithm, path)
+    if checksum:
+        return checksum
+
     h = hashlib.new(algorithm)
     with open(path, "rb") as f:
+        identity = _file_identity(path)
         for block in iter(lambda: f.read(blocksize), b""):
             h.update(block)
-    return h.hexdigest().lower()
+    checksum = h.hexdigest().lower()
+
+    # If the file changed while it was being read, don't cache a checksum of a mix of its contents
+    if identity == _file_identity(path):
+        record_file_checksum(algorithm, path, checksum, identity)
+
+    return checksum
+
+
+class ChecksumWriter():
+    """
+    Wraps a binary file, calculating a checksum of the data as it is written.
+
+    Mechanisms that write transferred data themselves can use this to avoid reading the file
+    again to calculate its checksum.
+
+    with open(output_path, "wb") as f:
+        writer = ChecksumWriter(f)
+        for chunk in chunks:
+            writer.write(chunk)
+    writer.record(output_path)
+    """
+
+    def __init__(self, file, algorithm="md5"):
+        self._file = file
+        self.algorithm = algorithm
+        self._hash = hashlib.new(algorithm)
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest().lower()
+
+    def record(self, path):
+        """
+        Record the checksum of the written data as the checksum of the file at path.
+        Only valid if the file was written sequentially, starting from empty, and has been closed.
+        """
+        record_file_checksum(self.algorithm, path, self.hexdigest())
+
+
+# Results of is_program_on_path. Keys are (program name, search path).
+_program_on_path_cache = {}
 
 
 def is_program_on_path(prog_name):
     """
     Check if a program is found on the executable search path.
 
+    Results are cached for the current search path.
+
     Parameters:
     prog_name - String - Name of the program
 
     Returns:
     Boolean - True if program is found
     """
-    for path in os.get_exec_path():
-        if not path or not os.path.isdir(path):
+    search_path = tuple(os.get_exec_path())
+    try:
+        return _program_on_path_cache[(prog_name, search_path)]
+    except KeyError:
+        pass
+
+    found = False
+    for path in search_path:
+        if not path:
             continue
 
-        if prog_name in os.listdir(path):
-            prog_path = os.path.join(path, prog_name)
-            if os.access(prog_path, os.X_OK):
-                return True
+        # Check for the program directly instead of listing the directory, which is slow for large
+        # directories on network file systems
+        prog_path = os.path.join(path, prog_name)
+        if os.path.isfile(prog_path) and os.access(prog_path, os.X_OK):
+            found = True
+            break
+
+    _program_on_path_cache[(prog_name, search_path)] = found
+    return found
 
-    return False
 
+# Interval (in seconds) at which run_subprocess checks whether it has been cancelled
+_CANCEL_POLL_INTERVAL = 0.5
 
-def run_subprocess(subprocess_args, display_output=True):
+
+def run_subprocess(subprocess_args, display_output=True, cancel_event=None):
     """
     Run a program in a subprocess. Display and capture output.
 
     Parameters:
     subprocess_args - String[] - Args to subprocess.Popen. See https://docs.python.org/3/library/subprocess.html#popen-constructor
     display_output - Boolean - Display output of subprocess as it runs.
+    cancel_event - threading.Event - If given, the subprocess is killed when this event is set.
 
     Returns:
     (Boolean, String) - Tuple of Boolean true/false if subprocess succeeded/failed based on given return codes and
@@ -85,18 +209,32 @@ def run_subprocess(subprocess_args, display_output=True):
         if display_output:
             sys.stdout.write(line)
 
+    cancelled = False
     selector = selectors.DefaultSelector()
     selector.register(process.stdout, selectors.EVENT_READ, select_callback)
     while process.poll() is None:
-        events = selector.select()
+        if cancel_event and cancel_event.is_set():
+            cancelled = True
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            break
+
+        events = selector.select(_CANCEL_POLL_INTERVAL if cancel_event else None)
         for key, mask in events:
             callback = key.data
             callback(key.fileobj, mask)
 
     return_code = process.wait()
     selector.close()
+    process.stdout.close()
+
+    if cancelled:
+        buf.write("Cancelled\n")
 
     output = buf.getvalue()
     buf.close()
 
-    return (return_code == 0, output)
+    return (return_code == 0 and not cancelled, output)
@@ -16,7 +16,9 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 from urllib.parse import urljoin
 
@@ -24,6 +26,11 @@ import requests_mock
 
 from client.actions import transfer_action
 from client.config import metadata_repository_url
+from client.transfer.base import Transfer
+from client.transfer.concurrency import HostConnectionLimiter, TransferPipeline
+from client.transfer.race import RaceResult
+from client.transfer.reporting import TransferReport
+from client.transfer.routing import LocalRouter
 
 
 class TestTransferAction(unittest.TestCase):
@@ -76,3 +83,179 @@ class TestTransferAction(unittest.TestCase):
                status_code=200)
 
         self.assertEqual(len(transfer_action.get_transfers("http://example.com/test.txt", ["curl", "aspera"])), 2)
+
+    @requests_mock.Mocker()
+    def test_get_transfers_does_not_append_default_transfer_if_url_is_downloaded_over_http(self, m):
+
+        mock_transfers = [
+            {"url": "http://example.com/test.txt", "mechanism_name": "curl", "mechanism_options": {}}
+        ]
+
+        m.post(urljoin(metadata_repository_url, "transfers"),
+               json={"transfers": mock_transfers},
+               status_code=200)
+
+        transfers = transfer_action.get_transfers("http://example.com/test.txt", ["curl", "http"])
+        self.assertEqual([t.mechanism_name for t in transfers], ["curl"])
+
+    @requests_mock.Mocker()
+    def test_get_transfers_includes_file_checksum(self, m):
+
+        mock_transfers = [
+            {"url": "http://example.org/test.txt", "mechanism_name": "aspera", "mechanism_options": {},
+             "file_checksum": "5eb63bbbe01eeed093cb22bb8f5acdc3"}
+        ]
+
+        m.post(urljoin(metadata_repository_url, "transfers"),
+               json={"transfers": mock_transfers},
+               status_code=200)
+
+        transfers = transfer_action.get_transfers("http://example.com/test.txt", ["curl", "aspera"])
+        # The default transfer is of the same file
+        self.assertEqual([t.file_checksum for t in transfers], ["5eb63bbbe01eeed093cb22bb8f5acdc3"] * 2)
+
+    @patch.object(transfer_action, "send_report")
+    @patch.object(transfer_action, "finish_data_transfer")
+    @patch.object(transfer_action, "run_data_transfer")
+    def test_transfer_file_tries_transfers_in_order(self, mock_run_data_transfer, mock_finish_data_transfer,
+                                                    mock_send_report):
+        transfers = [
+            Transfer("http://example.org/test.txt", "curl", {}),
+            Transfer("http://example.com/test.txt", "curl", {}),
+            Transfer("http://example.net/test.txt", "curl", {})
+        ]
+
+        mock_run_data_transfer.side_effect = [
+            TransferReport(url="http://example.org/test.txt", success=False),
+            TransferReport(url="http://example.com/test.txt", success=True)
+        ]
+
+        success = transfer_action.transfer_file("http://example.com/test.txt", transfers, "/tmp/test.txt", None,
+                                                HostConnectionLimiter(1), display_output=False)
+
+        self.assertTrue(success)
+        self.assertEqual([c[0][0] for c in mock_run_data_transfer.call_args_list], transfers[:2])
+        self.assertEqual(mock_send_report.call_count, 2)
+
+    @patch.object(transfer_action, "send_report")
+    @patch.object(transfer_action, "finish_data_transfer")
+    @patch.object(transfer_action, "run_data_transfer")
+    def test_transfer_file_tries_next_transfer_if_verification_fails(self, mock_run_data_transfer,
+                                                                     mock_finish_data_transfer, mock_send_report):
+        transfers = [
+            Transfer("http://example.org/test.txt", "curl", {}),
+            Transfer("http://example.com/test.txt", "curl", {})
+        ]
+
+        mock_run_data_transfer.side_effect = lambda t, *args, **kwargs: TransferReport(url=t.url, success=True)
+
+        def verify(transfer, output_path, report):
+            report.success = transfer.url == "http://example.com/test.txt"
+        mock_finish_data_transfer.side_effect = verify
+
+        success = transfer_action.transfer_file("http://example.com/test.txt", transfers, "/tmp/test.txt", None,
+                                                HostConnectionLimiter(1), display_output=False)
+
+        self.assertTrue(success)
+        self.assertEqual(mock_finish_data_transfer.call_count, 2)
+        self.assertEqual(mock_send_report.call_count, 2)
+
+    @patch.object(transfer_action, "send_report")
+    @patch.object(transfer_action, "finish_data_transfer")
+    @patch.object(transfer_action, "run_data_transfer")
+    def test_transfer_file_verifies_while_next_file_transfers(self, mock_run_data_transfer, mock_finish_data_transfer,
+                                                              mock_send_report):
+        mock_run_data_transfer.side_effect = lambda t, *args, **kwargs: TransferReport(url=t.url, success=True)
+
+        # Verification of the first file doesn't finish until the second file has been transferred
+        second_file_transferred = threading.Event()
+
+        def verify(transfer, output_path, report):
+            if transfer.url == "http://example.com/test1.txt":
+                report.success = second_file_transferred.wait(5)
+            else:
+                second_file_transferred.set()
+        mock_finish_data_transfer.side_effect = verify
+
+        pipeline = TransferPipeline(max_transfers=1, max_verifications=2)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(transfer_action.transfer_file, url, [Transfer(url, "curl", {})],
+                                       "/tmp/test.txt", None, HostConnectionLimiter(), False, 1, 0, pipeline)
+                       for url in ["http://example.com/test1.txt", "http://example.com/test2.txt"]]
+
+        self.assertEqual([f.result() for f in futures], [True, True])
+
+    @patch.object(transfer_action, "send_report")
+    @patch.object(transfer_action, "race_data_transfers")
+    def test_race_holds_transfer_slot(self, mock_race_data_transfers, mock_send_report):
+        pipeline = TransferPipeline(max_transfers=1)
+
+        def race(*args):
+            # No other transfer can start while the race runs
+            self.assertFalse(pipeline._transfer_semaphore.acquire(blocking=False))
+            result = RaceResult()
+            result.report = TransferReport(url="http://example.com/test.txt", success=True)
+            return result
+        mock_race_data_transfers.side_effect = race
+
+        transfers = [Transfer("http://example.com/test.txt", "curl", {}), Transfer("http://example.org/test.txt", "curl", {})]
+        self.assertTrue(transfer_action.transfer_file("http://example.com/test.txt", transfers, "/tmp/test.txt", None,
+                                                      HostConnectionLimiter(), False, 2, 0, pipeline))
+        self.assertTrue(mock_race_data_transfers.called)
+
+    @requests_mock.Mocker()
+    def test_get_transfers_for_urls_in_batches(self, m):
+
+        def batch_response(request, context):
+            return {
+                "results": [
+                    {"url": url, "transfers": [{"url": url.replace("example.com", "example.org"), "mechanism_name": "curl",
+                                                "mechanism_options": {}, "data_source_id": 2}], "error": None}
+                    for url in request.json()["urls"]
+                ],
+                "error": None
+            }
+
+        m.post(urljoin(metadata_repository_url, "transfers/batch"), json=batch_response, status_code=200)
+
+        urls = ["http://example.com/%d.txt" % i for i in range(5)]
+        results = list(transfer_action.get_transfers_for_urls(urls, ["curl"], batch_size=2))
+
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual([url for url, _ in results], urls)
+        self.assertEqual([t.url for t in results[0][1]], ["http://example.org/0.txt", "http://example.com/0.txt"])
+
+    @requests_mock.Mocker()
+    @patch.object(transfer_action.logger, "warn")
+    @patch.object(transfer_action, "local_router", return_value=None)
+    def test_get_transfers_for_urls_falls_back_to_single_requests(self, m, local_router, warn):
+
+        mock_transfers = [
+            {"url": "http://example.org/test.txt", "mechanism_name": "curl", "mechanism_options": {}}
+        ]
+
+        m.post(urljoin(metadata_repository_url, "transfers/batch"), status_code=404)
+        m.post(urljoin(metadata_repository_url, "transfers"), json={"transfers": mock_transfers}, status_code=200)
+
+        results = list(transfer_action.get_transfers_for_urls(["http://example.com/test.txt"], ["curl"]))
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(results[0][1]), 2)
+        self.assertTrue(warn.called)
+
+    @requests_mock.Mocker()
+    @patch.object(transfer_action.logger, "warn")
+    def test_get_transfers_for_urls_falls_back_to_cached_configuration(self, m, warn):
+        m.post(urljoin(metadata_repository_url, "transfers/batch"), status_code=500)
+
+        router = LocalRouter(dict(data_sources=[
+            dict(label="Source", transfer_mechanism=dict(type="curl", options={}), transforms=[],
+                 url_matchers=[dict(type="scheme_and_host", options=dict(scheme="http", host="example.com"))])
+        ]))
+        with patch.object(transfer_action, "local_router", return_value=router) as mock_local_router:
+            results = list(transfer_action.get_transfers_for_urls(["http://example.com/test.txt"], ["curl"]))
+
+        mock_local_router.assert_called_with(offline=True)
+        transfer = results[0][1][0]
+        self.assertEqual((transfer.url, transfer.mechanism_name, transfer.data_source_id),
+                         ("http://example.com/test.txt", "curl", "Source"))
@@ -0,0 +1,130 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import logging
+import os
+import threading
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from client.actions import transfer_action
+from client.agent import _JobLogHandler, Agent, AgentServer, is_agent_running, send_request
+from client.transfer.base import Transfer
+from client.transfer.reporting import TransferReport
+
+
+def mock_transfer_file(url, transfers, output_path, reports_file, limiter, *args):
+    logging.getLogger("bdss").info("Transferring %s", url)
+    success = "missing" not in url
+    if success:
+        reports_file.write_report(TransferReport(url=url, size=10, duration=1, success=True))
+    return success
+
+
+class TestAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.socket_path = os.path.join(self.temp_dir.name, "agent.sock")
+
+        self.agent = Agent(max_jobs=2)
+        self.server = AgentServer(self.socket_path, self.agent)
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.start()
+
+        self.log_handler = _JobLogHandler()
+        logger = logging.getLogger("bdss")
+        logger.addHandler(self.log_handler)
+        self.log_level = logger.level
+        logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        logger = logging.getLogger("bdss")
+        logger.removeHandler(self.log_handler)
+        logger.setLevel(self.log_level)
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+        self.agent.executor.shutdown()
+        self.temp_dir.cleanup()
+
+    def test_is_agent_running(self):
+        self.assertTrue(is_agent_running(self.socket_path))
+        self.assertFalse(is_agent_running(os.path.join(self.temp_dir.name, "other.sock")))
+
+    @patch.object(transfer_action, "transfer_file", side_effect=mock_transfer_file)
+    @patch.object(transfer_action, "available_mechanisms", return_value=["http"])
+    @patch.object(transfer_action, "get_transfers_for_urls",
+                  side_effect=lambda urls, mechanisms: [(url, [Transfer(url)]) for url in urls])
+    def test_transfer_job(self, mock_get_transfers, mock_available_mechanisms, mock_transfer_file):
+        urls = ["http://example.com/file.txt", "http://example.com/missing.txt"]
+        events = list(send_request(self.socket_path, dict(action="transfer", urls=urls,
+                                                          destination=self.temp_dir.name)))
+
+        self.assertIn("Transferring http://example.com/file.txt", [e["message"] for e in events if e["event"] == "log"])
+        self.assertEqual([e["url"] for e in events if e["event"] == "report"], ["http://example.com/file.txt"])
+        self.assertEqual({e["url"]: e["success"] for e in events if e["event"] == "result"},
+                         {"http://example.com/file.txt": True, "http://example.com/missing.txt": False})
+        self.assertEqual(events[-1], {"event": "done", "success": False})
+
+    def test_unknown_action(self):
+        events = list(send_request(self.socket_path, dict(action="unknown")))
+        self.assertEqual(events[-1]["event"], "error")
+
+
+class TestAgentTransfersCache(unittest.TestCase):
+
+    @patch.object(transfer_action, "get_transfers_for_urls")
+    def test_reuses_resolved_transfers(self, mock_get_transfers):
+        mock_get_transfers.side_effect = lambda urls, mechanisms: [
+            (url, [Transfer(url.replace("http://", "http://mirror."))]) for url in urls]
+
+        agent = Agent()
+        list(agent.resolve_transfers(["http://example.com/a.txt"], ["http"]))
+        results = dict(agent.resolve_transfers(["http://example.com/a.txt", "http://example.com/b.txt"], ["http"]))
+        agent.executor.shutdown()
+
+        self.assertEqual(mock_get_transfers.call_count, 2)
+        self.assertEqual(mock_get_transfers.call_args[0][0], ["http://example.com/b.txt"])
+        self.assertEqual(results["http://example.com/a.txt"][0].url, "http://mirror.example.com/a.txt")
+
+    @patch.object(transfer_action, "get_transfers_for_urls")
+    def test_jobs_do_not_share_transfers(self, mock_get_transfers):
+        mock_get_transfers.side_effect = lambda urls, mechanisms: [
+            (url, [Transfer(url.replace("http://", "http://mirror."), "http", {})]) for url in urls]
+
+        agent = Agent()
+        [(_, first)] = agent.resolve_transfers(["http://example.com/a.txt"], ["http"])
+        [(_, second)] = agent.resolve_transfers(["http://example.com/a.txt"], ["http"])
+        agent.executor.shutdown()
+
+        self.assertEqual(first, second)
+        self.assertIsNot(first[0], second[0])
+        self.assertIsNot(first[0].mechanism, second[0].mechanism)
+
+    @patch.object(transfer_action, "get_transfers_for_urls")
+    def test_does_not_reuse_default_transfers(self, mock_get_transfers):
+        mock_get_transfers.side_effect = lambda urls, mechanisms: [(url, [Transfer(url)]) for url in urls]
+
+        agent = Agent()
+        list(agent.resolve_transfers(["http://example.com/a.txt"], ["http"]))
+        list(agent.resolve_transfers(["http://example.com/a.txt"], ["http"]))
+        agent.executor.shutdown()
+
+        self.assertEqual(mock_get_transfers.call_count, 2)
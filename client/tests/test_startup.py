@@ -0,0 +1,92 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+import unittest
+from tempfile import TemporaryDirectory
+
+from client.actions import _action_help
+
+
+CLIENT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that are slow to import and are not needed to print help, version information, or cached mechanisms.
+SLOW_MODULES = ["colorlog", "pkg_resources", "requests", "voluptuous"]
+
+# Generous upper bound on startup time. This should only fail if startup regresses badly.
+MAX_STARTUP_SECONDS = 2.0
+
+# Run the client and print the modules that were loaded.
+RUN_CLIENT = """
+import json, sys
+from client.__main__ import main
+try:
+    main()
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps(sorted(sys.modules.keys())))
+"""
+
+
+def run_client(args, home_directory):
+    env = dict(os.environ, HOME=home_directory)
+    start_time = time.time()
+    process = subprocess.run([sys.executable, "-c", RUN_CLIENT] + args, cwd=CLIENT_DIRECTORY, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    duration = time.time() - start_time
+    loaded_modules = json.loads(process.stderr.splitlines()[-1])
+    return (loaded_modules, duration)
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        self.home_directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.home_directory.cleanup()
+
+    def assertFastStartup(self, args):
+        (loaded_modules, duration) = run_client(args, self.home_directory.name)
+        for module in SLOW_MODULES:
+            self.assertNotIn(module, loaded_modules)
+        self.assertLess(duration, MAX_STARTUP_SECONDS)
+
+    def test_help(self):
+        self.assertFastStartup(["--no-color", "--help"])
+
+    def test_version(self):
+        self.assertFastStartup(["--no-color", "version"])
+
+    def test_cached_mechanisms(self):
+        # The first run populates the available mechanisms cache.
+        run_client(["--no-color", "mechanisms"], self.home_directory.name)
+        self.assertFastStartup(["--no-color", "mechanisms"])
+
+
+class TestActionHelp(unittest.TestCase):
+
+    def test_action_help_matches_modules(self):
+        for action, help_text in _action_help.items():
+            module = importlib.import_module("client.actions.%s_action" % action)
+            self.assertEqual(help_text, module.cli_help)
@@ -16,10 +16,14 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import os
+import threading
+import time
 import unittest
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from unittest.mock import patch
 
-from client.util import calculate_file_checksum
+from client.util import calculate_file_checksum, ChecksumWriter, run_subprocess
 
 
 class TestCalculateFileChecksum(unittest.TestCase):
@@ -34,3 +38,54 @@ class TestCalculateFileChecksum(unittest.TestCase):
             f.flush()
             calculated_checksum = calculate_file_checksum("md5", f.name)
             self.assertEqual(calculated_checksum, self.correct_md5_checksum)
+
+    def test_checksum_is_not_recalculated_for_unmodified_file(self):
+        with NamedTemporaryFile() as f:
+            f.write(self.file_data.encode())
+            f.flush()
+            calculate_file_checksum("md5", f.name)
+
+            with patch("hashlib.new") as mock_hash:
+                self.assertEqual(calculate_file_checksum("md5", f.name), self.correct_md5_checksum)
+                mock_hash.assert_not_called()
+
+    def test_checksum_is_recalculated_for_modified_file(self):
+        with NamedTemporaryFile() as f:
+            f.write(b"other data")
+            f.flush()
+            calculate_file_checksum("md5", f.name)
+
+            f.seek(0)
+            f.truncate()
+            f.write(self.file_data.encode())
+            f.flush()
+            self.assertEqual(calculate_file_checksum("md5", f.name), self.correct_md5_checksum)
+
+
+class TestChecksumWriter(unittest.TestCase):
+
+    def test_records_checksum_of_written_data(self):
+        with TemporaryDirectory() as d:
+            path = os.path.join(d, "file")
+            with open(path, "wb") as f:
+                writer = ChecksumWriter(f)
+                writer.write(b"Lorem ipsum ")
+                writer.write(b"dolor sit amet")
+            writer.record(path)
+
+            with patch("hashlib.new") as mock_hash:
+                self.assertEqual(calculate_file_checksum("md5", path), "fea80f2db003d4ebc4536023814aa885")
+                mock_hash.assert_not_called()
+
+
+class TestRunSubprocess(unittest.TestCase):
+
+    def test_cancel_subprocess(self):
+        cancel_event = threading.Event()
+        threading.Timer(0.2, cancel_event.set).start()
+
+        start_time = time.time()
+        (success, output) = run_subprocess(["sleep", "10"], False, cancel_event)
+
+        self.assertFalse(success)
+        self.assertLess(time.time() - start_time, 5)
@@ -0,0 +1,71 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from client.transfer import mechanisms
+from client.transfer.mechanisms.curl import CurlMechanism
+
+
+class TestAvailableMechanisms(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.bin_directory = os.path.join(self.directory.name, "bin")
+        os.mkdir(self.bin_directory)
+
+        patches = [
+            patch.object(mechanisms, "AVAILABLE_MECHANISMS_CACHE_PATH", os.path.join(self.directory.name, "cache.json")),
+            patch.object(mechanisms, "_available_mechanisms", None),
+            patch.dict(os.environ, {"PATH": self.bin_directory})
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _install_program(self, name):
+        path = os.path.join(self.bin_directory, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(path, 0o755)
+
+        # Make sure the directory's modification time changes even on file systems with coarse timestamps
+        st = os.stat(self.bin_directory)
+        os.utime(self.bin_directory, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+    def test_availability_is_cached_between_runs(self):
+        self._install_program("curl")
+        self.assertIn("curl", mechanisms.available_mechanisms())
+
+        mechanisms._available_mechanisms = None
+        with patch.object(CurlMechanism, "is_available") as mock_is_available:
+            self.assertIn("curl", mechanisms.available_mechanisms())
+            mock_is_available.assert_not_called()
+
+    def test_cache_is_invalidated_when_search_path_changes(self):
+        self.assertNotIn("scp", mechanisms.available_mechanisms())
+
+        self._install_program("scp")
+        mechanisms._available_mechanisms = None
+        with patch("client.util._program_on_path_cache", {}):
+            self.assertIn("scp", mechanisms.available_mechanisms())
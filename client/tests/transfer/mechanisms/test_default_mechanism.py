@@ -25,8 +25,8 @@ class TestDefaultMechanism(unittest.TestCase):
 
     def test_correct_default_mechanism_for_url_scheme(self):
 
-        self.assertEqual(default_mechanism("http://example.com/file.txt")[0], "curl")
-        self.assertEqual(default_mechanism("https://example.com/file.txt")[0], "curl")
+        self.assertEqual(default_mechanism("http://example.com/file.txt")[0], "http")
+        self.assertEqual(default_mechanism("https://example.com/file.txt")[0], "http")
         self.assertEqual(default_mechanism("ftp://example.com/file.txt")[0], "curl")
 
         self.assertEqual(default_mechanism("scp://user@example.com:/file.txt")[0], "scp")
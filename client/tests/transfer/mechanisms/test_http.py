@@ -0,0 +1,180 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import requests
+import requests_mock
+
+from client.transfer.mechanisms import http
+from client.transfer.mechanisms.http import _segment_ranges, HTTPMechanism
+from client.util import calculate_file_checksum
+
+
+class TestHTTPMechanism(unittest.TestCase):
+
+    @requests_mock.Mocker()
+    def test_transfer_file(self, m):
+        m.get("http://example.com/file.txt", content=b"Lorem ipsum dolor sit amet")
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.txt")
+            (success, output) = HTTPMechanism().transfer_file("http://example.com/file.txt", output_path, False)
+
+            self.assertTrue(success)
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), b"Lorem ipsum dolor sit amet")
+
+            # Checksum is recorded as the file is written
+            with patch("hashlib.new") as mock_hash:
+                self.assertEqual(calculate_file_checksum("md5", output_path), "fea80f2db003d4ebc4536023814aa885")
+                mock_hash.assert_not_called()
+
+    @requests_mock.Mocker()
+    def test_transfer_fails_on_error_status(self, m):
+        m.get("http://example.com/file.txt", status_code=404, reason="Not Found")
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.txt")
+            (success, output) = HTTPMechanism().transfer_file("http://example.com/file.txt", output_path, False)
+
+            self.assertFalse(success)
+            self.assertIn("404 Not Found", output)
+            self.assertFalse(os.path.exists(output_path))
+
+    @requests_mock.Mocker()
+    def test_transfer_fails_on_connection_error(self, m):
+        m.get("http://example.com/file.txt", exc=requests.exceptions.ConnectionError)
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.txt")
+            (success, output) = HTTPMechanism().transfer_file("http://example.com/file.txt", output_path, False)
+
+            self.assertFalse(success)
+
+    @requests_mock.Mocker()
+    def test_resume_transfer_file(self, m):
+        m.get("http://example.com/file.txt", status_code=206, content=b" dolor sit amet",
+              headers={"Content-Range": "bytes 11-25/26"})
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.txt")
+            with open(output_path, "wb") as f:
+                f.write(b"Lorem ipsum")
+
+            (success, output) = HTTPMechanism().resume_transfer_file("http://example.com/file.txt", output_path, False)
+
+            self.assertTrue(success)
+            self.assertEqual(m.last_request.headers["Range"], "bytes=11-")
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), b"Lorem ipsum dolor sit amet")
+
+    @requests_mock.Mocker()
+    def test_resume_fails_if_response_starts_at_wrong_position(self, m):
+        m.get("http://example.com/file.txt", status_code=206, content=b"Lorem ipsum dolor sit amet",
+              headers={"Content-Range": "bytes 0-25/26"})
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.txt")
+            with open(output_path, "wb") as f:
+                f.write(b"Lorem ipsum")
+
+            (success, output) = HTTPMechanism().resume_transfer_file("http://example.com/file.txt", output_path, False)
+
+            self.assertFalse(success)
+            self.assertIn("Content-Range", output)
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), b"Lorem ipsum")
+
+
+class TestSegmentedHTTPTransfer(unittest.TestCase):
+
+    def setUp(self):
+        self.file_data = bytes(range(256)) * 40
+
+    def _range_response(self, request, context):
+        (first_byte, last_byte) = [int(b) for b in request.headers["Range"][len("bytes="):].split("-")]
+        context.status_code = 206
+        context.headers["Content-Range"] = "bytes %d-%d/%d" % (first_byte, last_byte, len(self.file_data))
+        return self.file_data[first_byte:last_byte + 1]
+
+    def test_segment_ranges(self):
+        self.assertEqual(_segment_ranges(10, 3), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(_segment_ranges(10, 2, 4), [(0, 3), (4, 7), (8, 9)])
+
+    @requests_mock.Mocker()
+    def test_transfer_file_in_segments(self, m):
+        m.head("http://example.com/file.dat", headers={"Accept-Ranges": "bytes", "Content-Length": str(len(self.file_data))})
+        m.get("http://example.com/file.dat", content=self._range_response)
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.dat")
+            mechanism = HTTPMechanism(segments=4, segment_size=1000)
+            (success, output) = mechanism.transfer_file("http://example.com/file.dat", output_path, False)
+
+            self.assertTrue(success)
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), self.file_data)
+
+            range_headers = [r.headers.get("Range") for r in m.request_history if r.method == "GET"]
+            self.assertEqual(len(range_headers), 11)
+            self.assertIn("bytes=10000-10239", range_headers)
+
+    @requests_mock.Mocker()
+    def test_connections_are_limited_to_pool_size(self, m):
+        m.head("http://example.com/file.dat", headers={"Accept-Ranges": "bytes", "Content-Length": str(len(self.file_data))})
+        m.get("http://example.com/file.dat", content=self._range_response)
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.dat")
+            with patch.object(http, "MAX_CONNECTIONS_PER_HOST", 2):
+                (success, output) = HTTPMechanism(segments=8).transfer_file("http://example.com/file.dat", output_path, False)
+
+            self.assertTrue(success)
+            self.assertIn("in 2 segments over 2 connections", output)
+
+    @requests_mock.Mocker()
+    def test_transfer_file_without_range_support(self, m):
+        m.head("http://example.com/file.dat", headers={"Content-Length": str(len(self.file_data))})
+        m.get("http://example.com/file.dat", content=self.file_data)
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.dat")
+            (success, output) = HTTPMechanism(segments=4).transfer_file("http://example.com/file.dat", output_path, False)
+
+            self.assertTrue(success)
+            self.assertEqual([r.headers.get("Range") for r in m.request_history if r.method == "GET"], [None])
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), self.file_data)
+
+    @requests_mock.Mocker()
+    def test_transfer_fails_if_segment_fails(self, m):
+        m.head("http://example.com/file.dat", headers={"Accept-Ranges": "bytes", "Content-Length": str(len(self.file_data))})
+        m.get("http://example.com/file.dat", status_code=200, content=self.file_data)
+
+        with TemporaryDirectory() as d:
+            output_path = os.path.join(d, "file.dat")
+            (success, output) = HTTPMechanism(segments=2).transfer_file("http://example.com/file.dat", output_path, False)
+
+            self.assertFalse(success)
+            self.assertIn("Unexpected response to range request", output)
+
+            # The preallocated file is not left to be resumed
+            self.assertFalse(os.path.exists(output_path))
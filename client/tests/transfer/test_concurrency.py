@@ -0,0 +1,63 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import threading
+import time
+import unittest
+
+from client.transfer.concurrency import HostConnectionLimiter
+
+
+class TestHostConnectionLimiter(unittest.TestCase):
+
+    def _run_concurrently(self, limiter, urls):
+        lock = threading.Lock()
+        active = {}
+        max_active = {}
+
+        def transfer(url):
+            with limiter.connection(url):
+                with lock:
+                    active[url] = active.get(url, 0) + 1
+                    max_active[url] = max(max_active.get(url, 0), active[url])
+                time.sleep(0.05)
+                with lock:
+                    active[url] -= 1
+
+        threads = [threading.Thread(target=transfer, args=(url,)) for url in urls]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        return max_active
+
+    def test_limits_connections_per_host(self):
+        limiter = HostConnectionLimiter(2)
+        max_active = self._run_concurrently(limiter, ["http://example.com/file.txt"] * 6)
+        self.assertEqual(max_active["http://example.com/file.txt"], 2)
+
+    def test_hosts_are_limited_independently(self):
+        limiter = HostConnectionLimiter(1)
+        max_active = self._run_concurrently(limiter, ["http://example.com/file.txt", "http://example.org/file.txt"])
+        self.assertEqual(max_active, {"http://example.com/file.txt": 1, "http://example.org/file.txt": 1})
+
+    def test_no_limit(self):
+        limiter = HostConnectionLimiter(None)
+        max_active = self._run_concurrently(limiter, ["http://example.com/file.txt"] * 4)
+        self.assertEqual(max_active["http://example.com/file.txt"], 4)
@@ -0,0 +1,97 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from client.transfer import data
+from client.transfer.verification import VerificationReport
+
+
+class MockTransfer():
+
+    def __init__(self, results, can_resume=True):
+        self.url = "http://example.com/file.txt"
+        self.mechanism_name = "http"
+        self.mechanism_options = {}
+        self.can_resume = can_resume
+        self.runs = []
+        self._results = list(results)
+
+    def run(self, output_path, display_output=True, resume=False, cancel_event=None):
+        self.runs.append((output_path, resume))
+        (success, file_data) = self._results.pop(0)
+        with open(output_path, "ab" if resume else "wb") as f:
+            f.write(file_data)
+        return (success, "")
+
+
+@patch.object(data, "verify_data_transfer", return_value=[VerificationReport("test", True)])
+class TestRunDataTransfer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.output_path = os.path.join(self.directory.name, "file.txt")
+        self.partial_path = os.path.join(self.directory.name, "file.part.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_file_is_moved_to_output_path_after_success(self, mock_verify):
+        report = data.run_data_transfer(MockTransfer([(True, b"hello world")]), self.output_path, False)
+
+        self.assertTrue(report.success)
+        self.assertEqual(os.listdir(self.directory.name), ["file.txt"])
+        with open(self.output_path, "rb") as f:
+            self.assertEqual(f.read(), b"hello world")
+
+    def test_failed_transfer_is_resumed(self, mock_verify):
+        report = data.run_data_transfer(MockTransfer([(False, b"hello ")]), self.output_path, False)
+        self.assertFalse(report.success)
+        self.assertFalse(os.path.exists(self.output_path))
+        self.assertTrue(os.path.exists(self.partial_path))
+
+        transfer = MockTransfer([(True, b"world")])
+        report = data.run_data_transfer(transfer, self.output_path, False)
+
+        self.assertTrue(report.success)
+        self.assertEqual(transfer.runs, [(self.partial_path, True)])
+        self.assertEqual(report.size, len(b"world"))
+        self.assertEqual(os.listdir(self.directory.name), ["file.txt"])
+        with open(self.output_path, "rb") as f:
+            self.assertEqual(f.read(), b"hello world")
+
+    def test_partial_file_is_discarded_if_mechanism_cannot_resume(self, mock_verify):
+        data.run_data_transfer(MockTransfer([(False, b"hello ")]), self.output_path, False)
+
+        transfer = MockTransfer([(True, b"hello world")], can_resume=False)
+        report = data.run_data_transfer(transfer, self.output_path, False)
+
+        self.assertTrue(report.success)
+        self.assertEqual(transfer.runs, [(self.partial_path, False)])
+        with open(self.output_path, "rb") as f:
+            self.assertEqual(f.read(), b"hello world")
+
+    def test_file_is_not_kept_if_verification_fails(self, mock_verify):
+        mock_verify.return_value = [VerificationReport("test", False)]
+
+        report = data.run_data_transfer(MockTransfer([(True, b"hello world")]), self.output_path, False)
+
+        self.assertFalse(report.success)
+        self.assertEqual(os.listdir(self.directory.name), [])
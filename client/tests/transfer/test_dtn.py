@@ -0,0 +1,138 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import stat
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
+
+from client.transfer.dtn import assign_files_to_hosts, SSHConnection, transfer_files_with_dtn, transfer_files_with_dtns
+
+
+# Runs commands locally instead of on a remote host
+FAKE_SSH = """\
+#!/usr/bin/env python3
+import subprocess, sys
+args = sys.argv[1:]
+while args and args[0].startswith("-"):
+    option = args.pop(0)
+    if option in ("-o", "-O"):
+        args.pop(0)
+if "unreachable" in args[0]:
+    sys.exit(255)
+if "-N" in sys.argv or "-O" in sys.argv:
+    sys.exit(0)
+sys.exit(subprocess.call(["sh", "-c", " ".join(args[1:])]))
+"""
+
+# Writes each URL in the manifest to a file, except URLs containing "missing"
+FAKE_BDSS = """\
+#!/usr/bin/env python3
+import argparse, os
+parser = argparse.ArgumentParser()
+parser.add_argument("--no-color", action="store_true")
+parser.add_argument("action")
+parser.add_argument("--destination")
+parser.add_argument("--transfer-report")
+parser.add_argument("manifest")
+args = parser.parse_args()
+with open(args.transfer_report, "w") as report:
+    report.write("URL,Transfer Time (s),Transfer Size (bytes),Transfer Rate(bytes/s)\\n")
+    for url in open(args.manifest).read().split():
+        if "missing" in url:
+            continue
+        with open(os.path.join(args.destination, url.rpartition("/")[2]), "w") as f:
+            f.write(url)
+        report.write("%s,1.0,%d,%f\\n" % (url, len(url), len(url)))
+        report.flush()
+"""
+
+
+class TestTransferFilesWithDTN(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.bin_directory = os.path.join(self.temp_dir.name, "bin")
+        self.dtn_directory = os.path.join(self.temp_dir.name, "dtn")
+        self.local_directory = os.path.join(self.temp_dir.name, "local")
+        for d in (self.bin_directory, self.dtn_directory, self.local_directory):
+            os.mkdir(d)
+
+        for name, script in (("ssh", FAKE_SSH), ("bdss", FAKE_BDSS)):
+            path = os.path.join(self.bin_directory, name)
+            with open(path, "w") as f:
+                f.write(script)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+        self.path_patcher = patch.dict(os.environ, {"PATH": self.bin_directory + os.pathsep + os.environ["PATH"]})
+        self.path_patcher.start()
+
+    def tearDown(self):
+        self.path_patcher.stop()
+        self.temp_dir.cleanup()
+
+    def local_files(self, urls):
+        return [(url, os.path.join(self.local_directory, url.rpartition("/")[2])) for url in urls]
+
+    def test_transfer_files_with_dtn(self):
+        files = self.local_files([
+            "http://example.com/file1.txt",
+            "http://example.com/file2.txt",
+            "http://example.com/missing.txt"
+        ])
+        reports_file = MagicMock()
+
+        with SSHConnection("dtn.example.com", "user") as connection:
+            (transferred_urls, succeeded) = transfer_files_with_dtn(files, connection, self.dtn_directory, reports_file)
+
+        self.assertTrue(succeeded)
+        self.assertEqual(sorted(transferred_urls), ["http://example.com/file1.txt", "http://example.com/file2.txt"])
+        for url, output_path in files[:2]:
+            with open(output_path) as f:
+                self.assertEqual(f.read(), url)
+        self.assertEqual(sorted(os.listdir(self.local_directory)), ["file1.txt", "file2.txt"])
+        self.assertEqual(reports_file.write_report.call_count, 2)
+
+        # Files are removed from the DTN
+        self.assertEqual(os.listdir(self.dtn_directory), [])
+
+    @patch("client.transfer.dtn.estimate_file_sizes", return_value={})
+    def test_reassigns_files_from_unreachable_dtn(self, mock_estimate_file_sizes):
+        urls = ["http://example.com/file%d.txt" % i for i in range(4)]
+
+        transferred_urls = transfer_files_with_dtns(self.local_files(urls), ["unreachable.example.com", "dtn.example.com"],
+                                                    dtn_path=self.dtn_directory)
+
+        self.assertEqual(sorted(transferred_urls), urls)
+        self.assertEqual(sorted(os.listdir(self.local_directory)), ["file%d.txt" % i for i in range(4)])
+
+
+class TestAssignFilesToHosts(unittest.TestCase):
+
+    def test_balances_by_size(self):
+        sizes = {"a": 100, "b": 60, "c": 50, "d": 40, "e": None}
+        assignments = assign_files_to_hosts(list(sizes.keys()), sizes, ["dtn1", "dtn2"])
+
+        # "e" is assumed to be the average size of the other files
+        self.assertEqual(assignments, {"dtn1": ["a", "c"], "dtn2": ["e", "b", "d"]})
+
+    def test_excluded_hosts(self):
+        assignments = assign_files_to_hosts(["a", "b"], {}, ["dtn1", "dtn2"], {"a": {"dtn1"}, "b": {"dtn1", "dtn2"}})
+
+        self.assertEqual(assignments, {"dtn2": ["a"]})
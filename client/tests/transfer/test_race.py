@@ -0,0 +1,107 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import os
+import time
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from client.transfer import data
+from client.transfer.concurrency import HostConnectionLimiter
+from client.transfer.race import race_data_transfers
+
+
+class MockTransfer():
+
+    def __init__(self, url, chunk_size, num_chunks=20, fail=False, preallocate=False):
+        self.url = url
+        self.mechanism_name = "http"
+        self.mechanism_options = {}
+        self.can_resume = False
+        self.chunk_size = chunk_size
+        self.num_chunks = num_chunks
+        self.fail = fail
+        self.preallocate = preallocate
+        self.cancelled = False
+        self.bytes_transferred = None
+
+    def run(self, output_path, display_output=True, resume=False, cancel_event=None):
+        if self.fail:
+            return (False, "")
+
+        with open(output_path, "wb") as f:
+            if self.preallocate:
+                # Like segmented HTTP transfers, the file's size doesn't show progress
+                f.truncate(self.chunk_size * self.num_chunks)
+                self.bytes_transferred = 0
+            for _ in range(self.num_chunks):
+                if cancel_event.is_set():
+                    self.cancelled = True
+                    return (False, "Cancelled")
+                f.write(b"x" * self.chunk_size)
+                f.flush()
+                if self.preallocate:
+                    self.bytes_transferred += self.chunk_size
+                time.sleep(0.02)
+        return (True, "")
+
+
+@patch.object(data, "verify_data_transfer", return_value=[])
+class TestRaceDataTransfers(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.output_path = os.path.join(self.directory.name, "file.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_keeps_fastest_transfer(self, mock_verify):
+        slow = MockTransfer("http://slow.example.com/file.txt", 1)
+        fast = MockTransfer("http://fast.example.com/file.txt", 100)
+        failing = MockTransfer("http://broken.example.com/file.txt", 100, fail=True)
+
+        result = race_data_transfers([slow, fast, failing], self.output_path, HostConnectionLimiter(None), 0.2)
+
+        self.assertTrue(result.report.success)
+        self.assertEqual(result.report.url, fast.url)
+        self.assertEqual([r.url for r in result.failed_reports], [failing.url])
+        self.assertEqual(result.cancelled_transfers, [slow])
+        self.assertTrue(slow.cancelled)
+
+        self.assertEqual(os.listdir(self.directory.name), ["file.txt"])
+        self.assertEqual(os.path.getsize(self.output_path), 2000)
+
+    def test_keeps_transfer_that_finishes_during_probe(self, mock_verify):
+        slow = MockTransfer("http://slow.example.com/file.txt", 1)
+        quick = MockTransfer("http://quick.example.com/file.txt", 10, num_chunks=1)
+
+        result = race_data_transfers([slow, quick], self.output_path, HostConnectionLimiter(None), 5)
+
+        self.assertEqual(result.report.url, quick.url)
+        self.assertEqual(result.cancelled_transfers, [slow])
+        self.assertEqual(os.listdir(self.directory.name), ["file.txt"])
+
+    def test_measures_progress_of_preallocated_files(self, mock_verify):
+        slow = MockTransfer("http://slow.example.com/file.txt", 1)
+        preallocated = MockTransfer("http://preallocated.example.com/file.txt", 100, preallocate=True)
+
+        result = race_data_transfers([slow, preallocated], self.output_path, HostConnectionLimiter(None), 0.2)
+
+        self.assertEqual(result.report.url, preallocated.url)
+        self.assertEqual(result.cancelled_transfers, [slow])
@@ -0,0 +1,174 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+import requests_mock
+
+from client.transfer import reporting
+from client.transfer.reporting import report_data, ReportSender, TransferReport
+
+
+REPOSITORY_URL = "http://bdss.example.com"
+
+
+def _report(url):
+    return dict(url=url, file_size_bytes=1000, transfer_duration_seconds=1.0, is_success=True,
+                mechanism_output=None, file_checksum="a" * 32)
+
+
+def _batch_response(request, context):
+    reports = json.loads(gzip.decompress(request.body).decode("utf-8"))
+    return {"success": True, "results": [{"success": True, "error": None} for r in reports], "error": None}
+
+
+class TestReportSender(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.spool_directory)
+
+    @requests_mock.Mocker()
+    def test_sends_reports_in_batches(self, m):
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", json=_batch_response)
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory, batch_size=2, batch_interval=60)
+        for i in range(3):
+            sender.send(_report("http://example.com/file%d" % i))
+        sender.flush()
+
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(m.request_history[0].headers["Content-Encoding"], "gzip")
+        batches = [json.loads(gzip.decompress(r.body).decode("utf-8")) for r in m.request_history]
+        self.assertEqual([[report["url"] for report in batch] for batch in batches],
+                         [["http://example.com/file0", "http://example.com/file1"], ["http://example.com/file2"]])
+        self.assertEqual(os.listdir(self.spool_directory), [])
+
+    @requests_mock.Mocker()
+    def test_spools_reports_when_repository_is_unreachable(self, m):
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", exc=requests.exceptions.ConnectionError)
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory, batch_size=2, batch_interval=60)
+        for i in range(3):
+            sender.send(_report("http://example.com/file%d" % i))
+        sender.flush()
+
+        # Once the repository is found to be unreachable, remaining batches are spooled without retrying
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(len(os.listdir(self.spool_directory)), 2)
+
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", json=_batch_response)
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory)
+        sender.send(_report("http://example.com/file3"))
+        sender.flush()
+
+        sent_urls = [report["url"] for r in m.request_history[1:] for report in json.loads(gzip.decompress(r.body).decode("utf-8"))]
+        self.assertEqual(sorted(sent_urls), ["http://example.com/file%d" % i for i in range(4)])
+        self.assertEqual(os.listdir(self.spool_directory), [])
+
+    @requests_mock.Mocker()
+    def test_falls_back_to_single_reports(self, m):
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", status_code=404)
+        m.post(REPOSITORY_URL + "/transfer_reports", json={"success": True, "error": None})
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory)
+        for i in range(2):
+            sender.send(_report("http://example.com/file%d" % i))
+        sender.flush()
+
+        self.assertEqual([r.path for r in m.request_history],
+                         ["/transfer_reports/batch", "/transfer_reports", "/transfer_reports"])
+        self.assertEqual(os.listdir(self.spool_directory), [])
+
+    def _spooled_urls(self):
+        urls = []
+        for filename in os.listdir(self.spool_directory):
+            with open(os.path.join(self.spool_directory, filename)) as f:
+                urls.extend(report["url"] for report in json.load(f))
+        return sorted(urls)
+
+    @requests_mock.Mocker()
+    def test_retries_after_repository_becomes_reachable(self, m):
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", [
+            {"exc": requests.exceptions.ConnectionError},
+            {"json": _batch_response},
+        ])
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory, batch_size=1, batch_interval=60, retry_interval=0)
+        for i in range(2):
+            sender.send(_report("http://example.com/file%d" % i))
+        sender.flush()
+
+        # Once a request succeeds again, reports saved while the repository was unreachable are sent
+        sent_urls = [report["url"] for r in m.request_history[1:] for report in json.loads(gzip.decompress(r.body).decode("utf-8"))]
+        self.assertEqual(sent_urls, ["http://example.com/file1", "http://example.com/file0"])
+        self.assertEqual(os.listdir(self.spool_directory), [])
+
+    @requests_mock.Mocker()
+    def test_reclaims_reports_left_by_stopped_client(self, m):
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", json=_batch_response)
+
+        for name, age in [("1-stale.json.sending", 2 * reporting.REPORT_CLAIM_TIMEOUT), ("2-claimed.json.sending", 0)]:
+            path = os.path.join(self.spool_directory, name)
+            with open(path, "w") as f:
+                json.dump([_report("http://example.com/%s" % name)], f)
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory)
+        sender.send(_report("http://example.com/file"))
+        sender.flush()
+
+        sent_urls = [report["url"] for r in m.request_history for report in json.loads(gzip.decompress(r.body).decode("utf-8"))]
+        self.assertEqual(sorted(sent_urls), ["http://example.com/1-stale.json.sending", "http://example.com/file"])
+        self.assertEqual(os.listdir(self.spool_directory), ["2-claimed.json.sending"])
+
+    @requests_mock.Mocker()
+    def test_spools_only_unsent_single_reports(self, m):
+        m.post(REPOSITORY_URL + "/transfer_reports/batch", status_code=404)
+        m.post(REPOSITORY_URL + "/transfer_reports", [
+            {"json": {"success": True, "error": None}},
+            {"exc": requests.exceptions.ConnectionError},
+        ])
+
+        sender = ReportSender(REPOSITORY_URL, self.spool_directory, batch_size=3, batch_interval=60)
+        for i in range(3):
+            sender.send(_report("http://example.com/file%d" % i))
+        sender.flush()
+
+        self.assertEqual(self._spooled_urls(), ["http://example.com/file1", "http://example.com/file2"])
+
+
+class TestReportData(unittest.TestCase):
+
+    def test_report_data_includes_abort_reason(self):
+        report = TransferReport(url="http://example.com/file.txt", size=1000, duration=1.0, success=False,
+                                mechanism_name="curl", mechanism_output="output", abort_reason="Too slow")
+
+        data = report_data(report)
+
+        self.assertEqual(data["mechanism_output"], "output")
+        self.assertEqual(data["abort_reason"], "Too slow")
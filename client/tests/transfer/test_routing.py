@@ -0,0 +1,139 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+from urllib.parse import urljoin
+
+import requests_mock
+
+from client.config import metadata_repository_url
+from client.transfer import routing
+
+
+def data_source(label, host, mechanism="curl", transforms=None):
+    return dict(label=label,
+                description=None,
+                transfer_mechanism=dict(type=mechanism, options={}),
+                test_files=[],
+                transforms=transforms or [],
+                url_matchers=[dict(type="scheme_and_host", options=dict(scheme="http", host=host))])
+
+
+def change_host(target, new_host, for_destinations=None):
+    return dict(target=target, for_destinations=for_destinations or [], type="change_host",
+                options=dict(new_host=new_host))
+
+
+CONFIGURATION = dict(
+    data_sources=[
+        data_source("Test Source", "example.com", transforms=[
+            change_host("Target Source 1", "example.org"),
+            change_host("Target Source 2", "example.net", ["Test Destination"]),
+            change_host("Target Source 3", "example.edu")
+        ]),
+        data_source("Target Source 1", "example.org"),
+        data_source("Target Source 2", "example.net"),
+        data_source("Target Source 3", "example.edu", mechanism="aspera")
+    ],
+    destinations=[dict(label="Test Destination", description=None)]
+)
+
+
+class TestLocalRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = routing.LocalRouter(CONFIGURATION)
+
+    def test_find_transfers_unknown_destination(self):
+        transfers = self.router.find_transfers("http://example.com/file.txt", ["curl"])
+
+        self.assertEqual([(t["url"], t["data_source_id"]) for t in transfers], [
+            ("http://example.org/file.txt", "Target Source 1"),
+            ("http://example.com/file.txt", "Test Source")
+        ])
+
+    def test_find_transfers_for_destination(self):
+        transfers = self.router.find_transfers("http://example.com/file.txt", ["curl"], "Test Destination")
+
+        self.assertEqual([t["url"] for t in transfers], [
+            "http://example.org/file.txt",
+            "http://example.net/file.txt",
+            "http://example.com/file.txt"
+        ])
+
+    def test_find_transfers_with_available_mechanisms(self):
+        transfers = self.router.find_transfers("http://example.com/file.txt", ["aspera"])
+
+        self.assertEqual([(t["url"], t["mechanism_name"]) for t in transfers], [("http://example.edu/file.txt", "aspera")])
+
+    def test_find_transfers_no_matching_data_source(self):
+        self.assertIsNone(self.router.find_transfers("http://example.io/file.txt", ["curl"]))
+
+    def test_unsupported_configuration(self):
+        configuration = dict(data_sources=[data_source("Test Source", "example.com")])
+        configuration["data_sources"][0]["url_matchers"][0]["type"] = "unknown"
+
+        self.assertRaises(routing.UnsupportedConfigurationError, routing.LocalRouter, configuration)
+
+
+class TestRepositoryConfiguration(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.cache_path_patcher = patch.object(routing, "CONFIGURATION_CACHE_PATH",
+                                               os.path.join(self.temp_dir.name, "configuration.json"))
+        self.cache_path_patcher.start()
+        self.export_url = urljoin(metadata_repository_url, "configuration/export")
+
+    def tearDown(self):
+        self.cache_path_patcher.stop()
+        self.temp_dir.cleanup()
+
+    @requests_mock.Mocker()
+    def test_caches_configuration(self, m):
+        m.get(self.export_url, json=CONFIGURATION, headers={"ETag": "\"v1\""})
+        self.assertEqual(routing.repository_configuration(), CONFIGURATION)
+
+        # Recently fetched configuration is used without a request
+        self.assertEqual(routing.repository_configuration(), CONFIGURATION)
+        self.assertEqual(m.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_revalidates_cached_configuration(self, m):
+        m.get(self.export_url, json=CONFIGURATION, headers={"ETag": "\"v1\""})
+        routing.repository_configuration()
+
+        m.get(self.export_url, status_code=304)
+        self.assertEqual(routing.repository_configuration(max_age=0), CONFIGURATION)
+        self.assertEqual(m.last_request.headers["If-None-Match"], "\"v1\"")
+
+    @requests_mock.Mocker()
+    @patch.object(routing.logger, "warn")
+    def test_uses_cached_configuration_if_repository_is_unavailable(self, m, warn):
+        m.get(self.export_url, json=CONFIGURATION)
+        routing.repository_configuration()
+
+        m.get(self.export_url, status_code=503)
+        self.assertEqual(routing.repository_configuration(max_age=0), CONFIGURATION)
+        self.assertTrue(warn.called)
+
+    def test_offline_without_cached_configuration(self):
+        self.assertIsNone(routing.repository_configuration(offline=True))
@@ -0,0 +1,60 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from client.transfer import watchdog
+from client.transfer.watchdog import minimum_transfer_rate, ThroughputWatchdog
+
+
+class TestThroughputWatchdog(unittest.TestCase):
+
+    def test_cancels_slow_transfer(self):
+        cancel_event = threading.Event()
+        w = ThroughputWatchdog(lambda: 0, 100, cancel_event, window=0.2, interval=0.05)
+        w.start()
+        self.assertTrue(cancel_event.wait(2))
+        w.stop()
+        self.assertIn("below minimum", w.abort_reason)
+
+    def test_does_not_cancel_fast_transfer(self):
+        cancel_event = threading.Event()
+        start_time = time.monotonic()
+        w = ThroughputWatchdog(lambda: int((time.monotonic() - start_time) * 1000000), 100, cancel_event,
+                               window=0.1, interval=0.02)
+        w.start()
+        time.sleep(0.4)
+        w.stop()
+        self.assertFalse(cancel_event.is_set())
+        self.assertIsNone(w.abort_reason)
+
+
+class TestMinimumTransferRate(unittest.TestCase):
+
+    @patch.object(watchdog, "watchdog_min_rate", 1000)
+    @patch.object(watchdog, "watchdog_min_rate_fraction", 0.1)
+    def test_minimum_transfer_rate(self):
+        self.assertEqual(minimum_transfer_rate(Mock(expected_transfer_rate=None)), 1000)
+        self.assertEqual(minimum_transfer_rate(Mock(expected_transfer_rate=50000)), 5000)
+
+    @patch.object(watchdog, "watchdog_min_rate", None)
+    @patch.object(watchdog, "watchdog_min_rate_fraction", 0.1)
+    def test_no_minimum_without_expected_rate(self):
+        self.assertIsNone(minimum_transfer_rate(Mock(expected_transfer_rate=None)))
@@ -35,6 +35,13 @@ class TestMD5ChecksumVerification(unittest.TestCase):
 
         self.transfer = Transfer(self.file_url, "curl", {})
 
+        # These tests use per-file checksums
+        self.manifest_patcher = patch.object(md5_cv, "_get_checksum_manifest", return_value=None)
+        self.manifest_patcher.start()
+
+    def tearDown(self):
+        self.manifest_patcher.stop()
+
     def test_always_attempts_verification(self):
         self.assertTrue(md5_cv.can_attempt_verification("http://www.example.com/test.txt", None))
         self.assertTrue(md5_cv.can_attempt_verification("https://www.example.com/test.txt", None))
@@ -50,6 +57,10 @@ class TestMD5ChecksumVerification(unittest.TestCase):
         with patch.object(md5_cv.Transfer, "get_data", return_value=self.checksum_data):
             self.assertEqual(md5_cv._get_checksum(self.file_url, "curl", {}), self.checksum)
 
+    def test_get_checksum_with_file_name(self):
+        with patch.object(md5_cv.Transfer, "get_data", return_value=self.checksum_data + b"  test.sra\n"):
+            self.assertEqual(md5_cv._get_checksum(self.file_url, "curl", {}), self.checksum)
+
     def test_validate_checksum(self):
         self.assertTrue(md5_cv._validate_md5_checksum("5eb63bbbe01eeed093cb22bb8f5acdc3"))
         self.assertFalse(md5_cv._validate_md5_checksum("5gb63bbbe01eeed093cb22bb8f5acdc3"))
@@ -70,3 +81,93 @@ class TestMD5ChecksumVerification(unittest.TestCase):
     def test_raises_unable_to_verify_if_no_checksum(self):
         with patch.object(md5_cv.Transfer, "get_data", side_effect=TransferFailedError):
             self.assertRaises(TransferFailedError, md5_cv.verify_transfer, self.transfer, None)
+
+
+class TestMD5ChecksumManifestVerification(unittest.TestCase):
+
+    def setUp(self):
+        md5_cv._checksum_manifests.clear()
+        self.transfer = Transfer("http://www.example.com/ftp/files/test.sra", "curl", {})
+        self.checksum = "5eb63bbbe01eeed093cb22bb8f5acdc3"
+
+    def fetch_manifest(self, url, *args):
+        if url == "http://www.example.com/ftp/files/md5checksums.txt":
+            return ("%s  ./test.sra\n%s *other.sra\n" % (self.checksum, "0" * 32)).encode()
+        raise TransferFailedError()
+
+    def test_parse_checksum_manifest(self):
+        manifest = b"5eb63bbbe01eeed093cb22bb8f5acdc3  a.txt\n" \
+                   b"MD5 (b file.txt) = 6f5902ac237024bdd0c176cb93063dc4\n" \
+                   b"not a checksum\n"
+        self.assertEqual(md5_cv._parse_checksum_manifest(manifest), {
+            "a.txt": "5eb63bbbe01eeed093cb22bb8f5acdc3",
+            "b file.txt": "6f5902ac237024bdd0c176cb93063dc4"
+        })
+
+    def test_uses_directory_manifest(self):
+        with patch.object(md5_cv, "_get_data", side_effect=self.fetch_manifest) as mock_get_data, \
+                patch.object(md5_cv, "_get_checksum") as mock_get_checksum:
+            self.assertEqual(md5_cv._get_checksum_from_manifest(self.transfer.url, "curl", {}), self.checksum)
+            self.assertEqual(md5_cv._get_checksum_from_manifest("http://www.example.com/ftp/files/other.sra", "curl", {}),
+                             "0" * 32)
+
+            # Manifest is only fetched once per directory
+            self.assertEqual(mock_get_data.call_count, 2)
+            mock_get_checksum.assert_not_called()
+
+    def test_manifests_expire(self):
+        with patch.object(md5_cv, "_get_data", side_effect=self.fetch_manifest) as mock_get_data:
+            md5_cv._get_checksum_from_manifest(self.transfer.url, "curl", {})
+            with patch.object(md5_cv, "CHECKSUM_MANIFEST_MAX_AGE", 0):
+                md5_cv._get_checksum_from_manifest(self.transfer.url, "curl", {})
+            self.assertEqual(mock_get_data.call_count, 4)
+
+    def test_least_recently_used_manifests_are_evicted(self):
+        with patch.object(md5_cv, "_get_data", side_effect=self.fetch_manifest), \
+                patch.object(md5_cv, "_CHECKSUM_MANIFEST_CACHE_SIZE", 2):
+            for directory in ["a", "b", "files", "c"]:
+                md5_cv._get_checksum_from_manifest("http://www.example.com/ftp/%s/test.sra" % directory, "curl", {})
+            self.assertEqual([key[0] for key in md5_cv._checksum_manifests],
+                             ["http://www.example.com/ftp/files/", "http://www.example.com/ftp/c/"])
+
+    def test_falls_back_to_checksum_file(self):
+        with tempfile.NamedTemporaryFile() as temp_f, \
+                patch.object(md5_cv, "_get_data", side_effect=TransferFailedError) as mock_get_data, \
+                patch.object(md5_cv, "_get_checksum", return_value=self.checksum) as mock_get_checksum:
+            temp_f.write(b"hello world")
+            temp_f.flush()
+            self.assertTrue(md5_cv.verify_transfer(self.transfer, temp_f.name))
+            self.assertTrue(md5_cv.verify_transfer(self.transfer, temp_f.name))
+
+            self.assertEqual(mock_get_data.call_count, len(md5_cv.CHECKSUM_MANIFEST_NAMES))
+            self.assertEqual(mock_get_checksum.call_count, 2)
+
+
+class TestRepositoryChecksumVerification(unittest.TestCase):
+
+    def setUp(self):
+        self.checksum = "5eb63bbbe01eeed093cb22bb8f5acdc3"
+        self.temp_f = tempfile.NamedTemporaryFile()
+        self.temp_f.write(b"hello world")
+        self.temp_f.flush()
+
+    def tearDown(self):
+        self.temp_f.close()
+
+    def test_uses_checksum_from_repository(self):
+        transfer = Transfer("http://www.example.com/test.sra", "curl", {}, file_checksum=self.checksum.upper())
+        with patch.object(md5_cv, "_get_data") as mock_get_data:
+            self.assertTrue(md5_cv.verify_transfer(transfer, self.temp_f.name))
+            mock_get_data.assert_not_called()
+
+    def test_checks_published_checksum_if_repository_checksum_does_not_match(self):
+        transfer = Transfer("http://www.example.com/test.sra", "curl", {}, file_checksum="0" * 32)
+        with patch.object(md5_cv, "_fetch_correct_checksum", return_value=self.checksum):
+            self.assertTrue(md5_cv.verify_transfer(transfer, self.temp_f.name))
+        with patch.object(md5_cv, "_fetch_correct_checksum", return_value="1" * 32):
+            self.assertFalse(md5_cv.verify_transfer(transfer, self.temp_f.name))
+
+    def test_unknown_if_repository_checksum_does_not_match_and_no_checksum_is_published(self):
+        transfer = Transfer("http://www.example.com/test.sra", "curl", {}, file_checksum="0" * 32)
+        with patch.object(md5_cv, "_fetch_correct_checksum", side_effect=TransferFailedError):
+            self.assertIsNone(md5_cv.verify_transfer(transfer, self.temp_f.name))
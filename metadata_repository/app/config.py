@@ -23,6 +23,13 @@ import os
 database_url = os.getenv("DATABASE_URL")
 
 
+# Path of a SQLite database used to cache transfers found for URLs. It is shared by all application processes
+# on the host. If not set, transfers are not cached.
+resolution_cache_path = os.getenv("RESOLUTION_CACHE_PATH")
+
+resolution_cache_size = int(os.getenv("RESOLUTION_CACHE_SIZE", "10000"))
+
+
 secret_key = os.getenv("SESSION_KEY", "")
 if secret_key:
     secret_key = binascii.unhexlify(secret_key.encode("ascii"))
@@ -18,87 +18,184 @@
 
 import sys
 from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit
 
-from .models import UrlMatcher
+from sqlalchemy.orm import subqueryload
 
-Transfer = namedtuple("Transfer", ["url", "mechanism_name", "mechanism_options", "data_source_id"])
+from .matcher_index import get_matcher_index
+from .models import DataSource, Transform
+from .models.transfer_rate_estimate import estimated_transfer_rates
+from .models.transfer_rate_statistics import mean_transfer_rates
+from .models.transfer_report import consensus_file_checksum
+from .resolution_cache import cached_resolution
+
+Transfer = namedtuple("Transfer", ["url", "mechanism_name", "mechanism_options", "data_source_id", "expected_transfer_rate",
+                                   "file_checksum"])
 
 
 class FindTransferError(Exception):
     pass
 
 
-def matching_data_source(url):
+def matching_data_source(url, *options):
     """
     Find the data source that matches a URL.
+
+    Parameters:
+    url - String - URL to match.
+    options - Query options used to load the data source, for example to eagerly load relationships.
     """
-    matchers = UrlMatcher.query.all()
-    if not matchers:
+    index = get_matcher_index()
+    if not len(index):
         raise FindTransferError("No URL matchers configured")
 
-    # Check URL against all matchers
-    # Skip matchers for data sources that have already checked
-    checked_sources = set()
-    matching_sources = []
-    for m in matchers:
-        if m.data_source_id not in checked_sources and m.matches_url(url):
-            checked_sources.add(m.data_source_id)
-            matching_sources.append(m.data_source)
-
-    if len(matching_sources) > 1:
-        # FIXME: This should be a log
-        print("Warning: Multiple data sources match URL '%s'. Likely matcher misconfiguration.", file=sys.stderr)
-
-    if matching_sources:
-        return matching_sources[0]
-    else:
+    data_source_id = index.matching_data_source_id(url)
+    if data_source_id is None:
         return None
 
+    return DataSource.query.options(*options).filter(DataSource.id == data_source_id).one_or_none()
+
+
+# Default port for each URL scheme. URLs with the default port are the same as URLs without a port.
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+
+
+def _normalize_url(url):
+    """
+    Lowercase a URL's scheme and host and remove its port if it is the scheme's default.
+    Returns the URL unchanged if it can't be parsed.
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    if not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    (userinfo, at, _) = parts.netloc.rpartition("@")
+    host = "[%s]" % parts.hostname if ":" in parts.hostname else parts.hostname
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host += ":%d" % port
+
+    return urlunsplit((scheme, userinfo + at + host, parts.path, parts.query, parts.fragment))
+
 
 def find_transfers(url, available_mechanisms, destination=None):
     """
     Query DB for alternate URLs for the data file at the given URL.
     """
+    # Equivalent URLs share cache entries. The normalized URL is also the one matched, so that cached
+    # results are the same as if they had been found for the URL.
+    url = _normalize_url(url)
+    key = dict(url=url,
+               available_mechanisms=sorted(set(available_mechanisms)),
+               destination_id=destination.id if destination else None)
+    route = cached_resolution(key, lambda: _find_route(url, available_mechanisms, destination))
+
+    if route is None:
+        raise FindTransferError("No data source matches URL")
+
+    transfers = [Transfer(**t) for t in route["transfers"]]
+
+    # All transfers are of the same file, so they share its checksum
+    file_checksum = consensus_file_checksum(route["file_urls"]) if transfers else None
+    transfers = [t._replace(file_checksum=file_checksum) for t in transfers]
+
+    return _rank_transfers(transfers, destination)
+
+
+def _route_loading_options():
+    """
+    Query options to load everything needed to apply a data source's transforms in a fixed number of queries.
+    """
+    return [
+        subqueryload(DataSource.transforms).subqueryload(Transform.to_data_source).subqueryload(DataSource.url_matchers),
+        subqueryload(DataSource.transforms).subqueryload(Transform.for_destinations)
+    ]
+
+
+def _find_route(url, available_mechanisms, destination):
+    """
+    Apply the matching data source's transforms to a URL. This depends only on the configuration of data sources,
+    URL matchers, transforms and destinations, so its result can be cached until the configuration changes.
+
+    Returns:
+    dict - "transfers", a list of transfers (as dicts) without expected transfer rates or checksums, and
+           "file_urls", the URLs of all copies of the file. None if no data source matches the URL.
+    """
     transfers = []
-    data_source = matching_data_source(url)
+    data_source = matching_data_source(url, *_route_loading_options())
 
     if not data_source:
-        raise FindTransferError("No data source matches URL")
+        return None
+
+    # URLs of copies of the file, used to find its checksum
+    file_urls = [url]
 
     # For all matching data sources, apply all transforms
     for transform in data_source.transforms:
 
+        transformed_url = transform.transform_url(url)
+        if not transform.to_data_source.matches_url(transformed_url):
+            # FIXME: This should be a log
+            print("Transformed URL did not match target data source", file=sys.stderr)
+            continue
+
+        file_urls.append(transformed_url)
+
         if transform.for_destinations:
             if not destination or destination not in transform.for_destinations:
                 continue
 
-        transformed_url = transform.transform_url(url)
-
-        # If transformed URL matches target data source, add to results
-        # Include matcher and transform in result for display
-        if transform.to_data_source.matches_url(transformed_url) and \
-           transform.to_data_source.transfer_mechanism_type in available_mechanisms:
+        # If target data source's mechanism is available, add to results
+        if transform.to_data_source.transfer_mechanism_type in available_mechanisms:
 
             transfer = Transfer(
                 url=transformed_url,
                 mechanism_name=transform.to_data_source.transfer_mechanism_type,
-                mechanism_options=transform.to_data_source.transfer_mechanism_options,
-                data_source_id=transform.to_data_source.id)
+                mechanism_options=dict(transform.to_data_source.transfer_mechanism_options),
+                data_source_id=transform.to_data_source.id,
+                expected_transfer_rate=None,
+                file_checksum=None)
 
             transfers.append(transfer)
 
-        else:
-            # FIXME: This should be a log
-            print("Transformed URL did not match target data source", file=sys.stderr)
-
     # Add a transfer from the original data source, if the mechanism is available
     if data_source.transfer_mechanism_type in available_mechanisms:
         original_transfer = Transfer(
             url=url,
             mechanism_name=data_source.transfer_mechanism_type,
-            mechanism_options=data_source.transfer_mechanism_options,
-            data_source_id=data_source.id)
+            mechanism_options=dict(data_source.transfer_mechanism_options),
+            data_source_id=data_source.id,
+            expected_transfer_rate=None,
+            file_checksum=None)
 
         transfers.append(original_transfer)
 
-    return transfers
+    return dict(transfers=[t._asdict() for t in transfers], file_urls=file_urls)
+
+
+def _rank_transfers(transfers, destination):
+    """
+    Set the expected transfer rate of each transfer and sort transfers by it, fastest first.
+
+    The expected rate is the estimate for transfers from the data source to the destination if there is one,
+    otherwise the mean rate of all successful transfers from the data source. Transfers with no expected
+    rate are placed after the others, in their original order.
+    """
+    data_source_ids = [t.data_source_id for t in transfers]
+    estimates = estimated_transfer_rates(data_source_ids, destination)
+    mean_rates = mean_transfer_rates(data_source_ids) if len(estimates) < len(set(data_source_ids)) else {}
+
+    def expected_rate(transfer):
+        rate = estimates.get(transfer.data_source_id)
+        if rate is None:
+            rate = mean_rates.get(transfer.data_source_id)
+        return rate
+
+    transfers = [t._replace(expected_transfer_rate=expected_rate(t)) for t in transfers]
+
+    return sorted(transfers, key=lambda t: (t.expected_transfer_rate is None, -(t.expected_transfer_rate or 0)))
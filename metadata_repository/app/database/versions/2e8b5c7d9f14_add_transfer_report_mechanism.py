@@ -0,0 +1,25 @@
+"""add transfer report mechanism
+
+Revision ID: 2e8b5c7d9f14
+Revises: 9d3f6a1b7e25
+Create Date: 2026-10-18 18:05:47.392610
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8b5c7d9f14'
+down_revision = '9d3f6a1b7e25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('transfer_reports', sa.Column('mechanism_name', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    op.drop_column('transfer_reports', 'mechanism_name')
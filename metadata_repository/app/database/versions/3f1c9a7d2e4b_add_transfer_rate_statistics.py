@@ -0,0 +1,43 @@
+"""add transfer rate statistics
+
+Revision ID: 3f1c9a7d2e4b
+Revises: 506cb28a1ef4
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2e4b'
+down_revision = '506cb28a1ef4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transfer_rate_statistics',
+                    sa.Column('data_source_id', sa.Integer(), nullable=False),
+                    sa.Column('num_transfers', sa.Integer(), nullable=False),
+                    sa.Column('mean_transfer_rate', sa.Float(), nullable=False),
+                    sa.Column('m2_transfer_rate', sa.Float(), nullable=False),
+                    sa.ForeignKeyConstraint(['data_source_id'], ['data_sources.id'], ),
+                    sa.PrimaryKeyConstraint('data_source_id'))
+
+    # Compute statistics for existing reports
+    op.execute("""
+        INSERT INTO transfer_rate_statistics (data_source_id, num_transfers, mean_transfer_rate, m2_transfer_rate)
+        SELECT r.data_source_id, COUNT(*), AVG(r.rate), SUM(r.rate * r.rate) - COUNT(*) * AVG(r.rate) * AVG(r.rate)
+        FROM (
+            SELECT data_source_id, file_size_bytes * 1.0 / transfer_duration_seconds AS rate
+            FROM transfer_reports
+            WHERE is_success AND transfer_duration_seconds > 0
+        ) AS r
+        GROUP BY r.data_source_id
+    """)
+
+
+def downgrade():
+    op.drop_table('transfer_rate_statistics')
@@ -0,0 +1,24 @@
+"""index transfer report URLs
+
+Revision ID: 5b7e9d2c4a18
+Revises: c4a8e1f92d57
+Create Date: 2026-10-18 15:12:09.541873
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e9d2c4a18'
+down_revision = 'c4a8e1f92d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transfer_reports_url', 'transfer_reports', ['url'])
+
+
+def downgrade():
+    op.drop_index('ix_transfer_reports_url', 'transfer_reports')
@@ -0,0 +1,39 @@
+"""add transfer rate estimate unique key
+
+Revision ID: 7a4c2e9b6d31
+Revises: 2e8b5c7d9f14
+Create Date: 2026-10-18 21:12:36.208541
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c2e9b6d31'
+down_revision = '2e8b5c7d9f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent reports may have created more than one estimate for the same key
+    op.execute("""
+        DELETE FROM transfer_rate_estimates
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT MIN(id) AS id FROM transfer_rate_estimates
+                GROUP BY data_source_id, destination_id, mechanism_name
+            ) AS first_estimates
+        )
+    """)
+
+    # Null destinations (unknown destination) must be compared as equal
+    op.execute("""
+        CREATE UNIQUE INDEX ix_transfer_rate_estimates_unique_key
+        ON transfer_rate_estimates (data_source_id, COALESCE(destination_id, 0), mechanism_name)
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_transfer_rate_estimates_unique_key', table_name='transfer_rate_estimates')
@@ -0,0 +1,35 @@
+"""add transfer report ID counter
+
+Revision ID: 8e2d4b6f1a3c
+Revises: 3f1c9a7d2e4b
+Create Date: 2026-10-18 10:02:47.118304
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2d4b6f1a3c'
+down_revision = '3f1c9a7d2e4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('data_sources', sa.Column('last_transfer_report_id', sa.Integer(), server_default='0', nullable=False))
+
+    # Continue numbering after existing reports
+    op.execute("""
+        UPDATE data_sources
+        SET last_transfer_report_id = (
+            SELECT COALESCE(MAX(transfer_reports.report_id), 0)
+            FROM transfer_reports
+            WHERE transfer_reports.data_source_id = data_sources.id
+        )
+    """)
+
+
+def downgrade():
+    op.drop_column('data_sources', 'last_transfer_report_id')
@@ -0,0 +1,25 @@
+"""add transfer report abort reason
+
+Revision ID: 9d3f6a1b7e25
+Revises: 5b7e9d2c4a18
+Create Date: 2026-10-18 17:40:22.180356
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f6a1b7e25'
+down_revision = '5b7e9d2c4a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('transfer_reports', sa.Column('abort_reason', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('transfer_reports', 'abort_reason')
@@ -0,0 +1,69 @@
+"""add transfer rate estimates
+
+Revision ID: c4a8e1f92d57
+Revises: 8e2d4b6f1a3c
+Create Date: 2026-10-18 13:41:09.530712
+
+"""
+
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8e1f92d57'
+down_revision = '8e2d4b6f1a3c'
+branch_labels = None
+depends_on = None
+
+
+# Must match app.models.transfer_rate_estimate.SMOOTHING
+SMOOTHING = 0.1
+
+
+def upgrade():
+    estimates_table = op.create_table('transfer_rate_estimates',
+                                      sa.Column('id', sa.Integer(), nullable=False),
+                                      sa.Column('data_source_id', sa.Integer(), nullable=False),
+                                      sa.Column('destination_id', sa.Integer(), nullable=True),
+                                      sa.Column('mechanism_name', sa.String(length=100), nullable=False),
+                                      sa.Column('num_transfers', sa.Integer(), nullable=False),
+                                      sa.Column('estimated_transfer_rate', sa.Float(), nullable=False),
+                                      sa.Column('last_updated_at', sa.DateTime(), nullable=False),
+                                      sa.ForeignKeyConstraint(['data_source_id'], ['data_sources.id'], ),
+                                      sa.ForeignKeyConstraint(['destination_id'], ['destinations.id'], ),
+                                      sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_transfer_rate_estimates_source_destination', 'transfer_rate_estimates',
+                    ['data_source_id', 'destination_id'], unique=False)
+
+    # Compute estimates from existing reports, oldest first
+    reports = op.get_bind().execute(sa.text("""
+        SELECT r.data_source_id, r.destination_id, d.transfer_mechanism_type,
+               r.file_size_bytes, r.transfer_duration_seconds, r.is_success
+        FROM transfer_reports AS r
+        JOIN data_sources AS d ON d.id = r.data_source_id
+        WHERE r.transfer_duration_seconds > 0
+        ORDER BY r.created_at, r.report_id
+    """))
+
+    estimates = {}
+    for (data_source_id, destination_id, mechanism_name, size, duration, is_success) in reports:
+        (n, estimate) = estimates.get((data_source_id, destination_id, mechanism_name), (0, 0.0))
+        rate = size / duration if is_success else 0.0
+        n += 1
+        estimate += max(1.0 / n, SMOOTHING) * (rate - estimate)
+        estimates[(data_source_id, destination_id, mechanism_name)] = (n, estimate)
+
+    now = datetime.datetime.utcnow()
+    op.bulk_insert(estimates_table, [
+        dict(data_source_id=data_source_id, destination_id=destination_id, mechanism_name=mechanism_name,
+             num_transfers=n, estimated_transfer_rate=estimate, last_updated_at=now)
+        for ((data_source_id, destination_id, mechanism_name), (n, estimate)) in estimates.items()
+    ])
+
+
+def downgrade():
+    op.drop_index('ix_transfer_rate_estimates_source_destination', table_name='transfer_rate_estimates')
+    op.drop_table('transfer_rate_estimates')
@@ -51,12 +51,20 @@ class TransferReportForm(wtforms.Form):
         validators=[wtforms.validators.InputRequired()])
 
     def validate_file_checksum(form, field):
-        if form.file_size_bytes.data > 0:
+        if form.file_size_bytes.data is not None and form.file_size_bytes.data > 0:
             if not field.data:
                 raise wtforms.ValidationError("This field is required")
             if not re.match(r"[0-9A-Fa-f]{32}", field.data):
                 raise wtforms.ValidationError("Invalid checksum")
 
+    mechanism_name = wtforms.StringField(
+        label="Transfer Mechanism",
+        validators=[wtforms.validators.Optional(), wtforms.validators.Length(max=100)])
+
     mechanism_output = wtforms.fields.TextAreaField(
         label="Mechanism Output",
         validators=[wtforms.validators.Optional()])
+
+    abort_reason = wtforms.fields.TextAreaField(
+        label="Abort Reason",
+        validators=[wtforms.validators.Optional()])
@@ -0,0 +1,173 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import re
+import sys
+import threading
+from urllib.parse import urlparse
+
+import sqlalchemy as sa
+
+from .models import db_session, UrlMatcher
+from .util import matcher_of_type
+
+
+# Numbered backreferences would refer to the wrong group once a pattern is combined with others
+_numbered_backreference = re.compile(r"\\[1-9]")
+
+# Older versions of Python limit the number of named groups in a pattern to 100
+_MAX_PATTERNS_PER_GROUP = 90
+
+
+class UrlMatcherIndex():
+    """
+    Find the data source whose URL matchers match a URL without evaluating every matcher.
+
+    Scheme and host matchers are stored in a dictionary keyed on (scheme, host). Regular expression
+    matchers are compiled into a single pattern. Matchers of any other type are checked one by one.
+
+    Matchers are checked in order of (data_source_id, matcher_id). If more than one data source
+    matches a URL, the data source of the first matching matcher is returned.
+    """
+
+    def __init__(self, matchers):
+        """
+        Parameters:
+        matchers - UrlMatcher[] - All URL matchers.
+        """
+        self._by_scheme_and_host = {}
+        self._patterns = []
+        self._combined_patterns = []
+        self._other_matchers = []
+
+        matchers = sorted(matchers, key=lambda m: (m.data_source_id, m.matcher_id))
+        for position, m in enumerate(matchers):
+            if m.matcher_type == "scheme_and_host":
+                key = (m.matcher_options["scheme"].lower(), m.matcher_options["host"].lower())
+                if key in self._by_scheme_and_host:
+                    if self._by_scheme_and_host[key][1] != m.data_source_id:
+                        # FIXME: This should be a log
+                        print("Warning: Multiple data sources match URLs for '%s://%s'. Likely matcher misconfiguration." % key,
+                              file=sys.stderr)
+                else:
+                    self._by_scheme_and_host[key] = (position, m.data_source_id)
+
+            elif m.matcher_type == "regular_expression":
+                try:
+                    pattern = re.compile(m.matcher_options["pattern"])
+                except re.error:
+                    # FIXME: This should be a log
+                    print("Warning: Invalid pattern for URL matcher %d of data source %d" % (m.matcher_id, m.data_source_id),
+                          file=sys.stderr)
+                    continue
+                self._patterns.append((position, m.data_source_id, pattern))
+
+            else:
+                self._other_matchers.append((position, m.data_source_id, matcher_of_type(m.matcher_type), dict(m.matcher_options)))
+
+        self._combine_patterns()
+
+    def _combine_patterns(self):
+        """
+        Combine regular expression matchers into patterns with a named group for each matcher.
+        Since alternatives are tried in order, the group that matches is the first matching matcher.
+        Patterns that can't be combined are left to be checked individually.
+        """
+        combinable = [p for p in self._patterns if not _numbered_backreference.search(p[2].pattern)]
+
+        for i in range(0, len(combinable), _MAX_PATTERNS_PER_GROUP):
+            chunk = combinable[i:i + _MAX_PATTERNS_PER_GROUP]
+            try:
+                combined = re.compile("|".join("(?P<_m%d>%s)" % (j, p[2].pattern) for j, p in enumerate(chunk)))
+            except (re.error, AssertionError, OverflowError):
+                continue
+
+            self._combined_patterns.append((combined, {"_m%d" % j: (p[0], p[1]) for j, p in enumerate(chunk)}))
+            self._patterns = [p for p in self._patterns if p not in chunk]
+
+    def matching_data_source_id(self, url):
+        """
+        Find the ID of the data source that matches a URL.
+
+        Returns:
+        Integer - Data source ID or None if no data source matches.
+        """
+        best = None
+
+        parsed = urlparse(url)
+        if parsed.hostname:
+            best = self._by_scheme_and_host.get((parsed.scheme.lower(), parsed.hostname.lower()))
+
+        for combined, groups in self._combined_patterns:
+            match = combined.match(url)
+            if match:
+                candidate = groups[match.lastgroup]
+                if not best or candidate[0] < best[0]:
+                    best = candidate
+                break
+
+        for position, data_source_id, pattern in self._patterns:
+            if best and best[0] < position:
+                break
+            if pattern.match(url):
+                best = (position, data_source_id)
+                break
+
+        for position, data_source_id, matches_url, options in self._other_matchers:
+            if best and best[0] < position:
+                break
+            if matches_url(options, url):
+                best = (position, data_source_id)
+                break
+
+        return best[1] if best else None
+
+    def __len__(self):
+        return len(self._by_scheme_and_host) + len(self._patterns) + len(self._other_matchers) + \
+            sum(len(groups) for _, groups in self._combined_patterns)
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _matchers_version():
+    """
+    Cheap summary of the URL matchers table that changes whenever a matcher is added, edited, or deleted.
+    This is checked on every lookup so that edits made through any application process are picked up.
+    """
+    return db_session.query(sa.func.count(UrlMatcher.matcher_id), sa.func.max(UrlMatcher.last_updated_at)).one()
+
+
+def get_matcher_index():
+    """
+    Get the index of all URL matchers, rebuilding it if matchers have changed since it was built.
+
+    Returns:
+    UrlMatcherIndex
+    """
+    global _index, _index_version
+
+    version = tuple(_matchers_version())
+    with _index_lock:
+        if _index is None or version != _index_version:
+            _index = UrlMatcherIndex(UrlMatcher.query.all())
+            _index_version = version
+
+        return _index
@@ -22,6 +22,8 @@ from .base import db_engine, db_session, BaseModel
 from .data_source import DataSource
 from .destination import Destination
 from .transfer_report import TransferReport
+from .transfer_rate_estimate import TransferRateEstimate
+from .transfer_rate_statistics import TransferRateStatistics
 from .transfer_test_file import TransferTestFile
 from .transform import Transform
 from .url_matcher import UrlMatcher
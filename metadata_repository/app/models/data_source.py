@@ -16,8 +16,6 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-import statistics
-
 import sqlalchemy as sa
 
 from .base import BaseModel, JSONEncodedDict, MutableDict, TrackEditsMixin
@@ -37,17 +35,23 @@ class DataSource(BaseModel, TrackEditsMixin):
 
     transfer_mechanism_options = sa.Column(MutableDict.as_mutable(JSONEncodedDict), default={}, nullable=False)
 
+    # Highest report ID allocated to this data source's transfer reports. See TransferReport.allocate_report_ids.
+    last_transfer_report_id = sa.Column(sa.types.Integer(), default=0, server_default="0", nullable=False)
+
     @property
     def num_successful_transfers(self):
-        return len([r for r in self.transfer_reports if r.is_success])
+        stats = self.transfer_rate_statistics
+        return stats.num_transfers if stats else 0
 
     @property
     def mean_successful_transfer_rate(self):
-        return statistics.mean([r.transfer_rate for r in self.transfer_reports if r.is_success])
+        stats = self.transfer_rate_statistics
+        return stats.mean_transfer_rate if stats and stats.num_transfers else None
 
     @property
     def stdev_successful_transfer_rates(self):
-        return statistics.stdev([r.transfer_rate for r in self.transfer_reports if r.is_success])
+        stats = self.transfer_rate_statistics
+        return stats.stdev_transfer_rate if stats else None
 
     def __repr__(self):
         return "<DataSource (id=%s, label=%s)>" % (self.id, self.label)
@@ -0,0 +1,166 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import datetime
+
+import sqlalchemy as sa
+from sqlalchemy.orm import backref
+
+from .base import BaseModel, db_session
+from .data_source import DataSource
+from .transfer_report import after_transfer_reports_flushed, lock_or_create
+
+
+# Weight of each new transfer rate in the estimate, once there are enough reports.
+# Reports older than the last 1 / SMOOTHING reports have little influence.
+SMOOTHING = 0.1
+
+
+class TransferRateEstimate(BaseModel):
+    """
+    Recency weighted estimate of the transfer rate from a data source to a destination with a mechanism.
+
+    The estimate is an exponentially weighted moving average of reported transfer rates. Failed transfers
+    count as a rate of 0. It is updated as reports are added, so it never requires loading past reports.
+    Deleting reports does not change the estimate.
+    """
+
+    __tablename__ = "transfer_rate_estimates"
+
+    id = sa.Column(sa.types.Integer(), autoincrement=True, primary_key=True, nullable=False)
+
+    data_source_id = sa.Column(sa.types.Integer(), sa.ForeignKey("data_sources.id"), nullable=False)
+
+    data_source = sa.orm.relationship("DataSource",
+                                      backref=backref("transfer_rate_estimates", cascade="all, delete-orphan"),
+                                      foreign_keys=[data_source_id])
+
+    # Null for transfers to an unknown destination
+    destination_id = sa.Column(sa.types.Integer(), sa.ForeignKey("destinations.id"))
+
+    destination = sa.orm.relationship("Destination",
+                                      backref=backref("transfer_rate_estimates", cascade="all, delete-orphan"),
+                                      foreign_keys=[destination_id])
+
+    mechanism_name = sa.Column(sa.types.String(100), nullable=False)
+
+    num_transfers = sa.Column(sa.types.Integer(), default=0, nullable=False)
+
+    estimated_transfer_rate = sa.Column(sa.types.Float(), default=0.0, nullable=False)
+
+    last_updated_at = sa.Column(sa.types.DateTime(), nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        sa.Index("ix_transfer_rate_estimates_source_destination", "data_source_id", "destination_id"),
+    )
+
+    def add_transfer_rate(self, rate):
+        self.num_transfers = (self.num_transfers or 0) + 1
+        weight = max(1.0 / self.num_transfers, SMOOTHING)
+        estimate = self.estimated_transfer_rate or 0.0
+        self.estimated_transfer_rate = estimate + weight * (rate - estimate)
+        self.last_updated_at = datetime.datetime.utcnow()
+
+    def __repr__(self):
+        return "<TransferRateEstimate (data_source=%d, destination=%s, mechanism=%s, rate=%f)>" % (
+            self.data_source_id,
+            self.destination_id,
+            self.mechanism_name,
+            self.estimated_transfer_rate)
+
+
+# Only one estimate for each data source, destination, and mechanism. Null destinations are compared as equal.
+sa.Index("ix_transfer_rate_estimates_unique_key",
+         TransferRateEstimate.data_source_id,
+         sa.func.coalesce(TransferRateEstimate.destination_id, 0),
+         TransferRateEstimate.mechanism_name,
+         unique=True)
+
+
+def _for_destination(destination_id):
+    """Filter estimates for a destination. None for an unknown destination."""
+    if destination_id:
+        return TransferRateEstimate.destination_id == destination_id
+    return TransferRateEstimate.destination_id.is_(None)
+
+
+def estimated_transfer_rates(data_source_ids, destination):
+    """
+    Get transfer rate estimates for transfers from data sources to a destination using each data source's
+    current transfer mechanism.
+
+    Parameters:
+    data_source_ids - Integer[] - IDs of data sources.
+    destination - Destination - Destination of transfers. None for an unknown destination.
+
+    Returns:
+    dict - Estimated rates (bytes/second) by data source ID. Data sources without an estimate are omitted.
+    """
+    if not data_source_ids:
+        return {}
+
+    destination_id = destination.id if destination else None
+    rows = db_session.query(TransferRateEstimate.data_source_id, TransferRateEstimate.estimated_transfer_rate) \
+        .join(DataSource, DataSource.id == TransferRateEstimate.data_source_id) \
+        .filter(TransferRateEstimate.data_source_id.in_(set(data_source_ids))) \
+        .filter(_for_destination(destination_id)) \
+        .filter(TransferRateEstimate.mechanism_name == DataSource.transfer_mechanism_type) \
+        .all()
+
+    return dict(rows)
+
+
+def _counts_toward_estimate(report):
+    return report.transfer_duration_seconds and report.transfer_duration_seconds > 0
+
+
+def _estimate_for(session, key, estimates):
+    """
+    Get the estimate for a (data source, destination, mechanism), locking the row so that concurrent updates
+    are not lost. Creates the estimate if it doesn't exist yet.
+    """
+    try:
+        return estimates[key]
+    except KeyError:
+        pass
+
+    (data_source_id, destination_id, mechanism_name) = key
+    estimate = lock_or_create(session, TransferRateEstimate,
+                              session.query(TransferRateEstimate)
+                              .filter(TransferRateEstimate.data_source_id == data_source_id)
+                              .filter(_for_destination(destination_id))
+                              .filter(TransferRateEstimate.mechanism_name == mechanism_name),
+                              dict(data_source_id=data_source_id, destination_id=destination_id,
+                                   mechanism_name=mechanism_name, num_transfers=0, estimated_transfer_rate=0.0))
+
+    estimates[key] = estimate
+    return estimate
+
+
+@after_transfer_reports_flushed
+def update_transfer_rate_estimates(session, new_reports, deleted_reports):
+    """Update transfer rate estimates for added transfer reports."""
+    estimates = {}
+    for report in sorted(new_reports, key=lambda r: r.report_id):
+        if not _counts_toward_estimate(report):
+            continue
+
+        rate = report.transfer_rate if report.is_success is not False else 0.0
+        # Reports from older clients don't include the mechanism used, which was the data source's mechanism
+        key = (report.data_source_id, report.destination_id,
+               report.mechanism_name or report.data_source.transfer_mechanism_type)
+        _estimate_for(session, key, estimates).add_transfer_rate(rate)
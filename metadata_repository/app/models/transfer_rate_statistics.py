@@ -0,0 +1,138 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import math
+
+import sqlalchemy as sa
+from sqlalchemy.orm import backref
+
+from .base import BaseModel, db_session
+from .transfer_report import after_transfer_reports_flushed, lock_or_create
+
+
+class TransferRateStatistics(BaseModel):
+    """
+    Running statistics on the transfer rates of a data source's successful transfers.
+    Updated as transfer reports are added and deleted using Welford's algorithm so that
+    statistics never require loading all of a data source's reports.
+    """
+
+    __tablename__ = "transfer_rate_statistics"
+
+    data_source_id = sa.Column(sa.types.Integer(), sa.ForeignKey("data_sources.id"), primary_key=True, nullable=False)
+
+    data_source = sa.orm.relationship("DataSource",
+                                      backref=backref("transfer_rate_statistics", cascade="all, delete-orphan", uselist=False),
+                                      foreign_keys=[data_source_id])
+
+    num_transfers = sa.Column(sa.types.Integer(), default=0, nullable=False)
+
+    mean_transfer_rate = sa.Column(sa.types.Float(), default=0.0, nullable=False)
+
+    # Sum of squared differences from the mean
+    m2_transfer_rate = sa.Column(sa.types.Float(), default=0.0, nullable=False)
+
+    @property
+    def stdev_transfer_rate(self):
+        """Sample standard deviation of transfer rates."""
+        if self.num_transfers < 2:
+            return None
+        return math.sqrt(max(self.m2_transfer_rate, 0.0) / (self.num_transfers - 1))
+
+    def add_transfer_rate(self, rate):
+        self.num_transfers = (self.num_transfers or 0) + 1
+        mean = self.mean_transfer_rate or 0.0
+        delta = rate - mean
+        self.mean_transfer_rate = mean + delta / self.num_transfers
+        self.m2_transfer_rate = (self.m2_transfer_rate or 0.0) + delta * (rate - self.mean_transfer_rate)
+
+    def remove_transfer_rate(self, rate):
+        if self.num_transfers <= 1:
+            self.num_transfers = 0
+            self.mean_transfer_rate = 0.0
+            self.m2_transfer_rate = 0.0
+            return
+
+        mean = self.mean_transfer_rate
+        self.num_transfers -= 1
+        self.mean_transfer_rate = mean - (rate - mean) / self.num_transfers
+        self.m2_transfer_rate = max(self.m2_transfer_rate - (rate - mean) * (rate - self.mean_transfer_rate), 0.0)
+
+    def __repr__(self):
+        return "<TransferRateStatistics (data_source=%d, n=%d, mean=%f)>" % (
+            self.data_source_id,
+            self.num_transfers,
+            self.mean_transfer_rate)
+
+
+def mean_transfer_rates(data_source_ids):
+    """
+    Get the mean rate of successful transfers from data sources.
+
+    Parameters:
+    data_source_ids - Integer[] - IDs of data sources.
+
+    Returns:
+    dict - Mean rates (bytes/second) by data source ID. Data sources without successful transfers are omitted.
+    """
+    if not data_source_ids:
+        return {}
+
+    rows = db_session.query(TransferRateStatistics.data_source_id, TransferRateStatistics.mean_transfer_rate) \
+        .filter(TransferRateStatistics.data_source_id.in_(set(data_source_ids))) \
+        .filter(TransferRateStatistics.num_transfers > 0) \
+        .all()
+
+    return dict(rows)
+
+
+def _counts_toward_statistics(report):
+    return report.is_success is not False and report.transfer_duration_seconds and report.transfer_duration_seconds > 0
+
+
+def _statistics_for_data_source(session, data_source_id, statistics):
+    """
+    Get statistics for a data source, locking the row so that concurrent updates are not lost.
+    Creates statistics if the data source doesn't have any yet.
+    """
+    try:
+        return statistics[data_source_id]
+    except KeyError:
+        pass
+
+    stats = lock_or_create(session, TransferRateStatistics,
+                           session.query(TransferRateStatistics)
+                           .filter(TransferRateStatistics.data_source_id == data_source_id),
+                           dict(data_source_id=data_source_id, num_transfers=0,
+                                mean_transfer_rate=0.0, m2_transfer_rate=0.0))
+
+    statistics[data_source_id] = stats
+    return stats
+
+
+@after_transfer_reports_flushed
+def update_transfer_rate_statistics(session, new_reports, deleted_reports):
+    """Update running statistics for added and deleted transfer reports."""
+    statistics = {}
+    for report in new_reports:
+        if _counts_toward_statistics(report):
+            _statistics_for_data_source(session, report.data_source_id, statistics).add_transfer_rate(report.transfer_rate)
+
+    for report in deleted_reports:
+        if _counts_toward_statistics(report):
+            _statistics_for_data_source(session, report.data_source_id, statistics).remove_transfer_rate(report.transfer_rate)
@@ -20,9 +20,15 @@ import datetime
 import math
 
 import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import backref
 
-from .base import BaseModel
+from .base import BaseModel, db_session
+from .data_source import DataSource
+
+
+# Minimum number of successful transfers that must agree on a file's checksum before it is trusted
+MIN_CONSENSUS_REPORTS = 2
 
 
 class TransferReport(BaseModel):
@@ -43,7 +49,7 @@ class TransferReport(BaseModel):
                                       backref=backref("transfer_reports", cascade="all, delete-orphan"),
                                       foreign_keys=[destination_id])
 
-    url = sa.Column(sa.types.Text(), nullable=False)
+    url = sa.Column(sa.types.Text(), nullable=False, index=True)
 
     file_size_bytes = sa.Column(sa.types.Integer(), nullable=False)
 
@@ -64,15 +70,152 @@ class TransferReport(BaseModel):
 
     file_checksum = sa.Column(sa.types.String(32), nullable=False)
 
+    # Transfer mechanism the client used. None for reports from clients that didn't send it.
+    mechanism_name = sa.Column(sa.types.String(100))
+
     mechanism_output = sa.Column(sa.types.Text())
 
+    # If the client stopped the transfer, the reason why
+    abort_reason = sa.Column(sa.types.Text())
+
     is_success = sa.Column(sa.types.Boolean(), default=True, nullable=False)
 
     created_at = sa.Column(sa.types.DateTime(), nullable=False, default=datetime.datetime.utcnow)
 
+    @classmethod
+    def allocate_report_ids(cls, session, data_source_id, count=1):
+        """
+        Reserve IDs for new reports for a data source.
+
+        The data source's counter is incremented with a single UPDATE, which locks the data source's
+        row until the transaction ends. Concurrent transactions reporting transfers from the same data
+        source will wait for the lock instead of allocating the same IDs.
+
+        Parameters:
+        session - Session - Database session. IDs are reserved until the session's transaction ends.
+        data_source_id - Integer - ID of the data source the reports belong to.
+        count - Integer - Number of IDs to reserve.
+
+        Returns:
+        range - The reserved report IDs
+        """
+        data_sources = cls.metadata.tables["data_sources"]
+        session.execute(data_sources.update()
+                        .where(data_sources.c.id == data_source_id)
+                        .values(last_transfer_report_id=data_sources.c.last_transfer_report_id + count))
+        last_id = session.execute(sa.select([data_sources.c.last_transfer_report_id])
+                                  .where(data_sources.c.id == data_source_id)).scalar()
+        return range(last_id - count + 1, last_id + 1)
+
     def __repr__(self):
         return "<TransferReport (data_source=%d, destination=%d, url=%s, time=%f)>" % (
             self.data_source_id,
             self.destination_id,
             self.url,
             self.transfer_duration_seconds)
+
+
+def consensus_file_checksum(urls):
+    """
+    Find the checksum that successful transfers of a file agree on.
+
+    Parameters:
+    urls - String[] - URLs of copies of the same file. For example, a URL and the URLs it is transformed to.
+
+    Returns:
+    String - The MD5 checksum reported by a majority of at least MIN_CONSENSUS_REPORTS successful transfers
+    of any of the URLs. None if there is no such checksum.
+    """
+    if not urls:
+        return None
+
+    checksum = sa.func.lower(TransferReport.file_checksum)
+    counts = db_session.query(checksum, sa.func.count()) \
+        .filter(TransferReport.url.in_(set(urls))) \
+        .filter(TransferReport.is_success) \
+        .group_by(checksum) \
+        .all()
+
+    if not counts:
+        return None
+
+    total = sum(count for (checksum, count) in counts)
+    (checksum, count) = max(counts, key=lambda c: c[1])
+    if count >= MIN_CONSENSUS_REPORTS and count * 2 > total:
+        return checksum
+
+    return None
+
+
+# Functions that update records derived from transfer reports. See after_transfer_reports_flushed.
+_flushed_report_handlers = []
+
+
+def after_transfer_reports_flushed(handler):
+    """
+    Register a function to update records derived from transfer reports, such as statistics, when reports are
+    added or deleted.
+
+    Handlers are called after each flush that adds or deletes reports, once data sources and destinations added
+    along with the reports have IDs. Their changes are flushed with the rest of the transaction.
+
+    Parameters:
+    handler - Function - Called with the session, the reports added, and the reports deleted. Reports deleted
+        along with their data source are omitted.
+    """
+    _flushed_report_handlers.append(handler)
+    return handler
+
+
+@sa.event.listens_for(db_session, "after_flush")
+def _collect_flushed_reports(session, flush_context):
+    # The session's new and deleted objects are still those of the flush that just finished
+    deleted_data_source_ids = set(obj.id for obj in session.deleted if isinstance(obj, DataSource))
+    new_reports = [obj for obj in session.new if isinstance(obj, TransferReport)]
+    deleted_reports = [obj for obj in session.deleted
+                       if isinstance(obj, TransferReport) and obj.data_source_id not in deleted_data_source_ids]
+    if new_reports or deleted_reports:
+        flush_context.attributes["flushed_transfer_reports"] = (new_reports, deleted_reports)
+
+
+@sa.event.listens_for(db_session, "after_flush_postexec")
+def _update_from_flushed_reports(session, flush_context):
+    # Changes made here are flushed by the next flush, which committing the session runs
+    try:
+        (new_reports, deleted_reports) = flush_context.attributes["flushed_transfer_reports"]
+    except KeyError:
+        return
+
+    with session.no_autoflush:
+        for handler in _flushed_report_handlers:
+            handler(session, new_reports, deleted_reports)
+
+
+def lock_or_create(session, model, query, values):
+    """
+    Get a row to update, locking it so that concurrent updates are not lost. Creates the row if it doesn't exist.
+
+    If a concurrent transaction creates the row first, this waits for that transaction and locks its row instead.
+
+    Parameters:
+    session - Session - Database session.
+    model - Class - Model of the row.
+    query - Query - Query for the row.
+    values - dict - Column values to create the row with.
+
+    Returns:
+    The locked row
+    """
+    row = query.with_for_update().first()
+    if row:
+        return row
+
+    # Insert in a savepoint so that the transaction can continue if another transaction's insert wins
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            connection.execute(model.__table__.insert().values(**values))
+    except IntegrityError:
+        pass
+
+    return query.with_for_update().one()
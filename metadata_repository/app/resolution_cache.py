@@ -0,0 +1,267 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import sqlalchemy as sa
+
+from .config import resolution_cache_path, resolution_cache_size
+from .models import db_session, DataSource, Destination, Transform, UrlMatcher
+
+
+# Time (in seconds) the configuration version is reused before checking the database for changes again
+CONFIGURATION_VERSION_MAX_AGE = 5
+
+# Entries read from the cache are marked as used in batches of this many, or after this many seconds
+TOUCH_BATCH_SIZE = 100
+TOUCH_INTERVAL = 10
+
+
+class ResolutionCache():
+    """
+    Least recently used cache of transfers found for URLs.
+
+    Entries are stored in a SQLite database so that all application processes on a host share them. Each
+    entry is stored with the version of the configuration it was found with and is only returned for that
+    version. Entries for older versions are removed when a new entry is added. Versions are ordered by when
+    they were first read from the metadata database, so that a process that has not seen a configuration
+    change yet does not remove entries for the new configuration.
+
+    To avoid a write to the shared database on every read, the times entries were last used are kept in
+    memory and written in batches.
+    """
+
+    def __init__(self, path, max_entries):
+        """
+        Parameters:
+        path - String - Path of the SQLite database. It is created if it doesn't exist.
+        max_entries - Integer - Number of entries to keep. The least recently used entries are removed first.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+        # Times entries were last used that have not been written to the database yet
+        self._touched = {}
+        self._touched_lock = threading.Lock()
+        self._touches_written_at = time.monotonic()
+
+    def _connection(self):
+        # SQLite connections can't be shared between threads or forked processes
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS resolutions ("
+                               "key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL, last_used_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_resolutions_last_used_at ON resolutions (last_used_at)")
+            connection.execute("CREATE TABLE IF NOT EXISTS versions (version TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+            self._local.connection = connection
+
+        return connection
+
+    def get(self, key, version):
+        """
+        Get a cached value.
+
+        Parameters:
+        key - String - Cache key.
+        version - String - Current configuration version.
+
+        Returns:
+        Value stored for the key and version or None if there is none.
+        """
+        connection = self._connection()
+        row = connection.execute("SELECT value FROM resolutions WHERE key = ? AND version = ?", (key, version)).fetchone()
+        if row is None:
+            return None
+
+        with self._touched_lock:
+            self._touched[key] = time.time()
+            write_touches = len(self._touched) >= TOUCH_BATCH_SIZE or \
+                time.monotonic() - self._touches_written_at >= TOUCH_INTERVAL
+
+        if write_touches:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                self._write_touches(connection)
+
+        return json.loads(row[0])
+
+    def _write_touches(self, connection):
+        with self._touched_lock:
+            touched = self._touched
+            self._touched = {}
+            self._touches_written_at = time.monotonic()
+
+        connection.executemany("UPDATE resolutions SET last_used_at = ? WHERE key = ?",
+                               [(used_at, key) for key, used_at in touched.items()])
+
+    def put(self, key, version, value, version_seen_at=None):
+        """
+        Store a value, removing entries for older configuration versions and the least recently used entries
+        beyond max_entries.
+
+        Parameters:
+        key - String - Cache key.
+        version - String - Configuration version the value was found with.
+        value - JSON serializable value to store.
+        version_seen_at - Float - Time (seconds since the epoch) the version was read from the metadata database.
+            Defaults to now.
+        """
+        if version_seen_at is None:
+            version_seen_at = time.time()
+
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT OR IGNORE INTO versions (version, seen_at) VALUES (?, ?)", (version, version_seen_at))
+            connection.execute("UPDATE versions SET seen_at = MIN(seen_at, ?) WHERE version = ?", (version_seen_at, version))
+            (seen_at,) = connection.execute("SELECT seen_at FROM versions WHERE version = ?", (version,)).fetchone()
+            connection.execute("DELETE FROM resolutions WHERE version IN (SELECT version FROM versions WHERE seen_at < ?)",
+                               (seen_at,))
+            connection.execute("DELETE FROM versions WHERE seen_at < ?", (seen_at,))
+            connection.execute("INSERT OR REPLACE INTO resolutions (key, version, value, last_used_at) VALUES (?, ?, ?, ?)",
+                               (key, version, json.dumps(value), time.time()))
+
+            # Write pending uses so that recently used entries are not evicted
+            self._write_touches(connection)
+
+            num_entries = connection.execute("SELECT COUNT(*) FROM resolutions").fetchone()[0]
+            if num_entries > self.max_entries:
+                connection.execute("DELETE FROM resolutions WHERE key IN "
+                                   "(SELECT key FROM resolutions ORDER BY last_used_at LIMIT ?)",
+                                   (num_entries - self.max_entries,))
+
+
+def configuration_version():
+    """
+    Cheap summary of the data sources, URL matchers, transforms, and destinations tables that changes whenever
+    any of them is added, edited, or deleted through any application process.
+
+    Returns:
+    String
+    """
+    tables = [DataSource, UrlMatcher, Transform, Destination]
+    summary = db_session.query(*[
+        sa.select([sa.func.count()]).select_from(table).as_scalar() for table in tables
+    ] + [
+        sa.select([sa.func.max(table.last_updated_at)]).as_scalar() for table in tables
+    ]).one()
+    return json.dumps([str(v) for v in summary])
+
+
+_version = None
+_version_seen_at = None
+_version_checked_at = None
+_version_lock = threading.Lock()
+
+
+def current_configuration_version():
+    """
+    Get the configuration version, checking the database at most once every CONFIGURATION_VERSION_MAX_AGE
+    seconds. Configuration changes may take that long to invalidate cached entries.
+
+    Returns:
+    (String, Float) - The version and the time (seconds since the epoch) it was read from the database.
+    """
+    global _version, _version_seen_at, _version_checked_at
+
+    with _version_lock:
+        if _version is not None and time.monotonic() - _version_checked_at < CONFIGURATION_VERSION_MAX_AGE:
+            return (_version, _version_seen_at)
+
+    version = configuration_version()
+    seen_at = time.time()
+    with _version_lock:
+        _version = version
+        _version_seen_at = seen_at
+        _version_checked_at = time.monotonic()
+
+    return (version, seen_at)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_resolution_cache():
+    """
+    Get the resolution cache configured by RESOLUTION_CACHE_PATH.
+
+    Returns:
+    ResolutionCache - None if no cache is configured.
+    """
+    global _cache
+
+    if not resolution_cache_path:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResolutionCache(resolution_cache_path, resolution_cache_size)
+        return _cache
+
+
+def cached_resolution(key, resolve):
+    """
+    Get a value from the resolution cache, or compute and store it if it isn't cached for the current configuration.
+
+    Errors accessing the cache are reported and the value is computed without the cache.
+
+    Parameters:
+    key - JSON serializable value - Cache key.
+    resolve - Function - Function computing the value to cache. Must return a JSON serializable value.
+
+    Returns:
+    Value returned by resolve.
+    """
+    cache = get_resolution_cache()
+    if not cache:
+        return resolve()
+
+    key = json.dumps(key, sort_keys=True)
+    try:
+        (version, version_seen_at) = current_configuration_version()
+        entry = cache.get(key, version)
+    except sqlite3.Error as e:
+        # FIXME: This should be a log
+        print("Warning: Unable to read resolution cache: %s" % e, file=sys.stderr)
+        return resolve()
+
+    if entry is not None:
+        return entry["value"]
+
+    value = resolve()
+    try:
+        cache.put(key, version, dict(value=value), version_seen_at)
+    except sqlite3.Error as e:
+        # FIXME: This should be a log
+        print("Warning: Unable to update resolution cache: %s" % e, file=sys.stderr)
+
+    return value
@@ -16,12 +16,14 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import hashlib
 import json
 
 import requests
 import sqlalchemy as sa
 from flask import Blueprint, flash, jsonify, render_template, request
 from flask_login import login_required
+from sqlalchemy.orm import subqueryload
 
 from .auth import admin_required
 from ..models import db_session, DataSource, Destination, TransferTestFile, Transform, UrlMatcher
@@ -54,7 +56,7 @@ def serialize_data_source(source):
             options=source.transfer_mechanism_options),
         test_files=[f.url for f in source.transfer_test_files],
         transforms=[serialize_transform(t) for t in source.transforms],
-        url_matchers=[serialize_matcher(m) for m in source.url_matchers]
+        url_matchers=[serialize_matcher(m) for m in sorted(source.url_matchers, key=lambda m: m.matcher_id)]
     )
 
 
@@ -63,7 +65,16 @@ def serialize_destination(dest):
 
 
 def serialize_configuration():
-    serialized_data_sources = [serialize_data_source(s) for s in DataSource.query.all()]
+    # Data sources and matchers are listed in the order they are checked when matching URLs,
+    # so that clients can match URLs locally.
+    # Transform targets are among the data sources loaded here, so they don't require additional queries.
+    data_sources = DataSource.query \
+        .options(subqueryload(DataSource.transfer_test_files),
+                 subqueryload(DataSource.url_matchers),
+                 subqueryload(DataSource.transforms).subqueryload(Transform.for_destinations)) \
+        .order_by(DataSource.id) \
+        .all()
+    serialized_data_sources = [serialize_data_source(s) for s in data_sources]
     serialized_destinations = [serialize_destination(d) for d in Destination.query.all()]
 
     return dict(data_sources=serialized_data_sources,
@@ -146,8 +157,15 @@ def index():
 
 @routes.route("/configuration/export")
 def export_configuration():
-    """Export configuration of data sources, matchers, destinations, and transforms to a file."""
-    return jsonify(**serialize_configuration())
+    """
+    Export configuration of data sources, matchers, destinations, and transforms to a file.
+
+    Responses have an ETag so that clients caching the configuration can check if it has changed
+    with a conditional request.
+    """
+    response = jsonify(**serialize_configuration())
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    return response.make_conditional(request)
 
 
 @routes.route("/configuration/import", methods=("GET", "POST"))
@@ -23,6 +23,7 @@ from flask import Blueprint, flash, jsonify, redirect, render_template, request,
 from ..core import find_transfers, FindTransferError
 from ..forms import FindTransfersForm
 from ..models import Destination
+from ..util import available_transfer_mechanism_types
 
 
 routes = Blueprint("core", __name__)
@@ -47,7 +48,8 @@ def transfers():
     Find available transfers for a URL.
     """
     form = FindTransfersForm(request.form)
-    form.destination.choices = [("", "Unknown")] + [(d.label, d.label) for d in Destination.query.all()]
+    destinations = {d.label: d for d in Destination.query.all()}
+    form.destination.choices = [("", "Unknown")] + [(label, label) for label in destinations]
 
     results = []
     if request.method == "POST":
@@ -55,9 +57,7 @@ def transfers():
         error_details = None
         if form.validate():
             try:
-                destination = None
-                if form.destination.data:
-                    destination = Destination.query.filter(Destination.label == form.destination.data).first()
+                destination = destinations.get(form.destination.data)
                 results = find_transfers(form.url.data, form.available_mechanisms.data, destination)
             except FindTransferError as e:
                 error_message = e.args[0]
@@ -74,3 +74,70 @@ def transfers():
             flash(error_message, "danger")
 
     return render_template("transfers.html.jinja", form=form, transfers=results)
+
+
+# Maximum number of URLs accepted in one batch request
+MAX_BATCH_SIZE = 1000
+
+
+def _batch_validation_errors(data):
+    """Check the body of a batch transfers request. Returns a dictionary of errors by field."""
+    errors = {}
+
+    urls = data.get("urls")
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and u for u in urls):
+        errors["urls"] = ["This field must be a non-empty list of URLs"]
+    elif len(urls) > MAX_BATCH_SIZE:
+        errors["urls"] = ["No more than %d URLs may be requested at once" % MAX_BATCH_SIZE]
+
+    mechanisms = data.get("available_mechanisms")
+    if not isinstance(mechanisms, list) or not mechanisms:
+        errors["available_mechanisms"] = ["This field is required"]
+    elif not set(mechanisms).issubset(set(available_transfer_mechanism_types())):
+        errors["available_mechanisms"] = ["Not a valid choice"]
+
+    destination = data.get("destination")
+    if destination is not None and not isinstance(destination, str):
+        errors["destination"] = ["Not a valid choice"]
+
+    return errors
+
+
+@routes.route("/transfers/batch", methods=["POST"])
+def batch_transfers():
+    """
+    Find available transfers for many URLs at once.
+
+    Expects a JSON body with "urls", "available_mechanisms", and an optional "destination".
+    Responds with one result per URL, in the same order as the request.
+    """
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify(results=[], error=dict(message="Invalid request", details=None)), 400
+
+    errors = _batch_validation_errors(data)
+
+    destination = None
+    if not errors and data.get("destination"):
+        destination = Destination.query.filter(Destination.label == data["destination"]).first()
+        if not destination:
+            errors["destination"] = ["Not a valid choice"]
+
+    if errors:
+        return jsonify(results=[], error=dict(message="Validation error", details=errors)), 400
+
+    results = []
+    for url in data["urls"]:
+        transfers = []
+        error_message = None
+        try:
+            transfers = find_transfers(url, data["available_mechanisms"], destination)
+        except FindTransferError as e:
+            error_message = e.args[0]
+        except Exception:
+            traceback.print_exc()
+            error_message = "Unable to find transfers"
+
+        results.append(dict(url=url, transfers=transfers, error=dict(message=error_message) if error_message else None))
+
+    return jsonify(results=results, error=None)
@@ -22,6 +22,7 @@ import traceback
 from flask import abort, Blueprint, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
 from sqlalchemy import func
+from sqlalchemy.orm import subqueryload
 from wtforms import validators
 
 from .auth import admin_required
@@ -186,7 +187,7 @@ def show_transfer_mechanism_options_form():
 
 @routes.route("/data_sources/relations")
 def data_source_relations():
-    data_sources = DataSource.query.all()
+    data_sources = DataSource.query.options(subqueryload(DataSource.transforms)).all()
     nodes = []
     links = []
     for ds in data_sources:
@@ -16,11 +16,14 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import gzip
+import json
 import math
 import traceback
 
 from flask import abort, Blueprint, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
+from werkzeug.datastructures import MultiDict
 
 from .auth import admin_required
 from ..core import matching_data_source
@@ -31,34 +34,50 @@ from ..models import db_session, DataSource, Destination, TransferReport
 routes = Blueprint("transfer_reports", __name__)
 
 
+def _destination_choices(destinations):
+    return [("", "Unknown")] + [(d.label, d.label) for d in destinations]
+
+
+def _form_data(report_data):
+    # Forms expect string values like those in request.form
+    return MultiDict({key: "" if value is None else str(value) for key, value in report_data.items()})
+
+
+def _report_from_form(form, data_source_id, report_id, destination_id):
+    return TransferReport(
+        data_source_id=data_source_id,
+        report_id=report_id,
+        destination_id=destination_id,
+        url=form.url.data,
+        file_size_bytes=form.file_size_bytes.data,
+        transfer_duration_seconds=form.transfer_duration_seconds.data,
+        file_checksum=form.file_checksum.data,
+        mechanism_name=form.mechanism_name.data or None,
+        mechanism_output=form.mechanism_output.data or None,
+        abort_reason=form.abort_reason.data or None,
+        is_success=form.is_success.data
+    )
+
+
 @routes.route("/transfer_reports", methods=["POST"])
 def report_transfer():
     """
     Report a transfer.
     """
+    destinations = Destination.query.all()
     form = TransferReportForm(request.form)
-    form.destination.choices = [("", "Unknown")] + [(d.label, d.label) for d in Destination.query.all()]
+    form.destination.choices = _destination_choices(destinations)
 
     error_message = None
     if form.validate():
         data_source = matching_data_source(form.url.data)
         destination_id = None
         if form.destination.data:
-            destination = Destination.query.filter(Destination.label == form.destination.data).first()
-            if destination:
-                destination_id = destination.id
+            destination_id = next((d.id for d in destinations if d.label == form.destination.data), None)
         if data_source:
-            report = TransferReport(
-                data_source_id=data_source.id,
-                report_id=max([r.report_id for r in data_source.transfer_reports] + [0]) + 1,
-                destination_id=destination_id,
-                url=form.url.data,
-                file_size_bytes=form.file_size_bytes.data,
-                transfer_duration_seconds=form.transfer_duration_seconds.data,
-                file_checksum=form.file_checksum.data
-            )
-
             try:
+                [report_id] = TransferReport.allocate_report_ids(db_session, data_source.id)
+                report = _report_from_form(form, data_source.id, report_id, destination_id)
                 db_session.add(report)
                 db_session.commit()
             except:
@@ -76,6 +95,87 @@ def report_transfer():
         return jsonify(success=True, error=None)
 
 
+# Maximum number of reports accepted in one batch request
+MAX_REPORT_BATCH_SIZE = 1000
+
+
+@routes.route("/transfer_reports/batch", methods=["POST"])
+def report_transfers():
+    """
+    Report many transfers at once.
+
+    Expects a JSON array of reports with the same fields as the report_transfer form. The request body
+    may be gzip compressed. Valid reports are saved in a single transaction. Responds with a result for
+    each report, in the same order as the request.
+    """
+    try:
+        body = request.get_data()
+        if request.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        reports_data = json.loads(body.decode("utf-8"))
+    except (OSError, ValueError):
+        reports_data = None
+
+    if not isinstance(reports_data, list) or not all(isinstance(r, dict) for r in reports_data):
+        return jsonify(success=False, results=[], error={"message": "Invalid request"}), 400
+    if len(reports_data) > MAX_REPORT_BATCH_SIZE:
+        return jsonify(success=False, results=[],
+                       error={"message": "No more than %d reports may be sent at once" % MAX_REPORT_BATCH_SIZE}), 400
+
+    destinations = Destination.query.all()
+    destination_choices = _destination_choices(destinations)
+    destination_ids = {d.label: d.id for d in destinations}
+
+    # Reports for the same file often arrive together, so only match each distinct URL once.
+    # Matching can't be shared between URLs with the same host because matchers may check the whole URL.
+    data_source_ids = {}
+
+    results = []
+    valid_forms = []
+    for report_data in reports_data:
+        form = TransferReportForm(_form_data(report_data))
+        form.destination.choices = destination_choices
+
+        if not form.validate():
+            results.append({"success": False, "error": {"message": "Invalid report", "details": form.errors}})
+            continue
+
+        if form.url.data not in data_source_ids:
+            data_source = matching_data_source(form.url.data)
+            data_source_ids[form.url.data] = data_source.id if data_source else None
+
+        if data_source_ids[form.url.data] is None:
+            results.append({"success": False, "error": {"message": "No data sources matches URL"}})
+            continue
+
+        results.append({"success": True, "error": None})
+        valid_forms.append(form)
+
+    forms_by_data_source = {}
+    for form in valid_forms:
+        forms_by_data_source.setdefault(data_source_ids[form.url.data], []).append(form)
+
+    error_message = None
+    try:
+        # Lock data sources' report counters in a consistent order so that concurrent batches can't deadlock
+        for data_source_id in sorted(forms_by_data_source):
+            forms = forms_by_data_source[data_source_id]
+            report_ids = TransferReport.allocate_report_ids(db_session, data_source_id, len(forms))
+            for form, report_id in zip(forms, report_ids):
+                db_session.add(_report_from_form(form, data_source_id, report_id,
+                                                 destination_ids.get(form.destination.data)))
+        db_session.commit()
+    except:
+        db_session.rollback()
+        traceback.print_exc()
+        error_message = "Failed to save reports"
+        results = [{"success": False, "error": r["error"] or {"message": error_message}} for r in results]
+
+    return jsonify(success=error_message is None and all(r["success"] for r in results),
+                   results=results,
+                   error={"message": error_message} if error_message else None)
+
+
 @routes.route("/data_sources/<source_id>/transfer_reports")
 @login_required
 @admin_required
@@ -101,9 +201,12 @@ def list_transfer_reports(source_id):
 @login_required
 @admin_required
 def transfer_reports_graph(source_id):
+    data_source = DataSource.query.filter(DataSource.id == source_id).first() or abort(404)
     reports = TransferReport.query.filter((TransferReport.data_source_id == source_id) & (TransferReport.is_success == True)).all()  # noqa
     graph_data = [[r.created_at.timestamp(), r.transfer_rate] for r in reports]
-    return jsonify(points=graph_data)
+    return jsonify(points=graph_data,
+                   mean=data_source.mean_successful_transfer_rate,
+                   stdev=data_source.stdev_successful_transfer_rates)
 
 
 @routes.route("/data_sources/<source_id>/transfer_reports/<report_id>")
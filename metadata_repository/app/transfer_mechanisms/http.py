@@ -0,0 +1,38 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+import wtforms
+
+
+label = "HTTP"
+
+
+description = "Transfer files over HTTP(S) with the client's built in HTTP client, reusing connections between files"
+
+
+class OptionsForm(wtforms.Form):
+
+    segments = wtforms.fields.IntegerField(
+        label="Segments",
+        description="Number of parallel connections to download each file over. Requires the server to support range requests.",
+        validators=[wtforms.validators.Optional(), wtforms.validators.NumberRange(min=1)])
+
+    segment_size = wtforms.fields.IntegerField(
+        label="Segment Size",
+        description="Size (bytes) of each range requested when downloading over multiple connections. "
+                    "Defaults to splitting the file evenly between connections.",
+        validators=[wtforms.validators.Optional(), wtforms.validators.NumberRange(min=1)])
@@ -19,6 +19,7 @@
 import importlib
 import os
 import pkgutil
+from types import MappingProxyType
 
 
 ######################################################################################################
@@ -34,13 +35,60 @@ def _modules_in_package(package_name):
     return [name for _, name, _ in pkgutil.iter_modules([modules_directory])]
 
 
-def _property_of_module(module, property_name):
-    """Return a property of a module or None if the property doesn't exist."""
-    try:
-        module = importlib.import_module(__package__ + "." + module)
-        return getattr(module, property_name)
-    except (AttributeError, ImportError):
-        return None
+# Packages containing plugin modules and the properties read from those modules
+_PLUGIN_PACKAGES = ["matchers", "transforms", "transfer_mechanisms"]
+_PLUGIN_PROPERTIES = ["label", "description", "OptionsForm", "render_description", "matches_url", "transform_url"]
+
+
+def _load_plugins(reload_modules=False):
+    """
+    Import all plugin modules and collect their properties.
+
+    Parameters:
+    reload_modules - Boolean - Reload modules that have already been imported.
+
+    Returns:
+    Read only mapping of package name -> module name -> property name -> property. Modules that can't be
+    imported are included with no properties.
+    """
+    plugins = {}
+    for package_name in _PLUGIN_PACKAGES:
+        package_plugins = {}
+        for module_name in _modules_in_package(package_name):
+            properties = {}
+            try:
+                module = importlib.import_module(__package__ + "." + package_name + "." + module_name)
+                if reload_modules:
+                    module = importlib.reload(module)
+                properties = {name: getattr(module, name) for name in _PLUGIN_PROPERTIES if hasattr(module, name)}
+            except ImportError:
+                pass
+            package_plugins[module_name] = MappingProxyType(properties)
+        plugins[package_name] = MappingProxyType(package_plugins)
+
+    return MappingProxyType(plugins)
+
+
+_plugins = _load_plugins()
+
+
+def reload_plugins():
+    """
+    Discover plugin modules again and reload them, for example after adding or editing a matcher,
+    transform, or transfer mechanism module.
+    """
+    global _plugins
+    _plugins = _load_plugins(reload_modules=True)
+
+
+def _plugin_names(package_name):
+    """List names of plugin modules in a package."""
+    return list(_plugins[package_name])
+
+
+def _plugin_property(package_name, module_name, property_name):
+    """Return a property of a plugin module or None if the property doesn't exist."""
+    return _plugins[package_name].get(module_name, {}).get(property_name)
 
 
 ######################################################################################################
@@ -52,32 +100,32 @@ def _property_of_module(module, property_name):
 
 def available_matcher_types():
     """List names of available matcher modules."""
-    return _modules_in_package("matchers")
+    return _plugin_names("matchers")
 
 
 def label_for_matcher_type(matcher_type):
     """Get user facing label for a matcher type."""
-    label = _property_of_module("matchers." + matcher_type, "label")
+    label = _plugin_property("matchers", matcher_type, "label")
     return label if label else matcher_type
 
 
 def description_for_matcher_type(matcher_type):
-    return _property_of_module("matchers." + matcher_type, "description") or ""
+    return _plugin_property("matchers", matcher_type, "description") or ""
 
 
 def matcher_of_type(matcher_type):
     """Get matcher function for a matcher type."""
-    return _property_of_module("matchers." + matcher_type, "matches_url")
+    return _plugin_property("matchers", matcher_type, "matches_url")
 
 
 def options_form_class_for_matcher_type(matcher_type):
     """Get options form for a matcher type."""
-    return _property_of_module("matchers." + matcher_type, "OptionsForm")
+    return _plugin_property("matchers", matcher_type, "OptionsForm")
 
 
 def render_matcher_description(matcher_type, matcher_options):
     """Text to show in list of matchers on show data source page."""
-    return _property_of_module("matchers." + matcher_type, "render_description")(matcher_options)
+    return _plugin_property("matchers", matcher_type, "render_description")(matcher_options)
 
 
 ######################################################################################################
@@ -89,32 +137,32 @@ def render_matcher_description(matcher_type, matcher_options):
 
 def available_transform_types():
     """List names of available matcher modules."""
-    return _modules_in_package("transforms")
+    return _plugin_names("transforms")
 
 
 def label_for_transform_type(transform_type):
     """Get user facing label for a transform type."""
-    label = _property_of_module("transforms." + transform_type, "label")
+    label = _plugin_property("transforms", transform_type, "label")
     return label if label else transform_type
 
 
 def description_for_transform_type(transform_type):
-    return _property_of_module("transforms." + transform_type, "description") or ""
+    return _plugin_property("transforms", transform_type, "description") or ""
 
 
 def transform_of_type(transform_type):
     """Get matcher function for a transform type."""
-    return _property_of_module("transforms." + transform_type, "transform_url")
+    return _plugin_property("transforms", transform_type, "transform_url")
 
 
 def options_form_class_for_transform_type(transform_type):
     """Get options form for a transform type."""
-    return _property_of_module("transforms." + transform_type, "OptionsForm")
+    return _plugin_property("transforms", transform_type, "OptionsForm")
 
 
 def render_transform_description(transform_type, transform_options):
     """Text to show in list of transforms on show data source page."""
-    return _property_of_module("transforms." + transform_type, "render_description")(transform_options)
+    return _plugin_property("transforms", transform_type, "render_description")(transform_options)
 
 
 ######################################################################################################
@@ -126,19 +174,19 @@ def render_transform_description(transform_type, transform_options):
 
 def available_transfer_mechanism_types():
     """List names of available transfer mechanism modules."""
-    return _modules_in_package("transfer_mechanisms")
+    return _plugin_names("transfer_mechanisms")
 
 
 def label_for_transfer_mechanism_type(transfer_mechanism_type):
     """Get user facing label for a transfer mechanism type."""
-    label = _property_of_module("transfer_mechanisms." + transfer_mechanism_type, "label")
+    label = _plugin_property("transfer_mechanisms", transfer_mechanism_type, "label")
     return label if label else transfer_mechanism_type
 
 
 def description_for_transfer_mechanism_type(transfer_mechanism_type):
-    return _property_of_module("transfer_mechanisms." + transfer_mechanism_type, "description") or ""
+    return _plugin_property("transfer_mechanisms", transfer_mechanism_type, "description") or ""
 
 
 def options_form_class_for_transfer_mechanism_type(transfer_mechanism_type):
     """Get options form for a transfer_mechanism type."""
-    return _property_of_module("transfer_mechanisms." + transfer_mechanism_type, "OptionsForm")
+    return _plugin_property("transfer_mechanisms", transfer_mechanism_type, "OptionsForm")
@@ -45,6 +45,7 @@ class TestAdminAuthorization(BaseAuthorizationTestMixin, unittest.TestCase):
             ("core.index", "GET"),
             ("core.transfers", "GET"),
             ("core.transfers", "POST"),
+            ("core.batch_transfers", "POST"),
 
             ("data_sources.create_data_source", "GET"),
             ("data_sources.create_data_source", "POST"),
@@ -94,6 +95,7 @@ class TestAdminAuthorization(BaseAuthorizationTestMixin, unittest.TestCase):
             ("transfer_reports.delete_transfer_report", "POST"),
             ("transfer_reports.list_transfer_reports", "GET"),
             ("transfer_reports.report_transfer", "POST"),
+            ("transfer_reports.report_transfers", "POST"),
             ("transfer_reports.show_transfer_report", "GET"),
             ("transfer_reports.transfer_reports_graph", "GET"),
 
@@ -42,6 +42,7 @@ class TestAnonymousAuthorization(BaseAuthorizationTestMixin, unittest.TestCase):
             ("core.index", "GET"),
             ("core.transfers", "GET"),
             ("core.transfers", "POST"),
+            ("core.batch_transfers", "POST"),
 
             ("data_sources.data_source_relations", "GET"),
             ("data_sources.search_data_sources", "GET"),
@@ -62,6 +63,7 @@ class TestAnonymousAuthorization(BaseAuthorizationTestMixin, unittest.TestCase):
             ("test_files.show_test_file", "GET"),
 
             ("transfer_reports.report_transfer", "POST"),
+            ("transfer_reports.report_transfers", "POST"),
 
             ("transforms.show_transform", "GET"),
         ]
@@ -17,6 +17,9 @@
 #
 
 import unittest
+from contextlib import contextmanager
+
+import sqlalchemy as sa
 
 import app
 from app.models import db_engine, db_session, BaseModel, User
@@ -34,6 +37,22 @@ class BaseTestCase(unittest.TestCase):
                          data=dict(email="user@example.com", password="password"),
                          follow_redirects=True)
 
+    @contextmanager
+    def countQueries(self):
+        """
+        Count SQL statements executed inside the block. Yields a list that the statements are appended to.
+        """
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        sa.event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            sa.event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
+
     def setUp(self):
         BaseModel.metadata.drop_all(bind=db_engine)
         BaseModel.metadata.create_all(bind=db_engine)
@@ -170,6 +170,20 @@ class TestImportConfiguration(BaseTestCase):
         self.assertEqual(data_sources, self.serialized_sample_data_sources)
         self.assertEqual(destinations, self.serialized_sample_destinations)
 
+    def test_export_configuration_etag(self):
+        self.loadSampleData()
+
+        response = self.client.get("/configuration/export")
+        etag = response.headers["ETag"]
+        self.assertTrue(etag)
+
+        response = self.client.get("/configuration/export", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b"")
+
+        response = self.client.get("/configuration/export", headers={"If-None-Match": "\"outdated\""})
+        self.assertEqual(response.status_code, 200)
+
     def test_import_configuration(self):
         """Verify importing configuration file populates database correctly."""
         with self.client:
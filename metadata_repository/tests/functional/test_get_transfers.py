@@ -20,7 +20,7 @@ import json
 
 from .base import BaseTestCase
 
-from app.models import DataSource, Destination, Transform, UrlMatcher
+from app.models import DataSource, Destination, TransferReport, Transform, UrlMatcher
 
 
 class TestGetTransfers(BaseTestCase):
@@ -135,3 +135,148 @@ class TestGetTransfers(BaseTestCase):
                 "http://example.net/file.txt",
                 "http://example.com/file.txt"
             ])
+
+    def test_get_transfers_batch(self):
+        with self.client as client:
+            r = client.post("/transfers/batch",
+                            data=json.dumps({
+                                "urls": ["http://example.com/file.txt", "http://example.com/other.txt", "http://unknown.com/file.txt"],
+                                "available_mechanisms": ["curl"],
+                                "destination": "Test Destination"
+                            }),
+                            content_type="application/json")
+
+            self.assertEqual(r.status_code, 200)
+            r = json.loads(r.get_data(as_text=True))
+
+            self.assertEqual([result["url"] for result in r["results"]], [
+                "http://example.com/file.txt",
+                "http://example.com/other.txt",
+                "http://unknown.com/file.txt"
+            ])
+
+            self.assertEqual([t["url"] for t in r["results"][0]["transfers"]], [
+                "http://example.org/file.txt",
+                "http://example.net/file.txt",
+                "http://example.com/file.txt"
+            ])
+            self.assertEqual([t["data_source_id"] for t in r["results"][1]["transfers"]], [2, 3, 1])
+            self.assertIsNone(r["results"][0]["error"])
+
+            self.assertEqual(r["results"][2]["transfers"], [])
+            self.assertIsNotNone(r["results"][2]["error"])
+
+    def test_get_transfers_batch_validation(self):
+        with self.client as client:
+            r = client.post("/transfers/batch",
+                            data=json.dumps({"urls": [], "available_mechanisms": ["curl"]}),
+                            content_type="application/json")
+
+            self.assertEqual(r.status_code, 400)
+            r = json.loads(r.get_data(as_text=True))
+            self.assertIn("urls", r["error"]["details"])
+
+            r = client.post("/transfers/batch",
+                            data=json.dumps({
+                                "urls": ["http://example.com/file.txt"],
+                                "available_mechanisms": ["curl"],
+                                "destination": "Unknown Destination"
+                            }),
+                            content_type="application/json")
+
+            self.assertEqual(r.status_code, 400)
+            r = json.loads(r.get_data(as_text=True))
+            self.assertIn("destination", r["error"]["details"])
+
+    def test_get_transfers_includes_expected_transfer_rate(self):
+        with self.client as client:
+            self.addToDatabase(
+                TransferReport(data_source_id=2, report_id=1, url="http://example.org/a.txt", file_size_bytes=1000,
+                               transfer_duration_seconds=1, file_checksum="a" * 32, is_success=True),
+                TransferReport(data_source_id=2, report_id=2, url="http://example.org/b.txt", file_size_bytes=3000,
+                               transfer_duration_seconds=1, file_checksum="a" * 32, is_success=True))
+
+            r = client.post("/transfers",
+                            data={
+                                "url": "http://example.com/file.txt",
+                                "available_mechanisms": ["curl"]
+                            },
+                            headers=dict(Accept="application/json"),
+                            follow_redirects=True)
+
+            r = json.loads(r.get_data(as_text=True))
+
+            self.assertEqual([t["expected_transfer_rate"] for t in r["transfers"]], [2000, None])
+
+    def test_transfers_are_ranked_by_estimated_rate_for_destination(self):
+        with self.client as client:
+            reports = [
+                # Target source 1 is slow for the test destination, but fast elsewhere
+                TransferReport(data_source_id=2, report_id=1, destination_id=1, url="http://example.org/a.txt",
+                               file_size_bytes=1000, transfer_duration_seconds=1, file_checksum="a" * 32, is_success=True),
+                TransferReport(data_source_id=2, report_id=2, url="http://example.org/b.txt",
+                               file_size_bytes=100000, transfer_duration_seconds=1, file_checksum="a" * 32, is_success=True),
+                TransferReport(data_source_id=3, report_id=1, destination_id=1, url="http://example.net/a.txt",
+                               file_size_bytes=5000, transfer_duration_seconds=1, file_checksum="a" * 32, is_success=True),
+                # Failed transfers count against a source
+                TransferReport(data_source_id=1, report_id=1, destination_id=1, url="http://example.com/a.txt",
+                               file_size_bytes=20000, transfer_duration_seconds=1, file_checksum="a" * 32, is_success=True),
+                TransferReport(data_source_id=1, report_id=2, destination_id=1, url="http://example.com/b.txt",
+                               file_size_bytes=20000, transfer_duration_seconds=1, file_checksum="a" * 32, is_success=False),
+            ]
+            self.addToDatabase(*reports)
+
+            r = client.post("/transfers",
+                            data={
+                                "url": "http://example.com/file.txt",
+                                "available_mechanisms": ["curl"],
+                                "destination": "Test Destination"
+                            },
+                            headers=dict(Accept="application/json"),
+                            follow_redirects=True)
+
+            r = json.loads(r.get_data(as_text=True))
+
+            self.assertEqual([t["data_source_id"] for t in r["transfers"]], [1, 3, 2])
+            self.assertEqual([t["expected_transfer_rate"] for t in r["transfers"]], [10000, 5000, 1000])
+
+    def _report(self, data_source_id, report_id, url, checksum, is_success=True):
+        return TransferReport(data_source_id=data_source_id, report_id=report_id, url=url, file_size_bytes=1000,
+                              transfer_duration_seconds=1, file_checksum=checksum, is_success=is_success)
+
+    def _get_transfers(self, client):
+        r = client.post("/transfers",
+                        data={
+                            "url": "http://example.com/file.txt",
+                            "available_mechanisms": ["curl"]
+                        },
+                        headers=dict(Accept="application/json"),
+                        follow_redirects=True)
+
+        return json.loads(r.get_data(as_text=True))["transfers"]
+
+    def test_get_transfers_includes_consensus_checksum(self):
+        with self.client as client:
+            self.addToDatabase(
+                self._report(1, 1, "http://example.com/file.txt", "B" * 32),
+                # Reports from all copies of the file count, even if they aren't transfers for this destination
+                self._report(3, 1, "http://example.net/file.txt", "b" * 32),
+                self._report(2, 1, "http://example.org/file.txt", "c" * 32),
+                # Failed transfers and other files don't count
+                self._report(2, 2, "http://example.org/file.txt", "d" * 32, is_success=False),
+                self._report(2, 3, "http://example.org/file.txt", "d" * 32, is_success=False),
+                self._report(2, 4, "http://example.org/other.txt", "e" * 32))
+
+            transfers = self._get_transfers(client)
+
+            self.assertEqual([t["file_checksum"] for t in transfers], ["b" * 32, "b" * 32])
+
+    def test_get_transfers_without_consensus_checksum(self):
+        with self.client as client:
+            self.addToDatabase(
+                self._report(1, 1, "http://example.com/file.txt", "b" * 32),
+                self._report(2, 1, "http://example.org/file.txt", "c" * 32))
+
+            transfers = self._get_transfers(client)
+
+            self.assertEqual([t["file_checksum"] for t in transfers], [None, None])
@@ -0,0 +1,103 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from .base import BaseTestCase
+
+from app.core import matching_data_source
+from app.matcher_index import get_matcher_index, UrlMatcherIndex
+from app.models import db_session, DataSource, UrlMatcher
+
+
+class TestMatcherIndex(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        with self.client:
+            self.loginTestUser()
+
+            http_source = DataSource(id=1, label="HTTP Source", transfer_mechanism_type="curl")
+            http_source.url_matchers.append(UrlMatcher(
+                matcher_id=1,
+                matcher_type="scheme_and_host",
+                matcher_options=dict(scheme="http", host="example.com")))
+
+            regex_source = DataSource(id=2, label="Regex Source", transfer_mechanism_type="curl")
+            regex_source.url_matchers.append(UrlMatcher(
+                matcher_id=1,
+                matcher_type="regular_expression",
+                matcher_options=dict(pattern=r"^ftp://example\.com/(SRR|ERR)\d+")))
+            regex_source.url_matchers.append(UrlMatcher(
+                matcher_id=2,
+                matcher_type="regular_expression",
+                matcher_options=dict(pattern=r"^ftp://example\.com/(\w)\1")))
+
+            self.addToDatabase(http_source, regex_source)
+
+    def test_scheme_and_host_match(self):
+        self.assertEqual(matching_data_source("http://example.com/file.txt").id, 1)
+        self.assertEqual(matching_data_source("HTTP://EXAMPLE.COM/file.txt").id, 1)
+        self.assertIsNone(matching_data_source("https://example.com/file.txt"))
+
+    def test_regular_expression_match(self):
+        self.assertEqual(matching_data_source("ftp://example.com/SRR000001").id, 2)
+        self.assertEqual(matching_data_source("ftp://example.com/aa.txt").id, 2)
+        self.assertIsNone(matching_data_source("ftp://example.com/ab.txt"))
+        self.assertIsNone(matching_data_source("ftp://example.com/DRR000001"))
+
+    def test_url_without_host(self):
+        self.assertIsNone(matching_data_source("file:///tmp/file.txt"))
+
+    def test_first_matcher_wins(self):
+        matchers = [
+            UrlMatcher(data_source_id=3, matcher_id=1, matcher_type="regular_expression",
+                       matcher_options=dict(pattern=r"^http://example\.com/")),
+            UrlMatcher(data_source_id=2, matcher_id=1, matcher_type="regular_expression",
+                       matcher_options=dict(pattern=r"^http://example\.com/files/")),
+            UrlMatcher(data_source_id=1, matcher_id=1, matcher_type="scheme_and_host",
+                       matcher_options=dict(scheme="http", host="example.com")),
+        ]
+        index = UrlMatcherIndex(matchers)
+        self.assertEqual(index.matching_data_source_id("http://example.com/files/file.txt"), 1)
+
+        index = UrlMatcherIndex(matchers[:2])
+        self.assertEqual(index.matching_data_source_id("http://example.com/files/file.txt"), 2)
+        self.assertEqual(index.matching_data_source_id("http://example.com/file.txt"), 3)
+
+    def test_index_rebuilt_when_matchers_change(self):
+        self.assertIsNone(matching_data_source("http://example.org/file.txt"))
+        index = get_matcher_index()
+
+        with self.client:
+            self.loginTestUser()
+            self.addToDatabase(UrlMatcher(
+                data_source_id=1,
+                matcher_id=2,
+                matcher_type="scheme_and_host",
+                matcher_options=dict(scheme="http", host="example.org")))
+
+        self.assertIsNot(get_matcher_index(), index)
+        self.assertEqual(matching_data_source("http://example.org/file.txt").id, 1)
+
+        with self.client:
+            self.loginTestUser()
+            matcher = UrlMatcher.query.filter((UrlMatcher.data_source_id == 1) & (UrlMatcher.matcher_id == 2)).first()
+            db_session.delete(matcher)
+            db_session.commit()
+
+        self.assertIsNone(matching_data_source("http://example.org/file.txt"))
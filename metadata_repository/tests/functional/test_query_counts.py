@@ -0,0 +1,127 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import json
+
+from .base import BaseTestCase
+
+from app.models import DataSource, Destination, TransferTestFile, Transform, UrlMatcher
+
+
+class TestQueryCounts(BaseTestCase):
+    """
+    The number of queries made by a request should not depend on the number of data sources, transforms, etc.
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        with self.client:
+            self.loginTestUser()
+
+            origin_source = DataSource(id=1, label="Origin Source", transfer_mechanism_type="curl")
+            origin_source.url_matchers.append(UrlMatcher(
+                matcher_id=1,
+                matcher_type="scheme_and_host",
+                matcher_options=dict(scheme="http", host="example.com")))
+
+            self.addToDatabase(origin_source, Destination(id=1, label="Test Destination"))
+
+        self.addTargetSources(1)
+
+    def addTargetSources(self, count):
+        with self.client:
+            self.loginTestUser()
+
+            origin_source = DataSource.query.get(1)
+            destination = Destination.query.get(1)
+            for _ in range(count):
+                i = len(origin_source.transforms) + 1
+                host = "mirror%d.example.com" % i
+                target = DataSource(id=i + 1, label="Target Source %d" % i, transfer_mechanism_type="curl")
+                target.url_matchers.append(UrlMatcher(
+                    matcher_id=1,
+                    matcher_type="scheme_and_host",
+                    matcher_options=dict(scheme="http", host=host)))
+                target.url_matchers.append(UrlMatcher(
+                    matcher_id=2,
+                    matcher_type="regular_expression",
+                    matcher_options=dict(pattern=r"^ftp://%s/" % host.replace(".", r"\."))))
+                target.transfer_test_files.append(TransferTestFile(file_id=1, url="http://%s/test.txt" % host))
+
+                origin_source.transforms.append(Transform(
+                    to_data_source=target,
+                    for_destinations=[destination],
+                    transform_id=i,
+                    preference_order=i,
+                    transform_type="change_host",
+                    transform_options=dict(new_host=host)))
+
+                self.addToDatabase(target)
+
+    def countRequestQueries(self, *args, **kwargs):
+        with self.client as client:
+            # Make a request first so that one-time work (building the URL matcher index) isn't counted
+            client.post(*args, **kwargs)
+            with self.countQueries() as statements:
+                r = client.post(*args, **kwargs)
+            self.assertEqual(r.status_code, 200)
+            return len(statements)
+
+    def countGetQueries(self, url):
+        with self.client as client:
+            self.loginTestUser()
+            with self.countQueries() as statements:
+                r = client.get(url)
+            self.assertEqual(r.status_code, 200)
+            return len(statements)
+
+    def test_get_transfers(self):
+        def count_queries():
+            return self.countRequestQueries("/transfers",
+                                            data=dict(url="http://example.com/file.txt",
+                                                      available_mechanisms=["curl"],
+                                                      destination="Test Destination"),
+                                            headers=dict(Accept="application/json"))
+
+        num_queries = count_queries()
+        self.addTargetSources(5)
+        self.assertEqual(count_queries(), num_queries)
+        self.assertLessEqual(num_queries, 10)
+
+    def test_batch_transfers(self):
+        def count_queries():
+            return self.countRequestQueries("/transfers/batch",
+                                            data=json.dumps(dict(urls=["http://example.com/file.txt"],
+                                                                 available_mechanisms=["curl"],
+                                                                 destination="Test Destination")),
+                                            content_type="application/json")
+
+        num_queries = count_queries()
+        self.addTargetSources(5)
+        self.assertEqual(count_queries(), num_queries)
+
+    def test_export_configuration(self):
+        num_queries = self.countGetQueries("/configuration/export")
+        self.addTargetSources(5)
+        self.assertEqual(self.countGetQueries("/configuration/export"), num_queries)
+
+    def test_data_source_relations(self):
+        num_queries = self.countGetQueries("/data_sources/relations")
+        self.addTargetSources(5)
+        self.assertEqual(self.countGetQueries("/data_sources/relations"), num_queries)
@@ -0,0 +1,168 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from .base import BaseTestCase
+
+import app.core
+from app import resolution_cache
+from app.core import find_transfers, FindTransferError
+from app.models import db_session, DataSource, Destination, Transform, UrlMatcher
+from app.resolution_cache import ResolutionCache
+
+
+class TestResolutionCache(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.temp_dir = TemporaryDirectory()
+        self.cache = ResolutionCache(os.path.join(self.temp_dir.name, "cache.sqlite"), 100)
+        self.cache_patcher = patch.object(resolution_cache, "get_resolution_cache", return_value=self.cache)
+        self.cache_patcher.start()
+
+        # Check the configuration version on every lookup, so that tests see changes right away
+        self.version_max_age_patcher = patch.object(resolution_cache, "CONFIGURATION_VERSION_MAX_AGE", 0)
+        self.version_max_age_patcher.start()
+
+        with self.client:
+            self.loginTestUser()
+
+            origin_source = DataSource(id=1, label="Test Source", transfer_mechanism_type="curl")
+            origin_source.url_matchers.append(UrlMatcher(
+                matcher_id=1,
+                matcher_type="scheme_and_host",
+                matcher_options=dict(scheme="http", host="example.com")))
+
+            target_source = DataSource(id=2, label="Target Source", transfer_mechanism_type="curl")
+            target_source.url_matchers.append(UrlMatcher(
+                matcher_id=1,
+                matcher_type="scheme_and_host",
+                matcher_options=dict(scheme="http", host="example.org")))
+
+            transform = Transform(
+                from_data_source=origin_source,
+                to_data_source=target_source,
+                transform_id=1,
+                preference_order=1,
+                transform_type="change_host",
+                transform_options=dict(new_host="example.org"))
+
+            self.addToDatabase(origin_source, target_source, transform, Destination(id=1, label="Test Destination"))
+
+    def tearDown(self):
+        self.cache_patcher.stop()
+        self.version_max_age_patcher.stop()
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def test_cached_transfers(self):
+        with patch.object(app.core, "matching_data_source", wraps=app.core.matching_data_source) as matching_data_source:
+            transfers = find_transfers("http://example.com/file.txt", ["curl"])
+            self.assertEqual(find_transfers("http://example.com/file.txt", ["curl", "curl"]), transfers)
+            self.assertEqual(matching_data_source.call_count, 1)
+
+            self.assertEqual([t.url for t in transfers], ["http://example.org/file.txt", "http://example.com/file.txt"])
+
+            # Different mechanisms or destinations are cached separately
+            find_transfers("http://example.com/file.txt", ["aspera"])
+            find_transfers("http://example.com/file.txt", ["curl"], Destination.query.get(1))
+            self.assertEqual(matching_data_source.call_count, 3)
+
+    def test_equivalent_urls_share_cache_entries(self):
+        with patch.object(app.core, "matching_data_source", wraps=app.core.matching_data_source) as matching_data_source:
+            transfers = find_transfers("http://example.com/file.txt", ["curl"])
+            self.assertEqual(find_transfers("HTTP://Example.com:80/file.txt", ["curl"]), transfers)
+            self.assertEqual(matching_data_source.call_count, 1)
+
+            find_transfers("http://example.com:8080/file.txt", ["curl"])
+            self.assertEqual(matching_data_source.call_count, 2)
+
+    def test_cached_no_matching_data_source(self):
+        with patch.object(app.core, "matching_data_source", wraps=app.core.matching_data_source) as matching_data_source:
+            for _ in range(2):
+                self.assertRaises(FindTransferError, find_transfers, "http://example.net/file.txt", ["curl"])
+            self.assertEqual(matching_data_source.call_count, 1)
+
+    def test_configuration_changes_invalidate_cache(self):
+        find_transfers("http://example.com/file.txt", ["curl"])
+
+        with self.client:
+            self.loginTestUser()
+            transform = Transform.query.filter(Transform.from_data_source_id == 1).first()
+            transform.for_destinations.append(Destination.query.get(1))
+            db_session.commit()
+
+        self.assertEqual([t.url for t in find_transfers("http://example.com/file.txt", ["curl"])],
+                         ["http://example.com/file.txt"])
+
+        with self.client:
+            self.loginTestUser()
+            db_session.delete(Destination.query.get(1))
+            db_session.commit()
+
+        self.assertEqual([t.url for t in find_transfers("http://example.com/file.txt", ["curl"])],
+                         ["http://example.org/file.txt", "http://example.com/file.txt"])
+
+    def test_configuration_version_is_reused(self):
+        with patch.object(resolution_cache, "CONFIGURATION_VERSION_MAX_AGE", 60), \
+                patch.object(resolution_cache, "configuration_version",
+                             wraps=resolution_cache.configuration_version) as configuration_version:
+            resolution_cache._version = None
+            for _ in range(3):
+                find_transfers("http://example.com/file.txt", ["curl"])
+            self.assertEqual(configuration_version.call_count, 1)
+
+    def test_uses_are_written_in_batches(self):
+        self.cache.put("a", "1", 1)
+        self.cache.put("b", "1", 2)
+        with patch.object(resolution_cache, "TOUCH_BATCH_SIZE", 2), patch.object(resolution_cache, "TOUCH_INTERVAL", 60):
+            with patch.object(self.cache, "_write_touches", wraps=self.cache._write_touches) as write_touches:
+                self.cache.get("a", "1")
+                self.assertFalse(write_touches.called)
+
+                self.cache.get("b", "1")
+                self.assertEqual(write_touches.call_count, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResolutionCache(os.path.join(self.temp_dir.name, "lru.sqlite"), 2)
+        cache.put("a", "1", 1)
+        cache.put("b", "1", 2)
+        cache.get("a", "1")
+        cache.put("c", "1", 3)
+
+        self.assertEqual(cache.get("a", "1"), 1)
+        self.assertIsNone(cache.get("b", "1"))
+        self.assertEqual(cache.get("c", "1"), 3)
+        self.assertIsNone(cache.get("c", "2"))
+
+    def test_entries_for_older_versions_are_removed(self):
+        self.cache.put("a", "2", 1, version_seen_at=200)
+
+        # A process that has not seen the newer version yet does not remove its entries
+        self.cache.put("b", "1", 2, version_seen_at=100)
+        self.assertEqual(self.cache.get("a", "2"), 1)
+        self.assertEqual(self.cache.get("b", "1"), 2)
+
+        self.cache.put("c", "3", 3, version_seen_at=300)
+        self.assertIsNone(self.cache.get("a", "2"))
+        self.assertIsNone(self.cache.get("b", "1"))
+        self.assertEqual(self.cache.get("c", "3"), 3)
@@ -0,0 +1,129 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import statistics
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from .base import BaseTestCase
+
+from app.models import db_session, DataSource, TransferReport, TransferRateStatistics, UrlMatcher
+from app.models.transfer_report import lock_or_create
+
+
+class TestTransferRateStatistics(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        with self.client:
+            self.loginTestUser()
+
+            ds = DataSource(id=1, label="Test Source", transfer_mechanism_type="curl")
+
+            matcher = UrlMatcher(data_source_id=1,
+                                 matcher_id=1,
+                                 matcher_type="scheme_and_host",
+                                 matcher_options={"scheme": "http", "host": "example.com"})
+
+            self.addToDatabase(ds, matcher)
+
+    def addReport(self, report_id, file_size_bytes, transfer_duration_seconds, is_success=True):
+        self.addToDatabase(TransferReport(
+            data_source_id=1,
+            report_id=report_id,
+            url="http://example.com/file.txt",
+            file_size_bytes=file_size_bytes,
+            transfer_duration_seconds=transfer_duration_seconds,
+            file_checksum="a" * 32,
+            is_success=is_success))
+
+    def test_statistics_updated_when_reports_added(self):
+        rates = [100, 200, 400, 800, 1000]
+        for i, rate in enumerate(rates):
+            self.addReport(i + 1, rate * 10, 10)
+        self.addReport(len(rates) + 1, 5, 10, is_success=False)
+
+        ds = DataSource.query.get(1)
+        self.assertEqual(ds.num_successful_transfers, len(rates))
+        self.assertAlmostEqual(ds.mean_successful_transfer_rate, statistics.mean(rates))
+        self.assertAlmostEqual(ds.stdev_successful_transfer_rates, statistics.stdev(rates))
+
+    def test_statistics_updated_when_reports_deleted(self):
+        rates = [100, 200, 400, 800, 1000]
+        for i, rate in enumerate(rates):
+            self.addReport(i + 1, rate * 10, 10)
+
+        db_session.delete(TransferReport.query.filter(TransferReport.report_id == 4).first())
+        db_session.commit()
+        del rates[3]
+
+        ds = DataSource.query.get(1)
+        self.assertEqual(ds.num_successful_transfers, len(rates))
+        self.assertAlmostEqual(ds.mean_successful_transfer_rate, statistics.mean(rates))
+        self.assertAlmostEqual(ds.stdev_successful_transfer_rates, statistics.stdev(rates))
+
+    def test_outlier(self):
+        for i in range(20):
+            self.addReport(i + 1, 1000 + (i % 2) * 10, 10)
+        self.addReport(21, 100000, 10)
+
+        self.assertFalse(TransferReport.query.filter(TransferReport.report_id == 1).first().is_transfer_rate_outlier)
+        self.assertTrue(TransferReport.query.filter(TransferReport.report_id == 21).first().is_transfer_rate_outlier)
+
+    def test_statistics_deleted_with_data_source(self):
+        self.addReport(1, 1000, 10)
+        self.assertEqual(TransferRateStatistics.query.count(), 1)
+
+        db_session.delete(DataSource.query.get(1))
+        db_session.commit()
+
+        self.assertEqual(TransferRateStatistics.query.count(), 0)
+        self.assertEqual(TransferReport.query.count(), 0)
+
+    def test_statistics_updated_for_report_added_with_data_source(self):
+        with self.client:
+            self.loginTestUser()
+            ds = DataSource(label="New Source", transfer_mechanism_type="curl")
+            ds.transfer_reports.append(TransferReport(
+                report_id=1,
+                url="http://example.org/file.txt",
+                file_size_bytes=1000,
+                transfer_duration_seconds=10,
+                file_checksum="a" * 32))
+            self.addToDatabase(ds)
+
+        ds = DataSource.query.filter(DataSource.label == "New Source").one()
+        self.assertEqual(ds.num_successful_transfers, 1)
+        self.assertAlmostEqual(ds.mean_successful_transfer_rate, 100)
+
+    def test_lock_or_create_uses_row_created_concurrently(self):
+        self.addReport(1, 1000, 10)
+        query = db_session.query(TransferRateStatistics).filter(TransferRateStatistics.data_source_id == 1)
+
+        # Another transaction creates the row after it is looked up
+        first = sa.orm.Query.first
+        with patch.object(sa.orm.Query, "first", autospec=True,
+                          side_effect=lambda q: None if q.column_descriptions[0]["type"] is TransferRateStatistics else first(q)):
+            stats = lock_or_create(db_session, TransferRateStatistics, query,
+                                   dict(data_source_id=1, num_transfers=0, mean_transfer_rate=0.0, m2_transfer_rate=0.0))
+        db_session.commit()
+
+        self.assertEqual(stats.num_transfers, 1)
+        self.assertEqual(TransferRateStatistics.query.count(), 1)
@@ -16,11 +16,12 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import gzip
 import json
 
 from .base import BaseTestCase
 
-from app.models import DataSource, Destination, TransferReport, UrlMatcher
+from app.models import db_session, DataSource, Destination, TransferRateEstimate, TransferReport, UrlMatcher
 
 
 class TestTransferReports(BaseTestCase):
@@ -71,6 +72,62 @@ class TestTransferReports(BaseTestCase):
             self.assertEqual(report.transfer_duration_seconds, 10)
             self.assertEqual(report.file_checksum, "a" * 32)
 
+    def test_add_aborted_transfer_report(self):
+        with self.client as client:
+
+            report = dict(
+                is_success=False,
+                url="http://example.com/file.txt",
+                file_size_bytes=1000,
+                transfer_duration_seconds=10,
+                file_checksum="a" * 32,
+                mechanism_output="Cancelled",
+                abort_reason="Transfer rate was below minimum"
+            )
+
+            r = client.post("/transfer_reports", data=report, follow_redirects=True)
+            self.assertTrue(json.loads(r.get_data(as_text=True))["success"])
+
+            report = TransferReport.query.first()
+            self.assertFalse(report.is_success)
+            self.assertEqual(report.mechanism_output, "Cancelled")
+            self.assertEqual(report.abort_reason, "Transfer rate was below minimum")
+
+    def test_estimates_use_reported_mechanism(self):
+        with self.client as client:
+            for report_id, mechanism_name in [(1, "http"), (2, "")]:
+                report = dict(
+                    is_success=True,
+                    url="http://example.com/file.txt",
+                    file_size_bytes=1000,
+                    transfer_duration_seconds=10,
+                    file_checksum="a" * 32,
+                    mechanism_name=mechanism_name
+                )
+                client.post("/transfer_reports", data=report, follow_redirects=True)
+
+            self.assertEqual(TransferReport.query.filter(TransferReport.report_id == 1).first().mechanism_name, "http")
+            self.assertEqual(sorted(e.mechanism_name for e in TransferRateEstimate.query.all()), ["curl", "http"])
+
+    def test_estimates_updated_for_report_added_with_data_source(self):
+        with self.client:
+            self.loginTestUser()
+            ds = DataSource(label="New Source", transfer_mechanism_type="curl")
+            for report_id in [1, 2]:
+                ds.transfer_reports.append(TransferReport(
+                    report_id=report_id,
+                    url="http://example.org/file.txt",
+                    file_size_bytes=1000,
+                    transfer_duration_seconds=10,
+                    file_checksum="a" * 32))
+            db_session.add(ds)
+            db_session.commit()
+
+            [estimate] = TransferRateEstimate.query.all()
+            self.assertEqual(estimate.data_source_id, ds.id)
+            self.assertEqual(estimate.destination_id, None)
+            self.assertEqual(estimate.num_transfers, 2)
+
     def test_add_transfer_report_with_destination(self):
         with self.client as client:
 
@@ -99,3 +156,87 @@ class TestTransferReports(BaseTestCase):
             self.assertEqual(report.file_size_bytes, 1000)
             self.assertEqual(report.transfer_duration_seconds, 10)
             self.assertEqual(report.file_checksum, "a" * 32)
+
+    def test_report_ids_are_sequential(self):
+        with self.client as client:
+            report = dict(
+                is_success=True,
+                url="http://example.com/file.txt",
+                destination="",
+                file_size_bytes=1000,
+                transfer_duration_seconds=10,
+                file_checksum="a" * 32
+            )
+
+            for _ in range(3):
+                client.post("/transfer_reports", data=report)
+
+            self.assertEqual([r.report_id for r in TransferReport.query.order_by(TransferReport.report_id)],
+                             [1, 2, 3])
+
+    def test_add_transfer_reports_batch(self):
+        with self.client as client:
+
+            reports = [
+                dict(
+                    is_success=True,
+                    url="http://example.com/file%d.txt" % i,
+                    destination="Test destination",
+                    file_size_bytes=1000,
+                    transfer_duration_seconds=10,
+                    file_checksum="a" * 32
+                ) for i in range(3)
+            ]
+            reports.append(dict(reports[0], url="http://other.com/file.txt"))
+            reports.append(dict(reports[0], file_size_bytes="not a number"))
+            reports.append(dict(reports[0], is_success=False))
+
+            r = client.post("/transfer_reports/batch",
+                            data=json.dumps(reports),
+                            content_type="application/json")
+
+            r = json.loads(r.get_data(as_text=True))
+
+            self.assertFalse(r["success"])
+            self.assertEqual([result["success"] for result in r["results"]], [True, True, True, False, False, True])
+            self.assertEqual(r["results"][3]["error"]["message"], "No data sources matches URL")
+            self.assertIn("file_size_bytes", r["results"][4]["error"]["details"])
+
+            saved_reports = TransferReport.query.order_by(TransferReport.report_id).all()
+            self.assertEqual([report.report_id for report in saved_reports], [1, 2, 3, 4])
+            self.assertEqual([report.url for report in saved_reports],
+                             ["http://example.com/file0.txt", "http://example.com/file1.txt",
+                              "http://example.com/file2.txt", "http://example.com/file0.txt"])
+            self.assertEqual([report.is_success for report in saved_reports], [True, True, True, False])
+            self.assertTrue(all(report.destination_id == 1 for report in saved_reports))
+
+    def test_add_transfer_reports_batch_requires_array(self):
+        with self.client as client:
+            r = client.post("/transfer_reports/batch",
+                            data=json.dumps({"url": "http://example.com/file.txt"}),
+                            content_type="application/json")
+
+            self.assertEqual(r.status_code, 400)
+            self.assertEqual(TransferReport.query.count(), 0)
+
+    def test_add_transfer_reports_batch_gzip(self):
+        with self.client as client:
+            reports = [
+                dict(
+                    is_success=True,
+                    url="http://example.com/file.txt",
+                    file_size_bytes=1000,
+                    transfer_duration_seconds=10,
+                    file_checksum="a" * 32
+                )
+            ]
+
+            r = client.post("/transfer_reports/batch",
+                            data=gzip.compress(json.dumps(reports).encode("utf-8")),
+                            headers={"Content-Encoding": "gzip"},
+                            content_type="application/json")
+
+            r = json.loads(r.get_data(as_text=True))
+
+            self.assertTrue(r["success"])
+            self.assertEqual(TransferReport.query.count(), 1)
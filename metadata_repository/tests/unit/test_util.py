@@ -0,0 +1,60 @@
+# Big Data Smart Socket
+# Copyright (C) 2016 Clemson University
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import unittest
+from unittest.mock import patch
+
+from app import util
+from app.matchers import scheme_and_host
+from app.transforms import change_host
+
+
+class TestPluginRegistry(unittest.TestCase):
+
+    def tearDown(self):
+        util.reload_plugins()
+
+    def testAvailableTypes(self):
+        self.assertEqual(util.available_matcher_types(), ["regular_expression", "scheme_and_host"])
+        self.assertIn("change_host", util.available_transform_types())
+        self.assertIn("curl", util.available_transfer_mechanism_types())
+
+    def testPluginProperties(self):
+        self.assertEqual(util.label_for_matcher_type("scheme_and_host"), scheme_and_host.label)
+        self.assertIs(util.transform_of_type("change_host"), change_host.transform_url)
+        self.assertIsNone(util.matcher_of_type("unknown"))
+        self.assertEqual(util.label_for_matcher_type("unknown"), "unknown")
+
+    def testLookupsDoNotImportModules(self):
+        with patch.object(util.importlib, "import_module") as import_module:
+            util.matcher_of_type("scheme_and_host")
+            util.transform_of_type("change_host")
+            util.options_form_class_for_transfer_mechanism_type("curl")
+            util.available_matcher_types()
+            self.assertFalse(import_module.called)
+
+    def testRegistryIsReadOnly(self):
+        with self.assertRaises(TypeError):
+            util._plugins["matchers"]["scheme_and_host"] = {}
+
+    def testReloadPlugins(self):
+        with patch.object(util, "_modules_in_package", return_value=["change_host"]):
+            util.reload_plugins()
+            self.assertEqual(util.available_transform_types(), ["change_host"])
+            self.assertIsNotNone(util.transform_of_type("change_host"))
+            self.assertIsNone(util.transform_of_type("regex_replace"))